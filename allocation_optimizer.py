@@ -0,0 +1,185 @@
+# allocation_optimizer.py
+#
+# Search over short/mid/long-term bucket mixes for the capital care fund. Every allocation on a grid
+# is evaluated in one vectorized batch, against the deterministic projection (blended growth rate) or
+# against Monte Carlo paths shared by all allocations (common random numbers, so differences between
+# mixes are not sampling noise). No session state: usable from Streamlit, batch jobs and benchmarks.
+
+import numpy as np
+import pandas as pd
+
+from monte_carlo_module import BUCKETS, draw_bucket_returns
+from simulation_kernel import INVESTMENT_STRATEGY_DEFAULTS
+
+# Grid resolution of each bucket's share (0.05 = 5% steps, 231 allocations)
+DEFAULT_ALLOCATION_STEP = 0.05
+
+# Paths per allocation when optimizing against Monte Carlo projections
+DEFAULT_OPTIMIZER_PATHS = 1000
+
+# Largest paths × allocations block evaluated at once (a few running arrays of this size, ~8 MB each)
+MAX_BLOCK_ELEMENTS = 1_000_000
+
+# Objective name → (metric column to maximize, tie-break column, label)
+OBJECTIVES = {
+    "no_depletion": ("No Depletion Probability", "Median Terminal Balance", "Probability of never running short"),
+    "median_terminal": ("Median Terminal Balance", "No Depletion Probability", "Median balance at the end of the horizon"),
+    "downside_terminal": ("P5 Terminal Balance", "No Depletion Probability", "Terminal balance in a bad market (P5)"),
+}
+
+
+def allocation_grid(step=DEFAULT_ALLOCATION_STEP, bounds=None):
+    """
+    Every short/mid/long mix on a grid of the given step that sums to 100%.
+
+    Parameters:
+    - step: share increment, e.g. 0.05 or 0.01
+    - bounds: optional dict of bucket → (min share, max share) constraints
+
+    Returns:
+    - np.ndarray of shape (allocations × 3), columns ordered as BUCKETS
+    """
+    n = int(round(1 / step))
+    short, mid = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing="ij")
+    keep = short + mid <= n
+    units = np.column_stack([short[keep], mid[keep], n - short[keep] - mid[keep]])
+    grid = units / n
+    for k, bucket in enumerate(BUCKETS):
+        low, high = (bounds or {}).get(bucket, (0.0, 1.0))
+        grid = grid[(grid[:, k] >= low - 1e-9) & (grid[:, k] <= high + 1e-9)]
+    return grid
+
+
+def fund_outcomes(costs, annual_contribution, yearly_returns, initial_capital=0.0):
+    """
+    Whether the capital fund covers every year's cost, and its terminal balance, without building
+    the year-by-year paths.
+
+    Same recurrence as simulation_kernel.capital_fund_path_by_year: in discounted dollars the fund
+    is a running sum of net inflows, so it never runs short exactly when that sum never goes
+    negative, and the terminal balance follows from its last value and its minimum. Only those
+    running values are kept, one vectorized step per year over every scenario at once.
+
+    Parameters:
+    - costs: (years,) annual healthcare costs
+    - annual_contribution: fixed yearly contribution
+    - yearly_returns: iterable of one return array per year (any common shape, e.g.
+      paths × allocations), each greater than -1
+    - initial_capital: capital invested before the first year
+
+    Returns:
+    - (covered, terminal) arrays shaped like one year's returns
+    """
+    discount = net_inflow = lowest = None
+    for cost, returns in zip(costs, yearly_returns):
+        growth = 1 + np.asarray(returns, dtype=float)
+        if discount is None:
+            discount = np.ones_like(growth)
+            net_inflow = np.full_like(growth, initial_capital)
+            lowest = np.full_like(growth, np.inf)
+        discount *= growth
+        growth *= annual_contribution
+        growth -= cost
+        growth /= discount
+        net_inflow += growth
+        np.minimum(lowest, net_inflow, out=lowest)
+    if discount is None:
+        return np.True_, np.float64(initial_capital)
+    terminal = (net_inflow - np.minimum(lowest, 0.0)) * discount
+    return lowest >= -1e-9, terminal
+
+
+def evaluate_allocations(costs, annual_contribution, mean_rates, allocations, n_paths=None, volatilities=None,
+                         correlation=None, seed=None, initial_capital=0.0):
+    """
+    Score many bucket allocations at once.
+
+    Parameters:
+    - costs: (years,) annual healthcare costs the fund pays
+    - annual_contribution: fixed yearly contribution to the fund
+    - mean_rates: dict of expected annual return per bucket ("short_term", "mid_term", "long_term")
+    - allocations: (allocations × 3) array of shares ordered as BUCKETS (see allocation_grid)
+    - n_paths: None for the deterministic projection (each mix grows at its blended rate), else
+      the number of Monte Carlo paths, drawn once and shared by every allocation
+    - volatilities, correlation, seed: as for monte_carlo_module.draw_bucket_returns
+    - initial_capital: capital in the fund before the first year
+
+    Returns:
+    - DataFrame with one row per allocation: the three shares, "Blended Rate",
+      "No Depletion Probability", "Median Terminal Balance" and "P5 Terminal Balance"
+    """
+    costs = np.asarray(costs, dtype=float)
+    allocations = np.atleast_2d(np.asarray(allocations, dtype=float))
+    rates = np.array([mean_rates[bucket] for bucket in BUCKETS], dtype=float)
+    blended_rates = allocations @ rates
+
+    if n_paths is None:
+        covered, terminal = fund_outcomes(costs, annual_contribution, (blended_rates for _ in costs), initial_capital)
+        no_depletion = np.broadcast_to(covered, blended_rates.shape).astype(float)
+        median_terminal = downside_terminal = np.broadcast_to(terminal, blended_rates.shape)
+    else:
+        # Years-first so each year's (paths × buckets) returns are contiguous
+        bucket_returns = np.ascontiguousarray(np.moveaxis(
+            draw_bucket_returns(n_paths, len(costs), mean_rates, volatilities, correlation, seed), 1, 0
+        ))
+        no_depletion = np.empty(len(allocations))
+        median_terminal = np.empty(len(allocations))
+        downside_terminal = np.empty(len(allocations))
+        block = max(MAX_BLOCK_ELEMENTS // n_paths, 1)
+        for start in range(0, len(allocations), block):
+            weights = allocations[start:start + block].T
+            # Each year: (paths × buckets) @ (buckets × block) → (paths × block) blended returns
+            covered, terminal = fund_outcomes(costs, annual_contribution, (year @ weights for year in bucket_returns),
+                                              initial_capital)
+            stop = start + weights.shape[1]
+            no_depletion[start:stop] = np.broadcast_to(covered, (n_paths, stop - start)).mean(axis=0)
+            terminal = np.broadcast_to(terminal, (n_paths, stop - start))
+            downside_terminal[start:stop], median_terminal[start:stop] = np.percentile(terminal, [5, 50], axis=0)
+
+    scores = pd.DataFrame(allocations, columns=[f"{bucket}_alloc" for bucket in BUCKETS])
+    scores["Blended Rate"] = blended_rates
+    scores["No Depletion Probability"] = no_depletion
+    scores["Median Terminal Balance"] = median_terminal
+    scores["P5 Terminal Balance"] = downside_terminal
+    return scores
+
+
+def optimize_allocation(costs, annual_contribution, mean_rates=None, objective="no_depletion",
+                        n_paths=DEFAULT_OPTIMIZER_PATHS, step=DEFAULT_ALLOCATION_STEP, bounds=None,
+                        volatilities=None, correlation=None, seed=None, initial_capital=0.0):
+    """
+    Allocation on the grid that maximizes the objective (ties broken by the objective's second metric,
+    then by the lower blended rate, i.e. the more conservative mix).
+
+    Parameters:
+    - costs, annual_contribution, initial_capital: as for evaluate_allocations
+    - mean_rates: expected bucket returns (defaults to the INVESTMENT_STRATEGY_DEFAULTS rates)
+    - objective: key of OBJECTIVES
+    - n_paths: Monte Carlo paths per allocation, or None for the deterministic projection
+    - step, bounds: as for allocation_grid
+
+    Returns:
+    - dict with "allocation" ({"short_term_alloc": ..., ...}), "score" (objective value) and
+      "scores" (DataFrame of every allocation, best first)
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; choose one of {', '.join(OBJECTIVES)}")
+    if mean_rates is None:
+        mean_rates = {bucket: INVESTMENT_STRATEGY_DEFAULTS[f"{bucket}_rate"] for bucket in BUCKETS}
+
+    grid = allocation_grid(step, bounds)
+    if not len(grid):
+        raise ValueError("No allocation satisfies the given bounds")
+    scores = evaluate_allocations(costs, annual_contribution, mean_rates, grid, n_paths=n_paths,
+                                  volatilities=volatilities, correlation=correlation, seed=seed,
+                                  initial_capital=initial_capital)
+
+    metric, tie_break, _ = OBJECTIVES[objective]
+    order = np.lexsort((scores["Blended Rate"].to_numpy(), -scores[tie_break].to_numpy(), -scores[metric].to_numpy()))
+    scores = scores.iloc[order].reset_index(drop=True)
+    best = scores.iloc[0]
+    return {
+        "allocation": {f"{bucket}_alloc": float(best[f"{bucket}_alloc"]) for bucket in BUCKETS},
+        "score": float(best[metric]),
+        "scores": scores,
+    }
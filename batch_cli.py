@@ -0,0 +1,370 @@
+# batch_cli.py
+#
+# Headless batch entry point: scores a CSV or Parquet book of households through the same
+# cost → income/401(k) → surplus → retirement drawdown pipeline as Steps 1–4, without Streamlit.
+# Input is streamed in chunks, chunks are simulated on a process pool, and one summary row per
+# household is written in columnar form (Parquet, or CSV).
+#
+#     python batch_cli.py households.csv results.parquet --workers 8 --chunk-size 5000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from chronic_module import get_chronic_multiplier
+from parallel_runner import imap_ordered, process_pool, resolve_workers
+from pipeline_dag import PIPELINE
+from projection import Projection
+from result_cache import PROJECTION_CACHE
+from simulation_kernel import RETIREMENT_AGE, project_cost_matrix
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# One input column per household field, with the Step 1 / Step 2 form defaults.
+# Incomes and 401(k) contributions are annual and net of tax, as in st.session_state.step2_inputs.
+HOUSEHOLD_DEFAULTS = {
+    "household_id": None,  # Defaults to the row number in the input file
+    "age": 30,
+    "health_status": "healthy",
+    "health_profile_type": None,  # "healthy", "chronic", "high_risk" or empty (cost curve used by Step 1)
+    "family_status": "single",
+    "partner_age": 65,
+    "insurance_type": "Employer-based",  # "Employer-based", "Marketplace / Self-insured" or "None"
+    "user_chronic_count": "None",
+    "monthly_expenses": 6440,
+    "debt_monthly_payment": 0,
+    "net_income_annual": 45000,
+    "income_growth": 0.02,
+    "net_income_annual_partner": 0,
+    "income_growth_partner": 0.03,
+    "start_401k_user": 0,
+    "start_401k_partner": 0,
+    "contrib_401k_annual": 0,
+    "partner_contrib_401k_annual": 0,
+    "growth_401k": 0.05,
+    "partner_growth_401k": None,
+    "savings_start": 20000,
+    "annual_contrib": 1200,
+    "savings_growth": 0.03,
+    "pension_user": 0,
+    "pension_partner": 0,
+    "inflation_rate": 0.03,
+    "premium_inflation": 0.05,
+    "base_premium": 6000,
+    "base_oop": 3000,
+    "savings_growth_rate": 0.03,
+    "401k_growth_rate": 0.03,
+}
+
+# Field names used by the downloadable plan JSON in main.py
+PLAN_ALIASES = {
+    "savings_balance": "savings_start",
+    "debt_monthly": "debt_monthly_payment",
+}
+
+# Step 1 insurance choice → key used by generate_costs / project_cost_matrix
+COST_INSURANCE_TYPES = {"Employer-based": "Employer", "Marketplace / Self-insured": "Marketplace"}
+
+RESULT_COLUMNS = [
+    "household_id", "age", "years", "lifetime_true_cost", "lifetime_oop", "lifetime_premiums",
+    "lifetime_income", "lifetime_expenses", "lifetime_surplus", "first_deficit_age",
+    "savings_at_retirement", "401k_at_retirement", "capital_used", "unfunded_gap", "final_capital",
+    "depletion_age", "error",
+]
+
+# Fixed column types, so every Parquet chunk shares one schema
+RESULT_DTYPES = {
+    "household_id": "string", "age": "Int64", "years": "Int64", "first_deficit_age": "Int64",
+    "depletion_age": "Float64", "error": "string",
+    **{column: "Float64" for column in [
+        "lifetime_true_cost", "lifetime_oop", "lifetime_premiums", "lifetime_income", "lifetime_expenses",
+        "lifetime_surplus", "savings_at_retirement", "401k_at_retirement", "capital_used", "unfunded_gap",
+        "final_capital",
+    ]},
+}
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def normalize_households(chunk):
+    """
+    Household dicts from an input DataFrame chunk: plan JSON names are mapped to form fields,
+    missing columns and empty cells take HOUSEHOLD_DEFAULTS.
+    """
+    chunk = chunk.rename(columns={k: v for k, v in PLAN_ALIASES.items() if v not in chunk.columns})
+    if "household_id" not in chunk.columns:
+        chunk = chunk.assign(household_id=chunk.index.astype(str))  # Row number in the input file
+    if "monthly_income" in chunk.columns and "net_income_annual" not in chunk.columns:
+        chunk = chunk.assign(net_income_annual=chunk["monthly_income"] * 12)
+    households = []
+    for record in chunk.to_dict("records"):
+        household = {}
+        for field, default in HOUSEHOLD_DEFAULTS.items():
+            value = record.get(field, default)
+            household[field] = default if _is_missing(value) else value
+        households.append(household)
+    return households
+
+
+def household_state(household, cost_df):
+    """
+    The session-state subset the pipeline nodes read, built from one household.
+    """
+    age = int(household["age"])
+    profile = {
+        "age": age,
+        "health_status": household["health_status"],
+        "family_status": household["family_status"],
+        "partner_age": int(household["partner_age"]),
+        "start_401k_user": household["start_401k_user"],
+        "start_401k_partner": household["start_401k_partner"],
+    }
+    if household["partner_growth_401k"] is not None:
+        profile["partner_growth_401k"] = household["partner_growth_401k"]
+    step2_inputs = {
+        key: household[key] for key in [
+            "net_income_annual", "income_growth", "net_income_annual_partner", "income_growth_partner",
+            "contrib_401k_annual", "growth_401k", "savings_start", "annual_contrib", "savings_growth",
+            "partner_contrib_401k_annual",
+        ]
+    }
+    user_chronic_count = str(household["user_chronic_count"])
+    state = {
+        "cost_df": cost_df,
+        "profile": profile,
+        "step2_inputs": step2_inputs,
+        "age": age,
+        "chronic_multiplier": get_chronic_multiplier(age, user_chronic_count.lower().replace(" ", "_")),
+        "user_chronic_count": user_chronic_count,
+    }
+    for key in ["monthly_expenses", "debt_monthly_payment", "inflation_rate", "premium_inflation", "base_premium",
+                "base_oop", "pension_user", "pension_partner", "insurance_type", "savings_growth_rate",
+                "401k_growth_rate"]:
+        state[key] = household[key]
+    return state
+
+
+def summarize_household(household, state, costs):
+    """
+    One result row from an evaluated pipeline state and the household's cost projection row.
+    """
+    row = {column: None for column in RESULT_COLUMNS}
+    row.update({
+        "household_id": household["household_id"],
+        "age": int(household["age"]),
+        "years": len(state["cost_df"]),
+        "lifetime_true_cost": costs["true_cost"],
+        "lifetime_oop": costs["oop"],
+        "lifetime_premiums": costs["premium"],
+        "error": state.get("expense_error"),
+    })
+    projection = state.get("expense_projection")
+    if row["error"] or projection is None:
+        return row
+
+    surplus = projection["Surplus"]
+    deficit_years = np.flatnonzero(surplus < 0)
+    retirement_index = RETIREMENT_AGE - row["age"]
+    in_range = 0 <= retirement_index < len(projection)
+    row.update({
+        "lifetime_income": float(projection["Income"].sum()),
+        "lifetime_expenses": float(projection["Total Expenses"].sum()),
+        "lifetime_surplus": float(surplus.sum()),
+        "first_deficit_age": int(projection.ages[deficit_years[0]]) if len(deficit_years) else None,
+        "savings_at_retirement": float(projection["Savings"][retirement_index]) if in_range else None,
+        "401k_at_retirement": float(projection["401(k)"][retirement_index]) if in_range else None,
+    })
+    drawdown = state.get("retirement_drawdown")
+    if drawdown is not None:
+        row.update({
+            "capital_used": float(np.sum(drawdown["used"])),
+            "unfunded_gap": float(np.sum(drawdown["gap"])),
+            "final_capital": float(drawdown["final_capital"]),
+            "depletion_age": drawdown["depletion_age"],
+        })
+    return row
+
+
+def simulate_chunk(chunk):
+    """
+    Simulate one chunk of households (runs in a worker process).
+
+    Parameters:
+    - chunk: DataFrame of household rows
+
+    Returns:
+    - DataFrame with RESULT_COLUMNS, one row per household, in input order
+    """
+    households = normalize_households(chunk)
+    if not households:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    # Step 1 costs for the whole chunk in one vectorized call
+    ages = [int(h["age"]) for h in households]
+    cost_matrix = project_cost_matrix(
+        ages,
+        [h["health_profile_type"] for h in households],
+        [COST_INSURANCE_TYPES.get(h["insurance_type"], "None") for h in households],
+    )
+    lifetime = {key: np.nansum(cost_matrix[key], axis=1) for key in ["true_cost", "oop", "premium"]}
+
+    rows = []
+    for j, household in enumerate(households):
+        n_years = int(cost_matrix["n_years"][j])
+        # The pipeline only needs the projection length from cost_df; a Projection is much cheaper than a DataFrame
+        cost_df = Projection.from_columns({
+            "True Cost": cost_matrix["true_cost"][j, :n_years],
+            "OOP": cost_matrix["oop"][j, :n_years],
+            "Premium": cost_matrix["premium"][j, :n_years],
+        }, n_years, start_age=ages[j])
+        costs = {key: float(values[j]) for key, values in lifetime.items()}
+        try:
+            state = PIPELINE.evaluate(household_state(household, cost_df))
+        except (KeyError, TypeError, ValueError) as exc:
+            state = {"cost_df": cost_df, "expense_error": f"{type(exc).__name__}: {exc}"}
+        rows.append(summarize_household(household, state, costs))
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def _file_format(path, file_format=None):
+    if file_format:
+        return file_format
+    return "parquet" if os.path.splitext(path)[1].lower() in (".parquet", ".pq") else "csv"
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, file_format=None):
+    """
+    Stream an input book as DataFrames of at most chunk_size rows (Parquet needs pyarrow).
+    """
+    offset = 0
+    if _file_format(path, file_format) == "parquet":
+        import pyarrow.parquet as pq
+
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    else:
+        # Only empty cells are missing: "None" is a valid insurance type and chronic condition count
+        chunks = pd.read_csv(path, chunksize=chunk_size, keep_default_na=False, na_values=[""])
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))  # Row numbers across the whole file
+        offset += len(chunk)
+        yield chunk
+
+
+class ResultWriter:
+    """
+    Appends result chunks to a CSV or Parquet file (Parquet needs pyarrow).
+    """
+
+    def __init__(self, path, file_format=None):
+        self.path = path
+        self.file_format = _file_format(path, file_format)
+        self._parquet_writer = None
+        self._schema = None
+        self._wrote_header = False
+
+    def write(self, frame):
+        if self.file_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet_writer is None:
+                self._schema = pa.Schema.from_pandas(frame.astype(RESULT_DTYPES), preserve_index=False)
+                self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+            table = pa.Table.from_pandas(frame.astype(RESULT_DTYPES), schema=self._schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a" if self._wrote_header else "w", header=not self._wrote_header,
+                         index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def _init_worker():
+    # Every household is new, so memoizing projections would only add key hashing and copies
+    PROJECTION_CACHE.maxsize = 0
+    PROJECTION_CACHE.clear()
+
+
+def run_batch(input_path, output_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, input_format=None,
+              output_format=None, progress=None):
+    """
+    Simulate every household in input_path and write the results to output_path.
+
+    Parameters:
+    - workers: worker processes (default: all cores, capped by HSS_MAX_WORKERS); 1 runs in-process
+    - chunk_size: households per chunk (the unit of work sent to a worker)
+    - progress: optional callback(households_done, seconds_elapsed) called after each chunk
+
+    Returns:
+    - dict with "households", "chunks", "errors", "seconds" and "households_per_second"
+    """
+    workers = resolve_workers(workers)
+    start = time.perf_counter()
+    totals = {"households": 0, "chunks": 0, "errors": 0}
+    writer = ResultWriter(output_path, output_format)
+
+    def collect(result):
+        writer.write(result)
+        totals["households"] += len(result)
+        totals["chunks"] += 1
+        totals["errors"] += int(result["error"].notna().sum())
+        if progress is not None:
+            progress(totals["households"], time.perf_counter() - start)
+
+    chunks = read_chunks(input_path, chunk_size, input_format)
+    try:
+        if workers == 1:
+            _init_worker()
+            for chunk in chunks:
+                collect(simulate_chunk(chunk))
+        else:
+            # Keep a bounded number of chunks in flight so memory stays flat; results are written in input order
+            with process_pool(workers, initializer=_init_worker) as pool:
+                for result in imap_ordered(pool, simulate_chunk, chunks, max_in_flight=2 * workers):
+                    collect(result)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    totals["seconds"] = seconds
+    totals["households_per_second"] = totals["households"] / seconds if seconds > 0 else 0.0
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a CSV/Parquet book of households without Streamlit.")
+    parser.add_argument("input", help="household profiles (.csv or .parquet)")
+    parser.add_argument("output", help="results file (.csv or .parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores, capped by HSS_MAX_WORKERS)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="households per chunk")
+    parser.add_argument("--input-format", choices=["csv", "parquet"], default=None)
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default=None)
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+
+    def report(done, seconds):
+        print(f"{done:>10,} households  {seconds:8.1f} s  {done / seconds if seconds else 0:10,.0f}/s",
+              file=sys.stderr)
+
+    totals = run_batch(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                       input_format=args.input_format, output_format=args.output_format,
+                       progress=None if args.quiet else report)
+    print(
+        f"Simulated {totals['households']:,} households in {totals['chunks']:,} chunks "
+        f"({totals['errors']:,} with errors) in {totals['seconds']:.1f} s: "
+        f"{totals['households_per_second']:,.0f} households/s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
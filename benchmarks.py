@@ -0,0 +1,603 @@
+# benchmarks.py
+#
+# Headless timing harness for the simulation kernels (no Streamlit server needed).
+# Run from the repository root:
+#     python benchmarks.py
+#
+# Regression suite (core entry points at 1, 100 and 10,000 synthetic profiles, JSON baselines):
+#     python benchmarks.py --suite --save-baseline   # record benchmark_baseline.json on this machine
+#     python benchmarks.py --suite                   # compare against it
+#
+# Suite exit codes: 0 no regression (or --warn-only), 1 regression confirmed on re-timing,
+# 2 no baseline, 3 regressions only on re-timings too noisy to trust (see HOST_NOISE_LIMIT).
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from family_risk_module import evaluate_family_risk, evaluate_family_risks
+from insurance_module import get_insurance_costs_over_time
+from monte_carlo_module import run_investment_strategy_mc
+from simulation_kernel import (
+    MAX_AGE, project_cost_matrix, capital_fund_path, drawdown_capital, retirement_deficits
+)
+from simulator_core import (
+    generate_costs, simulate_capital_allocation, simulate_full_investment_strategy, simulate_investment_strategy
+)
+
+PROFILE_TYPES = ["healthy", "chronic", "high_risk", None]
+
+# Cold-start budget (seconds) for a new container: beta gate shown, and first full render after access
+COLD_START_BUDGET_SECONDS = {"gate": 1.0, "first_render": 6.0}
+HEAVY_MODULES = ["numpy", "pandas", "matplotlib"]
+INSURANCE_TYPES = ["Employer", "Marketplace", "None"]
+HEALTH_STATUSES = ["healthy", "chronic", "high_risk"]
+INSURANCE_PLANS = ["ESI", "ACA", "Medicare Advantage", "Traditional Medicare", "Uninsured"]
+
+# Regression suite: profile counts, baseline file, and the slowdown that counts as a regression
+SUITE_SIZES = (1, 100, 10000)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+REGRESSION_THRESHOLD = 0.25  # 25% slower than the baseline
+REGRESSION_NOISE_FLOOR_SECONDS = 0.002  # smaller slowdowns are timer noise, not regressions
+SUITE_REPEAT = 7  # suite cases are timed as the median of this many runs (one run at 10,000+ profiles)
+REGRESSION_CONFIRM_ROUNDS = 9  # rounds of re-timing before a flagged case counts (3 at 10,000+ profiles)
+HOST_NOISE_LIMIT = 0.15  # re-timing spread (interquartile range / median) above which a regression is inconclusive
+
+EXIT_OK, EXIT_REGRESSION, EXIT_NO_BASELINE, EXIT_NOISY_HOST = 0, 1, 2, 3
+
+
+def time_call(fn, repeat=5):
+    """
+    Best-of-N wall time of fn() in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_samples(fn, repeat=SUITE_REPEAT):
+    """
+    Wall times of repeat calls of fn() in seconds, after one untimed warm-up call when repeat > 1.
+    """
+    if repeat > 1:
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def relative_spread(samples):
+    """
+    Interquartile range of timing samples relative to their median (0 for a perfectly steady host).
+    """
+    q25, median, q75 = np.percentile(samples, [25, 50, 75])
+    return float((q75 - q25) / median) if median > 0 else 0.0
+
+
+def synthetic_profiles(n_profiles, seed=0):
+    """
+    Random Step 1 style profiles for benchmarking.
+    """
+    rng = np.random.default_rng(seed)
+    ages = rng.integers(18, 86, size=n_profiles)
+    profile_types = rng.choice(len(PROFILE_TYPES), size=n_profiles)
+    insurance_types = rng.choice(len(INSURANCE_TYPES), size=n_profiles)
+    return [
+        {
+            "age": int(age),
+            "health_profile_type": PROFILE_TYPES[p],
+            "insurance_type": INSURANCE_TYPES[k],
+        }
+        for age, p, k in zip(ages, profile_types, insurance_types)
+    ]
+
+
+# --- Reference: per-year loop generate_costs (and uncached cost curves) used before the vectorized engine ---
+def loop_cost_curve(profile_type, years):
+    if profile_type in ["healthy", "chronic"]:
+        r = {"healthy": 0.02, "chronic": 0.03}[profile_type]
+        base = {"healthy": 75200, "chronic": 459000}[profile_type] / sum([(1 + r) ** i for i in range(years)])
+        return [base * (1 + r) ** i for i in range(years)]
+    return [10000 * (1 + 0.05) ** i for i in range(years)]
+
+
+def loop_generate_costs(profile, care_preferences):
+    ages = list(range(profile["age"], 86))
+    cost_data = []
+
+    calibrated_costs = loop_cost_curve(profile.get("health_profile_type", None), len(ages))
+
+    for i, age in enumerate(ages):
+        insurance_type = profile.get("insurance_type", "None")
+        true_cost = calibrated_costs[i]
+        if insurance_type == "Employer":
+            premium = 12912 * ((1 + 0.03) ** i)
+            oop = 3300 * ((1 + 0.03) ** i)
+        elif insurance_type == "Marketplace":
+            premium = 7200 * ((1 + 0.04) ** i)
+            oop = 4200 * ((1 + 0.04) ** i)
+        else:
+            premium = 0
+            oop = true_cost * 0.5
+        cost_data.append({"Age": age, "True Cost": true_cost, "OOP": oop, "Premium": premium})
+
+    return pd.DataFrame(cost_data)
+
+
+def benchmark_generate_costs(n_profiles, repeat=3):
+    """
+    Compare the per-year loop against the vectorized engine.
+    A single profile goes through simulator_core.generate_costs (drop-in DataFrame path, bypassing
+    the result cache); larger books go through one project_cost_matrix call.
+    """
+    profiles = synthetic_profiles(n_profiles)
+
+    def run_loop():
+        for profile in profiles:
+            loop_generate_costs(profile, {})
+
+    if n_profiles == 1:
+        def run_vectorized():
+            generate_costs.__wrapped__(profiles[0], {})
+    else:
+        ages = [p["age"] for p in profiles]
+        profile_types = [p["health_profile_type"] for p in profiles]
+        insurance_types = [p["insurance_type"] for p in profiles]
+
+        def run_vectorized():
+            project_cost_matrix(ages, profile_types, insurance_types)
+
+    loop_seconds = time_call(run_loop, repeat=1 if n_profiles > 100 else repeat)
+    vectorized_seconds = time_call(run_vectorized, repeat=repeat)
+    return {
+        "benchmark": "generate_costs",
+        "profiles": n_profiles,
+        "loop_seconds": loop_seconds,
+        "vectorized_seconds": vectorized_seconds,
+        "speedup": loop_seconds / vectorized_seconds,
+    }
+
+
+# --- Reference: per-row capital fund loop used before the prefix-scan recurrence ---
+def loop_capital_fund_path(costs, annual_contribution, growth_rate):
+    fund = 0
+    capital_used = []
+    capital_balance = []
+    for cost in costs:
+        fund = (fund + annual_contribution) * (1 + growth_rate)
+        used = min(fund, cost)
+        fund -= used
+        capital_used.append(used)
+        capital_balance.append(fund)
+    return capital_used, capital_balance
+
+
+def benchmark_capital_fund(n_scenarios, years=55, repeat=3):
+    """
+    Compare the per-row capital fund loop against one capital_fund_path call
+    over a (scenarios × years) matrix of costs, contributions and growth rates.
+    """
+    rng = np.random.default_rng(0)
+    costs = rng.uniform(2000, 30000, size=(n_scenarios, years))
+    contributions = rng.uniform(0, 15000, size=n_scenarios)
+    growth_rates = rng.uniform(0.02, 0.07, size=n_scenarios)
+
+    def run_loop():
+        for row, contribution, growth in zip(costs.tolist(), contributions.tolist(), growth_rates.tolist()):
+            loop_capital_fund_path(row, contribution, growth)
+
+    def run_vectorized():
+        capital_fund_path(costs, contributions, growth_rates)
+
+    loop_seconds = time_call(run_loop, repeat=1 if n_scenarios > 100 else repeat)
+    vectorized_seconds = time_call(run_vectorized, repeat=repeat)
+    return {
+        "benchmark": "capital_fund_path",
+        "profiles": n_scenarios,
+        "loop_seconds": loop_seconds,
+        "vectorized_seconds": vectorized_seconds,
+        "speedup": loop_seconds / vectorized_seconds,
+    }
+
+
+# --- Reference: per-year retirement drawdown loop Steps 4 and 5 used before drawdown_capital ---
+def loop_drawdown(deficit_values, current_capital):
+    used_capital = []
+    remaining_capital = []
+    unfunded_gap = []
+    for deficit in deficit_values:
+        if deficit > 0:
+            used = min(deficit, current_capital)
+            gap = max(deficit - used, 0)
+            current_capital -= used
+        else:
+            used = 0
+            gap = 0
+        used_capital.append(used)
+        remaining_capital.append(max(current_capital, 0))
+        unfunded_gap.append(gap)
+    return used_capital, remaining_capital, unfunded_gap, current_capital
+
+
+def benchmark_drawdown(n_scenarios, years=21, repeat=3):
+    """
+    Compare the per-year drawdown loop against one drawdown_capital call over a
+    (scenarios × retirement years) matrix of deficits, and check that the first
+    scenario matches the loop exactly.
+    """
+    rng = np.random.default_rng(0)
+    deficits = np.where(rng.random((n_scenarios, years)) < 0.3, 0.0, rng.uniform(0, 60000, size=(n_scenarios, years)))
+    starting_capital = rng.uniform(0, 800000, size=n_scenarios)
+
+    def run_loop():
+        for row, capital in zip(deficits.tolist(), starting_capital.tolist()):
+            loop_drawdown(row, capital)
+
+    def run_vectorized():
+        drawdown_capital(deficits, starting_capital)
+
+    used, remaining, gap, final_capital = loop_drawdown(deficits[0].tolist(), float(starting_capital[0]))
+    single = drawdown_capital(deficits[0], starting_capital[0])
+    if (single["used"].tolist() != used or single["remaining"].tolist() != remaining
+            or single["gap"].tolist() != gap or single["final_capital"] != final_capital):
+        raise AssertionError("drawdown_capital does not match the reference loop")
+
+    loop_seconds = time_call(run_loop, repeat=1 if n_scenarios > 100 else repeat)
+    vectorized_seconds = time_call(run_vectorized, repeat=repeat)
+    return {
+        "benchmark": "drawdown_capital",
+        "profiles": n_scenarios,
+        "loop_seconds": loop_seconds,
+        "vectorized_seconds": vectorized_seconds,
+        "speedup": loop_seconds / vectorized_seconds,
+    }
+
+
+def benchmark_monte_carlo(n_paths, years=60, repeat=3):
+    """
+    Wall time of one interactive Monte Carlo capital fund run (target: under a second).
+    """
+    cost_df = pd.DataFrame({
+        "Age": np.arange(MAX_AGE - years + 1, MAX_AGE + 1),
+        "Healthcare Cost": np.linspace(3000, 25000, years),
+    })
+    inputs = {"calculated_surplus": 30000, "capital_care_alloc": 0.3}
+    seconds = time_call(lambda: run_investment_strategy_mc(cost_df, inputs, n_paths=n_paths, seed=0), repeat=repeat)
+    return {"benchmark": "run_investment_strategy_mc", "paths": n_paths, "years": years, "seconds": seconds}
+
+
+# Runs main.py headless in a fresh interpreter and reports timings as JSON
+_COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("main.py", default_timeout=120)
+app.run()
+gate = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+app.sidebar.text_input[0].input("HSS_Beta_2025v4!").run()
+print(json.dumps({{"gate": gate, "first_render": time.perf_counter() - start, "heavy_at_gate": heavy}}))
+"""
+
+
+def benchmark_cold_start(repeat=3):
+    """
+    Cold-start time of the app in fresh interpreters: until the beta gate is shown, and until the
+    first full render after entering the access code. Also lists heavy modules loaded before the gate.
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    script = _COLD_START_SCRIPT.format(heavy=HEAVY_MODULES)
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], cwd=repo_dir, capture_output=True, text=True,
+                                check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    result = {
+        "benchmark": "cold_start",
+        "gate_seconds": min(run["gate"] for run in runs),
+        "first_render_seconds": min(run["first_render"] for run in runs),
+        "heavy_at_gate": runs[0]["heavy_at_gate"],
+    }
+    result["within_budget"] = (
+        result["gate_seconds"] <= COLD_START_BUDGET_SECONDS["gate"]
+        and result["first_render_seconds"] <= COLD_START_BUDGET_SECONDS["first_render"]
+    )
+    return result
+
+
+# --- Regression suite: core entry points looped over synthetic profiles ---
+def suite_profiles(n_profiles, seed=0):
+    """
+    synthetic_profiles plus the household fields the insurance, family risk and investment
+    entry points read (health status, family, dependents, insurance plan, income).
+    """
+    rng = np.random.default_rng(seed + 1)
+    profiles = synthetic_profiles(n_profiles, seed)
+    for profile in profiles:
+        family = bool(rng.random() < 0.5)
+        n_dependents = int(rng.integers(0, 4)) if family else 0
+        profile.update({
+            "health_status": HEALTH_STATUSES[rng.integers(len(HEALTH_STATUSES))],
+            "family_status": "family" if family else "single",
+            "partner_age": int(np.clip(profile["age"] + rng.integers(-5, 6), 18, 85)) if family else None,
+            "partner_health_status": HEALTH_STATUSES[rng.integers(len(HEALTH_STATUSES))],
+            "dependent_ages": rng.integers(0, 18, size=n_dependents).tolist(),
+            "dependent_health_statuses": [HEALTH_STATUSES[k] for k in rng.integers(len(HEALTH_STATUSES), size=n_dependents)],
+            "plan": INSURANCE_PLANS[rng.integers(len(INSURANCE_PLANS))],
+            "net_income_annual": float(rng.uniform(30000, 200000)),
+            "simulation_years": MAX_AGE - profile["age"] + 1,
+        })
+    return profiles
+
+
+def _suite_cases(profiles):
+    # Case name → zero-argument workload over every profile; inputs are prepared here, outside the timing
+    cost_dfs = [generate_costs.__wrapped__(profile, {}) for profile in profiles]
+    for cost_df in cost_dfs:
+        cost_df["Healthcare Cost"] = cost_df["OOP"] + cost_df["Premium"]
+    insurance_profiles = [dict(profile, insurance_type=profile["plan"]) for profile in profiles]
+    surpluses = [
+        np.linspace(profile["net_income_annual"] * 0.2, -profile["net_income_annual"] * 0.3, len(cost_df))
+        for profile, cost_df in zip(profiles, cost_dfs)
+    ]
+    allocations = {"short_term": 0.2, "mid_term": 0.3, "long_term": 0.5}
+
+    def step_4_drawdown():
+        # Step 4 readiness: retirement deficits from the surplus, then the capital drawdown
+        for profile, cost_df, surplus in zip(profiles, cost_dfs, surpluses):
+            ages, deficits = retirement_deficits(cost_df["Age"].to_numpy(), surplus)
+            drawdown_capital(deficits, profile["net_income_annual"] * 2, ages)
+
+    return {
+        "generate_costs": lambda: [generate_costs.__wrapped__(profile, {}) for profile in profiles],
+        "simulate_investment_strategy": lambda: [simulate_investment_strategy(cost_df) for cost_df in cost_dfs],
+        "simulate_capital_allocation": lambda: [
+            simulate_capital_allocation(cost_df, allocations, 50000, 500, "Combined", 20) for cost_df in cost_dfs
+        ],
+        "simulate_full_investment_strategy": lambda: [
+            simulate_full_investment_strategy(
+                profile, profile["net_income_annual"], 0.1, 0.02, allocations, 0.02, 0.05, 0.07,
+                0.06 * profile["net_income_annual"], 0.03 * profile["net_income_annual"], 0.06, 5000, 2500
+            )
+            for profile in profiles
+        ],
+        "get_insurance_costs_over_time": lambda: [
+            get_insurance_costs_over_time.__wrapped__(profile, profile["simulation_years"]) for profile in insurance_profiles
+        ],
+        "evaluate_family_risk": lambda: [evaluate_family_risk(profile) for profile in profiles],
+        "evaluate_family_risks": lambda: evaluate_family_risks(profiles),
+        "step_4_drawdown": step_4_drawdown,
+    }
+
+
+def _quiet_streamlit():
+    # Entry points that sync st.session_state run in Streamlit's bare mode here; silence its per-call warnings
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+
+
+def run_suite(sizes=SUITE_SIZES, repeat=SUITE_REPEAT):
+    """
+    Time every suite case at each profile count (median of repeat runs; a single run at 10,000+ profiles).
+
+    Returns:
+    - dict of "case@profiles" → seconds
+    """
+    _quiet_streamlit()
+    timings = {}
+    for n_profiles in sizes:
+        cases = _suite_cases(suite_profiles(n_profiles))
+        for name, workload in cases.items():
+            samples = time_samples(workload, repeat=1 if n_profiles >= 10000 else repeat)
+            timings[f"{name}@{n_profiles}"] = float(np.median(samples))
+    return timings
+
+
+def save_baseline(timings, path=BASELINE_PATH):
+    """
+    Write suite timings as a JSON baseline, with the machine and library versions they were taken on.
+    """
+    baseline = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timings": timings,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    return baseline
+
+
+def load_baseline(path=BASELINE_PATH):
+    """
+    Timings stored by save_baseline, or None when there is no baseline yet.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)["timings"]
+
+
+def host_speed(timings, baseline, noise_floor=REGRESSION_NOISE_FLOOR_SECONDS):
+    """
+    How much slower this run is than the baseline overall: the median ratio over the cases that
+    take longer than noise_floor. A slower or busier host slows every case down together, a
+    regression only some of them, so cases are compared against baseline × host speed. A change
+    that slows every case alike therefore shows up here (it is printed) rather than as a regression.
+
+    Returns:
+    - float, 1.0 when no case can be compared
+    """
+    ratios = [seconds / baseline[case] for case, seconds in timings.items() if baseline.get(case, 0) > noise_floor]
+    return float(np.median(ratios)) if ratios else 1.0
+
+
+def _is_regression(seconds, expected, threshold, noise_floor):
+    return seconds > expected * (1 + threshold) and seconds - expected > noise_floor
+
+
+def compare_to_baseline(timings, baseline, threshold=REGRESSION_THRESHOLD,
+                        noise_floor=REGRESSION_NOISE_FLOOR_SECONDS, speed=1.0):
+    """
+    Compare suite timings with a baseline.
+
+    Parameters:
+    - speed: host_speed of this run; baseline times are scaled by it before comparing
+
+    Returns:
+    - list of dicts with "case", "seconds", "baseline_seconds", "ratio" (seconds / (baseline × speed))
+      and "regression" (ratio above 1 + threshold and slower by more than noise_floor seconds);
+      cases missing from the baseline have ratio None
+    """
+    rows = []
+    for case, seconds in timings.items():
+        reference = baseline.get(case)
+        expected = reference * speed if reference else None
+        rows.append({
+            "case": case,
+            "seconds": seconds,
+            "baseline_seconds": reference,
+            "ratio": seconds / expected if expected else None,
+            "regression": expected is not None and _is_regression(seconds, expected, threshold, noise_floor),
+        })
+    return rows
+
+
+def confirm_regressions(rows, baseline, threshold=REGRESSION_THRESHOLD, noise_floor=REGRESSION_NOISE_FLOOR_SECONDS,
+                        rounds=REGRESSION_CONFIRM_ROUNDS):
+    """
+    Re-time flagged cases so that a one-off stall of the host cannot fail a build.
+
+    Every case of a flagged profile count is re-timed round-robin, so flagged and unflagged cases
+    see the same host conditions; a flag stands only if the case is still beyond the threshold
+    against baseline × the host speed of the re-timing. Re-timed rows get "retimed_seconds"
+    (median) and "retimed_spread" (relative_spread of their samples).
+
+    Returns:
+    - list of rows that are still regressions
+    """
+    _quiet_streamlit()
+    flagged = [row for row in rows if row["regression"]]
+    for n_profiles in sorted({int(row["case"].rsplit("@", 1)[1]) for row in flagged}):
+        cases = _suite_cases(suite_profiles(n_profiles))
+        samples = {name: [] for name in cases}
+        for workload in cases.values():
+            workload()  # warm-up
+        for _ in range(3 if n_profiles >= 10000 else rounds):
+            for name, workload in cases.items():
+                start = time.perf_counter()
+                workload()
+                samples[name].append(time.perf_counter() - start)
+        retimed = {f"{name}@{n_profiles}": float(np.median(values)) for name, values in samples.items()}
+        speed = host_speed(retimed, baseline, noise_floor)
+        for row in flagged:
+            if row["case"] not in retimed:
+                continue
+            row["retimed_seconds"] = retimed[row["case"]]
+            row["retimed_spread"] = relative_spread(samples[row["case"].rsplit("@", 1)[0]])
+            row["regression"] = _is_regression(
+                row["retimed_seconds"], row["baseline_seconds"] * speed, threshold, noise_floor
+            )
+    return [row for row in rows if row["regression"]]
+
+
+def format_comparison(row):
+    baseline = f"{row['baseline_seconds'] * 1000:>10.2f} ms" if row["baseline_seconds"] else f"{'(new)':>13}"
+    ratio = f"{row['ratio']:>6.2f}x" if row["ratio"] is not None else f"{'':>7}"
+    flag = "  REGRESSION" if row["regression"] else ""
+    if "retimed_seconds" in row:
+        flag += f"  (re-timed {row['retimed_seconds'] * 1000:.2f} ms{'' if row['regression'] else ', noise'})"
+    return f"{row['case']:<44} {row['seconds'] * 1000:>10.2f} ms  baseline {baseline}  {ratio}{flag}"
+
+
+def format_result(result):
+    return (
+        f"{result['benchmark']:<28} {result['profiles']:>7,} profiles  "
+        f"loop {result['loop_seconds'] * 1000:>10.2f} ms  "
+        f"vectorized {result['vectorized_seconds'] * 1000:>8.2f} ms  "
+        f"speedup {result['speedup']:>7.1f}x"
+    )
+
+
+def report_kernels():
+    for n in [1, 10000]:
+        print(format_result(benchmark_generate_costs(n)))
+    for n in [1, 10000]:
+        print(format_result(benchmark_capital_fund(n)))
+    for n in [1, 10000]:
+        print(format_result(benchmark_drawdown(n)))
+    mc = benchmark_monte_carlo(10000)
+    print(f"{mc['benchmark']:<28} {mc['paths']:>7,} paths × {mc['years']} years  {mc['seconds'] * 1000:>8.2f} ms")
+    cold = benchmark_cold_start()
+    print(
+        f"{cold['benchmark']:<28} gate {cold['gate_seconds']:.2f} s (budget {COLD_START_BUDGET_SECONDS['gate']:.1f} s)  "
+        f"first render {cold['first_render_seconds']:.2f} s (budget {COLD_START_BUDGET_SECONDS['first_render']:.1f} s)  "
+        f"heavy modules at gate: {', '.join(cold['heavy_at_gate']) or 'none'}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the health strategy simulator.")
+    parser.add_argument("--suite", action="store_true", help="run the regression suite instead of the kernel report")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SUITE_SIZES), help="profile counts for the suite")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the suite timings as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown vs. the baseline that counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--warn-only", action="store_true",
+                        help="report regressions but exit 0 (for hosts whose timings cannot gate a build)")
+    args = parser.parse_args(argv)
+
+    if not args.suite:
+        report_kernels()
+        return EXIT_OK
+
+    timings = run_suite(args.sizes)
+    if args.save_baseline:
+        save_baseline(timings, args.baseline)
+        for case, seconds in timings.items():
+            print(f"{case:<44} {seconds * 1000:>10.2f} ms")
+        print(f"Baseline saved to {args.baseline}")
+        return EXIT_OK
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.", file=sys.stderr)
+        return EXIT_NO_BASELINE
+    speed = host_speed(timings, baseline)
+    rows = compare_to_baseline(timings, baseline, args.threshold, speed=speed)
+    regressions = confirm_regressions(rows, baseline, args.threshold)
+    for row in rows:
+        print(format_comparison(row))
+    print(f"Host speed vs. baseline: {speed:.2f}x (cases are compared against baseline × host speed)")
+    if not regressions:
+        return EXIT_OK
+    cases = ", ".join(row["case"] for row in regressions)
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {cases}", file=sys.stderr)
+    if args.warn_only:
+        return EXIT_OK
+    if all(row["retimed_spread"] > HOST_NOISE_LIMIT for row in regressions):
+        print(f"Re-timings varied by more than {HOST_NOISE_LIMIT:.0%}: too noisy to tell (inconclusive).",
+              file=sys.stderr)
+        return EXIT_NOISY_HOST
+    return EXIT_REGRESSION
+
+
+if __name__ == "__main__":
+    sys.exit(main())
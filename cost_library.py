@@ -1,5 +1,9 @@
 # cost_library.py
 
+from functools import lru_cache
+
+import numpy as np
+
 # Core healthcare cost references (used across simulation)
 HEALTHCARE_COSTS = {
     "chronic": {
@@ -116,19 +120,18 @@ def estimate_uninsured_oop_by_year(health_risk_level, year, base_full_cost=10000
     return estimated_oop
 
 
+# Validated lifetime cost totals and annual cost inflation for calibrated cardiovascular profiles
+CALIBRATED_LIFETIME_TOTALS = {"healthy": 75200, "chronic": 459000}
+CALIBRATED_COST_INFLATION = {"healthy": 0.02, "chronic": 0.03}
+
+
 # Calibrated cost curve for Healthy or Chronic cardiovascular profiles
 def get_calibrated_cost_curve(profile_type, years=60):
     """
     Returns a calibrated annual cost curve for Healthy or Chronic cardiovascular profiles.
     Based on validated lifetime cost totals ($75.2K for Healthy, $459K for Chronic).
     """
-    inflation = {"healthy": 0.02, "chronic": 0.03}
-    totals = {"healthy": 75200, "chronic": 459000}
-    if profile_type not in totals:
-        raise ValueError("Unsupported profile type for calibrated curve.")
-    r = inflation[profile_type]
-    base = totals[profile_type] / sum([(1 + r) ** i for i in range(years)])
-    return [base * (1 + r) ** i for i in range(years)]
+    return get_calibrated_cost_array(profile_type, years).tolist()
 
 def determine_profile_type(cv_risk_score):
     """
@@ -142,11 +145,83 @@ def determine_profile_type(cv_risk_score):
     else:
         return None
 
-def estimate_high_risk_curve(years=60, base=10000, inflation=0.05):
+# Placeholder high-risk curve parameters
+HIGH_RISK_CURVE_BASE = 10000
+HIGH_RISK_CURVE_INFLATION = 0.05
+
+
+def estimate_high_risk_curve(years=60, base=HIGH_RISK_CURVE_BASE, inflation=HIGH_RISK_CURVE_INFLATION):
     """
     Placeholder cost curve for high-risk individuals (non-cardiovascular).
     """
-    return [base * (1 + inflation) ** i for i in range(years)]
+    return get_high_risk_cost_array(years, base, inflation).tolist()
+
+
+# --- Cached cost curves ---
+# Steps 1, 3 and 6 request the same curves on every rerun, so curves are computed once and
+# shared as read-only NumPy arrays: a table for every supported (profile_type, years) pair is
+# built at import, and other combinations go through a bounded LRU cache.
+MAX_CURVE_YEARS = 68  # Projections start at age 18 at the earliest and run through age 85
+CURVE_CACHE_SIZE = 256
+
+
+def _read_only(values):
+    curve = np.array(values, dtype=float)
+    curve.setflags(write=False)
+    return curve
+
+
+@lru_cache(maxsize=CURVE_CACHE_SIZE)
+def _calibrated_curve(years, total, r):
+    base = total / sum([(1 + r) ** i for i in range(years)])
+    return _read_only([base * (1 + r) ** i for i in range(years)])
+
+
+@lru_cache(maxsize=CURVE_CACHE_SIZE)
+def _high_risk_curve(years, base, inflation):
+    return _read_only([base * (1 + inflation) ** i for i in range(years)])
+
+
+def get_calibrated_cost_array(profile_type, years=60):
+    """
+    Read-only array version of get_calibrated_cost_curve (shared between callers, do not modify).
+    """
+    if profile_type not in CALIBRATED_LIFETIME_TOTALS:
+        raise ValueError("Unsupported profile type for calibrated curve.")
+    curve = COST_CURVE_TABLE.get((profile_type, years))
+    if curve is not None:
+        return curve
+    return _calibrated_curve(years, CALIBRATED_LIFETIME_TOTALS[profile_type], CALIBRATED_COST_INFLATION[profile_type])
+
+
+def get_high_risk_cost_array(years=60, base=HIGH_RISK_CURVE_BASE, inflation=HIGH_RISK_CURVE_INFLATION):
+    """
+    Read-only array version of estimate_high_risk_curve (shared between callers, do not modify).
+    """
+    if base == HIGH_RISK_CURVE_BASE and inflation == HIGH_RISK_CURVE_INFLATION:
+        curve = COST_CURVE_TABLE.get(("high_risk", years))
+        if curve is not None:
+            return curve
+    return _high_risk_curve(years, base, inflation)
+
+
+def build_cost_curve_table(max_years=MAX_CURVE_YEARS):
+    """
+    Precompute default cost curves for every supported (profile_type, years) combination.
+    """
+    table = {}
+    for years in range(1, max_years + 1):
+        for profile_type in CALIBRATED_LIFETIME_TOTALS:
+            table[(profile_type, years)] = _calibrated_curve(
+                years, CALIBRATED_LIFETIME_TOTALS[profile_type], CALIBRATED_COST_INFLATION[profile_type]
+            )
+        table[("high_risk", years)] = _high_risk_curve(years, HIGH_RISK_CURVE_BASE, HIGH_RISK_CURVE_INFLATION)
+    _calibrated_curve.cache_clear()
+    _high_risk_curve.cache_clear()
+    return table
+
+
+COST_CURVE_TABLE = build_cost_curve_table()
 
 
 # Adjust true cost curve for employer premium contributions
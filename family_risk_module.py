@@ -1,38 +1,54 @@
+import numpy as np
 import streamlit as st
 
-from projected_health_risk import get_risk_trajectory
+from projected_health_risk import household_members, risk_trajectory_rows
 
-def evaluate_family_risk(user_profile):
-    risks = {}
-
-    # User
-    risks["user"] = get_risk_trajectory(user_profile["age"], user_profile["health_status"])
-
-    # Partner
-    if user_profile.get("family_status") == "family" and user_profile.get("partner_age") is not None:
-        partner_status = user_profile.get("partner_health_status", "healthy")
-        risks["partner"] = get_risk_trajectory(user_profile["partner_age"], partner_status)
+# A member whose trajectory reaches this risk is flagged as high risk
+HIGH_RISK_THRESHOLD = 0.9
 
-    # Dependents
-    dep_ages = user_profile.get("dependent_ages", [])
-    dep_healths = user_profile.get("dependent_health_statuses", [])
-    for i, (age, status) in enumerate(zip(dep_ages, dep_healths)):
-        risks[f"dependent_{i+1}"] = get_risk_trajectory(age, status)
+def evaluate_family_risk(user_profile):
+    return evaluate_family_risks([user_profile])[0]
 
-    # Average risk per year
-    trajectory_length = len(next(iter(risks.values())))
-    avg_risk_by_year = [
-        sum(r[year] for r in risks.values() if len(r) > year) / len(risks)
-        for year in range(trajectory_length)
-    ]
+def evaluate_family_risks(user_profiles):
+    """
+    evaluate_family_risk for a whole cohort. Every member of every household is stacked into one
+    (members × years) risk array (projected_health_risk.risk_trajectory_rows), so trajectories,
+    family averages and high-risk flags come from one vectorized pass instead of member-by-member,
+    year-by-year loops.
 
-    high_risk_flags = [name for name, r in risks.items() if max(r) >= 0.9]
+    Parameters:
+    - user_profiles: list of profiles, as for evaluate_family_risk
 
-    return {
-        "individual_trajectories": risks,
-        "avg_family_risk": avg_risk_by_year,
-        "high_risk_members": high_risk_flags
-    }
+    Returns:
+    - list of evaluate_family_risk results, in order
+    """
+    households = [household_members(user_profile) for user_profile in user_profiles]
+    ages = [age for _, member_ages, _ in households for age in member_ages]
+    statuses = [status for _, _, member_statuses in households for status in member_statuses]
+    risk, lengths = risk_trajectory_rows(ages, statuses)
+    peaks = risk.max(axis=1, initial=0.0).tolist()
+    lengths = lengths.tolist()
+
+    results = []
+    start = 0
+    for labels, _, _ in households:
+        stop = start + len(labels)
+        members = risk[start:stop]
+
+        risks = {name: row[:length].tolist() for name, row, length in zip(labels, members, lengths[start:stop])}
+
+        # Average risk per year over the user's horizon; members whose trajectory has ended count as 0
+        avg_risk_by_year = (members[:, :lengths[start]].sum(axis=0) / len(labels)).tolist()
+
+        high_risk_flags = [name for name, peak in zip(labels, peaks[start:stop]) if peak >= HIGH_RISK_THRESHOLD]
+
+        results.append({
+            "individual_trajectories": risks,
+            "avg_family_risk": avg_risk_by_year,
+            "high_risk_members": high_risk_flags
+        })
+        start = stop
+    return results
 
 def get_family_risk_summary(user_profile, dependents=None, partner_age=None, partner_health_status=None):
     """
@@ -68,8 +84,6 @@ def get_family_risk_summary(user_profile, dependents=None, partner_age=None, par
 
 
 # New function: adjust_risk_after_capital_strategy
-import math
-
 def adjust_risk_after_capital_strategy(family_risk_dict, capital_investment_level):
     """
     Adjusts average family risk based on capital strategy. A higher investment can reduce risk modestly over time.
@@ -82,14 +96,23 @@ def adjust_risk_after_capital_strategy(family_risk_dict, capital_investment_leve
     - modified copy of family_risk_dict with adjusted avg_family_risk
     """
     adjusted = family_risk_dict.copy()
-    original_curve = family_risk_dict["avg_family_risk"]
-    decay = min(max(capital_investment_level, 0.0), 1.0)
+    adjusted["avg_family_risk"] = adjust_risk_grid(family_risk_dict, [capital_investment_level])[0].tolist()
+    return adjusted
+
+def adjust_risk_grid(family_risk_dict, capital_investment_levels):
+    """
+    Adjusted average family risk for a whole grid of capital investment levels in one pass.
 
-    adjusted_curve = []
-    for i, risk in enumerate(original_curve):
-        adjustment = (1 - 0.25 * capital_investment_level)  # example linear reduction, tune as needed
-        adjusted_value = round(max(0, risk * adjustment), 4)
-        adjusted_curve.append(adjusted_value)
+    Parameters:
+    - family_risk_dict: dict output from evaluate_family_risk
+    - capital_investment_levels: sequence of levels, as for adjust_risk_after_capital_strategy
 
-    adjusted["avg_family_risk"] = adjusted_curve
-    return adjusted
\ No newline at end of file
+    Returns:
+    - np.ndarray of shape (levels × years); row i is the adjusted avg_family_risk for level i
+    """
+    original_curve = np.asarray(family_risk_dict["avg_family_risk"], dtype=float)
+    adjustment = 1 - 0.25 * np.asarray(capital_investment_levels, dtype=float)  # example linear reduction, tune as needed
+    adjusted = np.maximum(0, adjustment[:, None] * original_curve)
+    # Python round (correctly rounded) rather than np.round (scale, round, unscale), so every value
+    # matches the single-level round(max(0, risk * adjustment), 4)
+    return np.array([round(value, 4) for value in adjusted.ravel().tolist()]).reshape(adjusted.shape)
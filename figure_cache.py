@@ -0,0 +1,65 @@
+# figure_cache.py
+#
+# Rendered-figure cache for the matplotlib charts in Steps 3–6. A chart is drawn and saved to
+# PNG only when the data it plots has not been seen before; the bytes are shared across sessions
+# and every figure is closed as soon as it is saved, so reruns no longer accumulate open figures.
+
+import io
+
+import streamlit as st
+
+from instrumentation import timed
+from result_cache import ResultCache, canonical_key
+
+FIGURE_CACHE_SIZE = 256
+
+# Same options st.pyplot uses, so cached images look identical to st.pyplot(fig)
+SAVEFIG_OPTIONS = {"bbox_inches": "tight", "dpi": 200, "format": "png"}
+
+# Shared by every session in the process
+FIGURE_CACHE = ResultCache(maxsize=FIGURE_CACHE_SIZE)
+
+
+def figure_bytes(name, data, draw):
+    """
+    PNG bytes of the figure built by draw(), cached on name and a hash of the plotted data.
+
+    Parameters:
+    - name: chart identifier (different charts may plot the same data)
+    - data: everything the chart depends on (lists, numbers, labels, ...)
+    - draw: function returning a matplotlib Figure; only called on a cache miss
+
+    Returns:
+    - PNG image bytes
+    """
+    try:
+        key = canonical_key(name, data)
+    except TypeError:
+        key = None  # Unhashable data: render without caching
+
+    if key is not None:
+        cached = FIGURE_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+    import matplotlib.pyplot as plt
+
+    with timed("figure", name):
+        fig = draw()
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, **SAVEFIG_OPTIONS)
+        finally:
+            plt.close(fig)
+
+    png = buffer.getvalue()
+    if key is not None:
+        FIGURE_CACHE.put(key, png)
+    return png
+
+
+def show_figure(name, data, draw, width="stretch"):
+    """
+    Drop-in replacement for st.pyplot(fig) that serves the chart from FIGURE_CACHE.
+    """
+    st.image(figure_bytes(name, data, draw), width=width)
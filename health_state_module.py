@@ -0,0 +1,154 @@
+# health_state_module.py
+#
+# Stochastic health-state engine. Each household member moves between healthy, chronic and
+# high_risk year by year according to an age-banded Markov transition matrix; many paths and
+# all members are simulated together with NumPy, and each path's states are priced with the
+# cost_library cost curves.
+
+import numpy as np
+
+from cost_library import get_calibrated_cost_array, get_high_risk_cost_array
+from projected_health_risk import household_members
+from simulation_kernel import MAX_AGE
+
+HEALTH_STATES = ["healthy", "chronic", "high_risk"]
+
+# Transition matrices apply from these ages onward: under 45, 45–64, 65+
+AGE_BAND_EDGES = [45, 65]
+
+# Illustrative annual transition probabilities (rows: from state, columns: to state), per age band
+TRANSITION_MATRICES = np.array([
+    [  # under 45
+        [0.970, 0.025, 0.005],
+        [0.030, 0.940, 0.030],
+        [0.000, 0.080, 0.920],
+    ],
+    [  # 45–64
+        [0.940, 0.050, 0.010],
+        [0.020, 0.930, 0.050],
+        [0.000, 0.050, 0.950],
+    ],
+    [  # 65+
+        [0.900, 0.080, 0.020],
+        [0.010, 0.910, 0.080],
+        [0.000, 0.030, 0.970],
+    ],
+])
+
+# Risk score attached to each state, on the same 0–1 scale as projected_health_risk trajectories
+STATE_RISK_SCORES = np.array([0.2, 0.75, 0.9])
+
+DEFAULT_HEALTH_PATHS = 1000
+
+
+def state_index(health_status):
+    """
+    Map a health status label to its state index (unknown labels count as healthy).
+    """
+    status = (health_status or "healthy").lower()
+    return HEALTH_STATES.index(status) if status in HEALTH_STATES else 0
+
+
+def simulate_health_states(member_ages, member_statuses, years, n_paths=DEFAULT_HEALTH_PATHS,
+                           transition_matrices=None, seed=None):
+    """
+    Simulate health-state paths for every household member at once.
+
+    Year 0 is each member's current status; each following year draws the next state
+    from the transition matrix of the member's age band.
+
+    Returns:
+    - np.ndarray of state indices, shape (paths × members × years)
+    """
+    matrices = TRANSITION_MATRICES if transition_matrices is None else np.asarray(transition_matrices, dtype=float)
+    cumulative = np.cumsum(matrices, axis=-1)[..., :-1]  # thresholds between next states
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+    member_ages = np.asarray(member_ages, dtype=int)
+    n_members = len(member_ages)
+    bands = np.searchsorted(AGE_BAND_EDGES, member_ages[:, None] + np.arange(years)[None, :], side="right")
+
+    states = np.empty((n_paths, n_members, years), dtype=np.int8)
+    if years == 0:
+        return states
+    states[:, :, 0] = [state_index(status) for status in member_statuses]
+
+    draws = rng.random((years - 1, n_paths, n_members, 1))
+    for t in range(1, years):
+        thresholds = cumulative[bands[:, t - 1][None, :], states[:, :, t - 1]]  # (paths × members × 2)
+        states[:, :, t] = (draws[t - 1] > thresholds).sum(axis=-1)
+    return states
+
+
+def state_cost_curves(years):
+    """
+    Annual cost curve for each health state (states × years), from cost_library.
+    """
+    if years == 0:
+        return np.zeros((len(HEALTH_STATES), 0))
+    return np.array([
+        get_calibrated_cost_array("healthy", years=years),
+        get_calibrated_cost_array("chronic", years=years),
+        get_high_risk_cost_array(years=years),
+    ])
+
+
+def member_cost_curves(member_ages, years, max_age=MAX_AGE):
+    """
+    Each member's annual cost curve per health state over the household horizon.
+
+    Like the single-person projections, a member aged a is priced on curves that run from age a
+    through max_age; years after a member passes max_age cost nothing.
+
+    Returns:
+    - np.ndarray of shape (states × members × years)
+    """
+    curves = np.zeros((len(HEALTH_STATES), len(member_ages), years))
+    for m, age in enumerate(member_ages):
+        horizon = max(max_age + 1 - int(age), 0)
+        priced = min(horizon, years)
+        curves[:, m, :priced] = state_cost_curves(horizon)[:, :priced]
+    return curves
+
+
+def simulate_household_costs(user_profile, n_paths=DEFAULT_HEALTH_PATHS, transition_matrices=None, seed=None,
+                             max_age=MAX_AGE, percentiles=(5, 50, 95)):
+    """
+    Stochastic household health costs from the user's age through max_age. Each member's costs
+    follow their own age (see member_cost_curves).
+
+    Returns:
+    - dict with "labels", "states" (paths × members × years), "member_costs" (same shape),
+      "household_costs" (paths × years), "state_shares" (members × states × years, share of
+      paths in each state) and "bands" of household cost percentiles per year
+    """
+    labels, ages, statuses = household_members(user_profile)
+    years = max(max_age + 1 - user_profile["age"], 0)
+
+    states = simulate_health_states(ages, statuses, years, n_paths, transition_matrices, seed)
+    curves = member_cost_curves(ages, years, max_age)
+    member_costs = curves[states, np.arange(len(ages))[:, None], np.arange(years)]
+    household_costs = member_costs.sum(axis=1)
+
+    state_shares = np.stack([(states == k).mean(axis=0) for k in range(len(HEALTH_STATES))], axis=1)
+    bands = np.percentile(household_costs, percentiles, axis=0)
+
+    return {
+        "labels": labels,
+        "states": states,
+        "member_costs": member_costs,
+        "household_costs": household_costs,
+        "state_shares": state_shares,
+        "bands": {f"P{p}": band for p, band in zip(percentiles, bands)},
+    }
+
+
+def expected_risk_trajectory(age, health_status, n_paths=DEFAULT_HEALTH_PATHS, transition_matrices=None,
+                             seed=None, max_age=MAX_AGE):
+    """
+    Path-averaged risk score per year for one person, same length as
+    projected_health_risk.get_risk_trajectory (age through max_age).
+    """
+    years = max(max_age + 1 - age, 0)
+    states = simulate_health_states([age], [health_status], years, n_paths, transition_matrices, seed)
+    return STATE_RISK_SCORES[states[:, 0, :]].mean(axis=0).tolist()
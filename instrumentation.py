@@ -0,0 +1,247 @@
+# instrumentation.py
+#
+# Wall-time instrumentation for reruns: every step page, pipeline compute node, cached projection and
+# figure render is timed. Samples go into a process-wide recorder (shared by every session, like
+# PROJECTION_CACHE) that keeps p50/p95/p99 over a recent window plus all-time histograms, and into
+# the current session's rerun log. An optional admin panel in the sidebar shows both, and the
+# aggregates can be dumped to a local JSON file.
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Set to "0" to turn recording off entirely
+INSTRUMENTATION_ENV_VAR = "HSS_INSTRUMENTATION"
+# Set to "1" to show the admin panel in the sidebar
+ADMIN_PANEL_ENV_VAR = "HSS_ADMIN_PANEL"
+# Set to a file path to dump the histograms there when the server process exits
+DUMP_PATH_ENV_VAR = "HSS_INSTRUMENTATION_DUMP"
+
+DEFAULT_DUMP_PATH = "instrumentation_histograms.json"
+
+# Recent samples kept per metric for percentiles
+SAMPLE_WINDOW = 2048
+
+# Upper bounds (milliseconds) of the all-time histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+CATEGORIES = ("step", "compute", "figure")
+
+# Session state key holding this session's rerun count and per-rerun logs
+INSTRUMENTATION_STATE_KEY = "_instrumentation"
+
+PERCENTILES = (50, 95, 99)
+
+
+def _percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return float("nan")
+    rank = max(int(-(-len(sorted_values) * p // 100)), 1)
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """
+    Thread-safe store of wall times per (category, name).
+
+    Keeps the last SAMPLE_WINDOW samples of each metric for percentiles, and all-time count, total
+    and histogram counts (HISTOGRAM_BOUNDS_MS), which can be added across processes.
+    """
+
+    def __init__(self, window=SAMPLE_WINDOW):
+        self.window = window
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def record(self, category, name, seconds):
+        ms = seconds * 1000
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if ms <= bound), len(HISTOGRAM_BOUNDS_MS))
+        with self._lock:
+            metric = self._metrics.get((category, name))
+            if metric is None:
+                metric = self._metrics[(category, name)] = {
+                    "samples": deque(maxlen=self.window),
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "histogram": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1),
+                }
+            metric["samples"].append(ms)
+            metric["count"] += 1
+            metric["total_ms"] += ms
+            metric["max_ms"] = max(metric["max_ms"], ms)
+            metric["histogram"][bucket] += 1
+
+    def clear(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def summary(self, category=None):
+        """
+        One row per metric, slowest total first.
+
+        Returns:
+        - list of dicts with "category", "name", "count", "total_ms", "mean_ms", "p50_ms",
+          "p95_ms", "p99_ms" (over the recent window), "max_ms" and "histogram" (all-time counts)
+        """
+        with self._lock:
+            metrics = [
+                (key, sorted(metric["samples"]), dict(metric, histogram=list(metric["histogram"])))
+                for key, metric in self._metrics.items()
+                if category is None or key[0] == category
+            ]
+        rows = []
+        for (metric_category, name), samples, metric in metrics:
+            row = {
+                "category": metric_category,
+                "name": name,
+                "count": metric["count"],
+                "total_ms": metric["total_ms"],
+                "mean_ms": metric["total_ms"] / metric["count"],
+            }
+            row.update({f"p{p}_ms": _percentile(samples, p) for p in PERCENTILES})
+            row["max_ms"] = metric["max_ms"]
+            row["histogram"] = metric["histogram"]
+            rows.append(row)
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+# Shared by every session in the process
+RECORDER = LatencyRecorder()
+
+_current = threading.local()  # Streamlit runs each script run on its own thread
+
+
+def enabled():
+    return os.environ.get(INSTRUMENTATION_ENV_VAR, "1") != "0"
+
+
+def admin_panel_enabled():
+    return os.environ.get(ADMIN_PANEL_ENV_VAR, "0") == "1"
+
+
+def begin_rerun(state):
+    """
+    Start a new rerun log for this session (call once at the top of the script).
+    The previous rerun's log becomes state[INSTRUMENTATION_STATE_KEY]["last_rerun"].
+    """
+    session = state.get(INSTRUMENTATION_STATE_KEY) or {"reruns": 0, "current_rerun": [], "last_rerun": []}
+    session = {
+        "reruns": session["reruns"] + 1,
+        "last_rerun": session["current_rerun"],
+        "current_rerun": [],
+    }
+    state[INSTRUMENTATION_STATE_KEY] = session
+    _current.log = session["current_rerun"]
+    return session
+
+
+@contextmanager
+def timed(category, name):
+    """
+    Time the with block as (category, name), also when it ends in st.stop() or an exception.
+    """
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        RECORDER.record(category, name, seconds)
+        log = getattr(_current, "log", None)
+        if log is not None:
+            log.append((category, name, seconds * 1000))
+
+
+def instrumented(category, name=None):
+    """
+    Decorator timing every call of a function under (category, name or the function's qualified name).
+    """
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(category, label):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def dump_histograms(path=DEFAULT_DUMP_PATH, recorder=None):
+    """
+    Write the aggregated latencies (percentiles and all-time histograms) to a JSON file.
+
+    Returns:
+    - the path written
+    """
+    recorder = recorder or RECORDER
+    payload = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "pid": os.getpid(),
+        "histogram_bounds_ms": list(HISTOGRAM_BOUNDS_MS),
+        "metrics": recorder.summary(),
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+if os.environ.get(DUMP_PATH_ENV_VAR):
+    atexit.register(dump_histograms, os.environ[DUMP_PATH_ENV_VAR])
+
+
+def render_admin_panel(state):
+    """
+    Sidebar panel with this session's rerun count, the previous rerun's timings and the
+    process-wide p50/p95/p99 per step, compute function and figure, plus this session's memory by
+    key and on-demand tracemalloc snapshots.
+    """
+    import pandas as pd
+    import streamlit as st
+
+    session = state.get(INSTRUMENTATION_STATE_KEY) or {"reruns": 0, "last_rerun": []}
+    with st.sidebar.expander("🛠️ Admin: Performance", expanded=False):
+        st.markdown(f"**Reruns this session:** {session['reruns']}")
+        last_rerun = pd.DataFrame(session["last_rerun"], columns=["Category", "Name", "ms"])
+        if len(last_rerun):
+            totals = last_rerun.groupby("Category")["ms"].sum()
+            st.markdown("**Previous rerun:** " + ", ".join(f"{category} {ms:,.0f} ms" for category, ms in totals.items()))
+            st.dataframe(last_rerun.sort_values("ms", ascending=False), hide_index=True)
+
+        rows = RECORDER.summary()
+        if rows:
+            st.markdown("**All sessions (recent window):**")
+            columns = ["category", "name", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+            st.dataframe(pd.DataFrame(rows)[columns].round(2), hide_index=True)
+        if st.button("Dump histograms", key="instrumentation_dump"):
+            st.caption(f"Written to {os.path.abspath(dump_histograms())}")
+
+    with st.sidebar.expander("🛠️ Admin: Session Memory", expanded=False):
+        from session_memory import (
+            allocation_snapshot, session_memory_report, start_allocation_tracing, stop_allocation_tracing
+        )
+
+        report = session_memory_report(state)
+        st.markdown(f"**This session:** {report['unique_bytes'].sum() / 1024:,.0f} KB across {len(report)} keys")
+        st.dataframe(report.head(25), hide_index=True)
+        if st.button("Start allocation tracing", key="memory_trace_start"):
+            start_allocation_tracing()
+        if st.button("Take allocation snapshot", key="memory_trace_snapshot"):
+            snapshot = allocation_snapshot()
+            if snapshot is None:
+                st.caption("Allocation tracing is not running.")
+            else:
+                st.dataframe(snapshot, hide_index=True)
+        if st.button("Stop allocation tracing", key="memory_trace_stop"):
+            stop_allocation_tracing()
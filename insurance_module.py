@@ -1,43 +1,91 @@
-# Ensure get_oop_correction_ratio is defined at the top before any import/logic
-def get_oop_correction_ratio(age, insurance_type, health_status):
-    insurance_type = insurance_type.lower()
-    health_status = health_status.lower()
+import numpy as np
+
+from result_cache import cached_projection
+
+# OOP correction ratios by age band, insurance key and health key
+OOP_CORRECTION_TABLE = {
+    "under_45": {"any": {"healthy": 1.0, "chronic_or_high": 1.1}},
+    "45_54": {"any": {"healthy": 1.2, "chronic_or_high": 1.4}},
+    "55_64": {"any": {"healthy": 1.6, "chronic_or_high": 2.0}},
+    "65_plus": {
+        "medicare_advantage": {"healthy": 2.5, "chronic_or_high": 3.0},
+        "traditional_medicare": {"healthy": 3.5, "chronic_or_high": 4.0},
+    },
+}
 
+AGE_KEYS = ["under_45", "45_54", "55_64", "65_plus"]
+INSURANCE_KEYS = ["any", "medicare_advantage", "traditional_medicare"]
+HEALTH_KEYS = ["healthy", "chronic_or_high"]
+
+
+def _build_oop_correction_array():
+    """
+    Dense (age band × insurance key × health key) version of OOP_CORRECTION_TABLE.
+    Combinations missing from the table fall back to 1.0.
+    """
+    ratios = np.ones((len(AGE_KEYS), len(INSURANCE_KEYS), len(HEALTH_KEYS)))
+    for a, age_key in enumerate(AGE_KEYS):
+        for i, insurance_key in enumerate(INSURANCE_KEYS):
+            for h, health_key in enumerate(HEALTH_KEYS):
+                ratios[a, i, h] = OOP_CORRECTION_TABLE[age_key].get(insurance_key, {}).get(health_key, 1.0)
+    ratios.setflags(write=False)
+    return ratios
+
+
+OOP_CORRECTION_RATIOS = _build_oop_correction_array()
+_OOP_CORRECTION_LOOKUP = OOP_CORRECTION_RATIOS.tolist()  # nested lists for fast scalar lookups
+
+
+def age_band_index(age):
+    """
+    Index into AGE_KEYS for a scalar age.
+    """
     if age < 45:
-        age_key = "under_45"
+        return 0
     elif age <= 54:
-        age_key = "45_54"
+        return 1
     elif age <= 64:
-        age_key = "55_64"
-    else:
-        age_key = "65_plus"
+        return 2
+    return 3
+
 
+def age_band_indices(ages):
+    """
+    Index into AGE_KEYS for an array of ages.
+    """
+    ages = np.asarray(ages)
+    return (ages >= 45).astype(int) + (ages > 54) + (ages > 64)
+
+
+def insurance_key_index(insurance_type):
+    """
+    Index into INSURANCE_KEYS for an insurance type label.
+    """
+    insurance_type = insurance_type.lower()
     if insurance_type in ["medicare", "traditional medicare"]:
-        insurance_key = "traditional_medicare"
+        return INSURANCE_KEYS.index("traditional_medicare")
     elif insurance_type in ["medicare advantage"]:
-        insurance_key = "medicare_advantage"
-    else:
-        insurance_key = "any"
-
-    if health_status == "healthy":
-        health_key = "healthy"
-    else:
-        health_key = "chronic_or_high"
-
-    table = {
-        "under_45": {"any": {"healthy": 1.0, "chronic_or_high": 1.1}},
-        "45_54": {"any": {"healthy": 1.2, "chronic_or_high": 1.4}},
-        "55_64": {"any": {"healthy": 1.6, "chronic_or_high": 2.0}},
-        "65_plus": {
-            "medicare_advantage": {"healthy": 2.5, "chronic_or_high": 3.0},
-            "traditional_medicare": {"healthy": 3.5, "chronic_or_high": 4.0},
-        },
-    }
+        return INSURANCE_KEYS.index("medicare_advantage")
+    return INSURANCE_KEYS.index("any")
 
-    try:
-        return table[age_key][insurance_key][health_key]
-    except KeyError:
-        return 1.0  # Fallback for unexpected cases
+
+def health_key_index(health_status):
+    """
+    Index into HEALTH_KEYS for a health status label.
+    """
+    return 0 if health_status.lower() == "healthy" else 1
+
+
+def get_oop_correction_ratios(ages, insurance_type, health_status):
+    """
+    Vectorized get_oop_correction_ratio over an array of ages.
+    """
+    return OOP_CORRECTION_RATIOS[age_band_indices(ages), insurance_key_index(insurance_type), health_key_index(health_status)]
+
+
+def get_oop_correction_ratio(age, insurance_type, health_status):
+    # Thin scalar wrapper over the precomputed dense table
+    return _OOP_CORRECTION_LOOKUP[age_band_index(age)][insurance_key_index(insurance_type)][health_key_index(health_status)]
 
 
 def get_base_oop(insurance_type, family_status):
@@ -63,52 +111,75 @@ def get_base_premium(insurance_type, family_status):
     }
     return premium_lookup.get(insurance_type, {}).get(family_status, 0)
 
-def get_insurance_costs_over_time(profile, years):
+# National average premiums and OOP by insurance key and family status
+NATIONAL_PREMIUMS = {
+    "esi": {"single": 1401, "family": 6575},
+    "aca": {"single": 5472, "family": 11738},
+    "medicare_advantage": {"single": 1200, "family": 2400},
+    "traditional_medicare": {"single": 1800, "family": 3600}
+}
+
+NATIONAL_OOP = {
+    "esi": {"single": 1800, "family": 3600},
+    "aca": {"single": 4800, "family": 9600},
+    "medicare_advantage": {"single": 4000, "family": 8000},
+    "traditional_medicare": {"single": 6000, "family": 12000}
+}
+
+UNINSURED_OOP = {"single": 6500, "family": 13000}
+
+
+def get_insurance_cost_arrays(profile, years):
+    """
+    Premium and OOP for every projected year in one shot.
+
+    Returns:
+    - dict with "premium" and "oop" np.ndarrays of length years
+    """
     family_status = profile.get("family_status", "single")
     insurance_type = profile.get("insurance_type", "ESI")
     health_status = profile.get("health_status", "healthy")
     age = profile.get("age", 30)
 
-    national_premiums = {
-        "esi": {"single": 1401, "family": 6575},
-        "aca": {"single": 5472, "family": 11738},
-        "medicare_advantage": {"single": 1200, "family": 2400},
-        "traditional_medicare": {"single": 1800, "family": 3600}
-    }
-
-    national_oop = {
-        "esi": {"single": 1800, "family": 3600},
-        "aca": {"single": 4800, "family": 9600},
-        "medicare_advantage": {"single": 4000, "family": 8000},
-        "traditional_medicare": {"single": 6000, "family": 12000}
-    }
-
-    uninsured_oop = {"single": 6500, "family": 13000}
-
-    premium_list = []
-    oop_list = []
+    if insurance_type == "Uninsured":
+        return {
+            "premium": np.zeros(years),
+            "oop": np.full(years, float(UNINSURED_OOP.get(family_status, 6500))),
+        }
 
     # Normalize insurance key for lookup
     insurance_type_key = insurance_type.lower().replace(" ", "_")
+    base_premium = NATIONAL_PREMIUMS.get(insurance_type_key, {}).get(family_status, 0)
+    base_oop = NATIONAL_OOP.get(insurance_type_key, {}).get(family_status, 0)
+
+    # Apply age and risk correction for every year at once
+    ages = age + np.arange(years)
+    age_factor = 1 + 0.03 * np.maximum(ages - 30, 0)
+    risk_factor = get_oop_correction_ratios(ages, insurance_type, health_status)
 
-    for i in range(years):
-        current_age = age + i
+    return {
+        "premium": base_premium * age_factor * risk_factor,
+        "oop": base_oop * age_factor * risk_factor,
+    }
 
-        if insurance_type == "Uninsured":
-            premium = 0
-            oop = uninsured_oop.get(family_status, 6500)
-        else:
-            base_premium = national_premiums.get(insurance_type_key, {}).get(family_status, 0)
-            base_oop = national_oop.get(insurance_type_key, {}).get(family_status, 0)
 
-            # Apply age and risk correction (using get_oop_correction_ratio)
-            age_factor = 1 + 0.03 * max(current_age - 30, 0)
-            risk_factor = get_oop_correction_ratio(current_age, insurance_type, health_status)
+@cached_projection
+def get_insurance_costs_over_time(profile, years):
+    costs = get_insurance_cost_arrays(profile, years)
+    return {"premium": costs["premium"].tolist(), "oop": costs["oop"].tolist()}
 
-            premium = base_premium * age_factor * risk_factor
-            oop = base_oop * age_factor * risk_factor
 
-        premium_list.append(premium)
-        oop_list.append(oop)
+def get_insurance_cost_matrix(profiles, years):
+    """
+    Batch version of get_insurance_cost_arrays for many profiles sharing a horizon.
 
-    return {"premium": premium_list, "oop": oop_list}
\ No newline at end of file
+    Returns:
+    - dict with "premium" and "oop" arrays of shape (profiles × years)
+    """
+    premium = np.empty((len(profiles), years))
+    oop = np.empty((len(profiles), years))
+    for j, profile in enumerate(profiles):
+        costs = get_insurance_cost_arrays(profile, years)
+        premium[j] = costs["premium"]
+        oop[j] = costs["oop"]
+    return {"premium": premium, "oop": oop}
@@ -0,0 +1,372 @@
+# monte_carlo_module.py
+#
+# Monte Carlo mode for the short/mid/long-term capital buckets. Annual bucket returns are
+# drawn as correlated normals for many paths at once and fed through the vectorized
+# kernels in simulation_kernel, so a 10k path × 60 year run stays interactive.
+# Variance reduction (antithetic pairs, Sobol points, common random numbers across compared
+# scenarios) and adaptive stopping reach a given precision with fewer paths.
+
+import numpy as np
+import pandas as pd
+
+from parallel_runner import DEFAULT_SHARD_SIZE, map_shards, run_sharded
+from quasi_random import brownian_bridge, normal_ppf, sobol_points
+from simulation_kernel import (
+    INVESTMENT_STRATEGY_DEFAULTS,
+    capital_fund_path_by_year,
+    compound_with_contributions_by_year,
+    growth_factors,
+)
+from streaming_quantiles import DEFAULT_RELATIVE_ACCURACY, DepletionCounter, QuantileSketch
+
+BUCKETS = ["short_term", "mid_term", "long_term"]
+
+# Annual return volatility per bucket (cash-like, balanced, equity-like)
+BUCKET_VOLATILITY = {"short_term": 0.01, "mid_term": 0.07, "long_term": 0.15}
+
+# Correlation of annual returns between buckets, ordered as BUCKETS
+BUCKET_CORRELATION = np.array([
+    [1.0, 0.2, 0.0],
+    [0.2, 1.0, 0.7],
+    [0.0, 0.7, 1.0],
+])
+
+DEFAULT_PATHS = 10000
+PERCENTILES = (5, 50, 95)
+# Bands reported by large streaming runs (Step 6 advanced simulation)
+STREAMING_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Returns are floored just above -100% so balances stay well defined
+MIN_ANNUAL_RETURN = -0.99
+
+# How the standard normal shocks behind bucket returns are drawn: independent draws, antithetic
+# pairs (every path has a mirror path with negated shocks) or randomized Sobol points
+SAMPLING_METHODS = ("pseudo", "antithetic", "sobol")
+
+# Paths per shard of Sobol runs and per batch of adaptive runs (Sobol point sets are most even at
+# powers of two); each batch is an independent replicate, so batch means give error bars
+BATCH_PATHS = 1024
+
+# Adaptive runs check their depletion-probability confidence interval after every batch,
+# once at least this many batches are in
+MIN_ADAPTIVE_BATCHES = 10
+
+# Two-sided 95% normal quantile
+CONFIDENCE_Z = 1.96
+
+
+def draw_bucket_shocks(n_paths, years, correlation=None, seed=None, sampling="pseudo"):
+    """
+    Draw correlated standard normal shocks behind each bucket's annual returns.
+
+    Parameters:
+    - n_paths, years: shape of the simulation
+    - correlation: 3 × 3 correlation matrix ordered as BUCKETS (defaults to BUCKET_CORRELATION)
+    - seed: int or np.random.Generator for reproducible draws
+    - sampling: one of SAMPLING_METHODS; "antithetic" pairs path i with path i + (n_paths + 1) // 2
+      (negated shocks), "sobol" maps one randomly shifted Sobol point per path to normals through
+      a Brownian bridge over the years
+
+    Returns:
+    - np.ndarray of shape (paths × years × buckets)
+    """
+    correlation = BUCKET_CORRELATION if correlation is None else np.asarray(correlation, dtype=float)
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    chol = np.linalg.cholesky(correlation)
+    shape = (n_paths, years, len(BUCKETS))
+
+    if sampling == "pseudo":
+        normals = rng.standard_normal(shape)
+    elif sampling == "antithetic":
+        half = rng.standard_normal(((n_paths + 1) // 2,) + shape[1:])
+        normals = np.concatenate([half, -half])[:n_paths]
+    elif sampling == "sobol":
+        # Brownian bridge: the first (most evenly spread) Sobol coordinates set each bucket's
+        # cumulative move over the horizon, later ones the year-to-year detail
+        normals = brownian_bridge(normal_ppf(sobol_points(n_paths, years * len(BUCKETS), rng)).reshape(shape))
+    else:
+        raise ValueError(f"Unknown sampling {sampling!r}; choose one of {', '.join(SAMPLING_METHODS)}")
+    return normals @ chol.T
+
+
+def bucket_returns_from_shocks(shocks, mean_rates, volatilities=None):
+    """
+    Annual bucket returns for the given expected returns and volatilities, from draw_bucket_shocks
+    output. Reusing one set of shocks for several scenarios gives common random numbers.
+    """
+    volatilities = volatilities or BUCKET_VOLATILITY
+    means = np.array([mean_rates[bucket] for bucket in BUCKETS], dtype=float)
+    sigmas = np.array([volatilities[bucket] for bucket in BUCKETS], dtype=float)
+    return np.maximum(means + shocks * sigmas, MIN_ANNUAL_RETURN)
+
+
+def draw_bucket_returns(n_paths, years, mean_rates, volatilities=None, correlation=None, seed=None,
+                        sampling="pseudo"):
+    """
+    Draw correlated annual returns for each bucket.
+
+    Parameters:
+    - n_paths, years: shape of the simulation
+    - mean_rates: dict of expected annual return per bucket ("short_term", "mid_term", "long_term")
+    - volatilities: dict of annual volatility per bucket (defaults to BUCKET_VOLATILITY)
+    - correlation: 3 × 3 correlation matrix ordered as BUCKETS (defaults to BUCKET_CORRELATION)
+    - seed: int or np.random.Generator for reproducible draws
+    - sampling: one of SAMPLING_METHODS (see draw_bucket_shocks)
+
+    Returns:
+    - np.ndarray of shape (paths × years × buckets)
+    """
+    shocks = draw_bucket_shocks(n_paths, years, correlation, seed, sampling)
+    return bucket_returns_from_shocks(shocks, mean_rates, volatilities)
+
+
+def blended_returns(bucket_returns, allocations):
+    """
+    Portfolio return per path and year for a fixed bucket mix, rebalanced annually.
+
+    Returns:
+    - np.ndarray of shape (paths × years)
+    """
+    weights = np.array([allocations.get(bucket, 0) for bucket in BUCKETS], dtype=float)
+    return bucket_returns @ weights
+
+
+def percentile_bands(values, percentiles=PERCENTILES):
+    """
+    Per-year percentiles across paths.
+
+    Returns:
+    - dict like {"P5": (years,), "P50": (years,), "P95": (years,)}
+    """
+    bands = np.percentile(values, percentiles, axis=0)
+    return {f"P{p}": band for p, band in zip(percentiles, bands)}
+
+
+def depletion_ages(capital_used, costs, ages):
+    """
+    Age at which each path first fails to cover that year's cost in full.
+    Paths that never deplete within the horizon get np.inf.
+    """
+    shortfall = capital_used < np.asarray(costs, dtype=float) - 1e-9
+    depleted = shortfall.any(axis=-1)
+    first = shortfall.argmax(axis=-1)
+    return np.where(depleted, np.asarray(ages)[first], np.inf)
+
+
+def summarize_depletion(depletion, percentiles=PERCENTILES):
+    """
+    Depletion probability and depletion-age percentiles (np.inf means not depleted within horizon).
+    """
+    summary = {"probability": float(np.isfinite(depletion).mean())}
+    values = np.percentile(depletion, percentiles, method="inverted_cdf")
+    summary.update({f"P{p}": float(v) for p, v in zip(percentiles, values)})
+    return summary
+
+
+def depletion_ci_width(batch_probabilities):
+    """
+    Width of the 95% confidence interval on the depletion probability, from the probabilities of
+    independent equal-size batches (batch means, so it also holds for antithetic and Sobol batches).
+    """
+    probabilities = np.asarray(batch_probabilities, dtype=float)
+    if len(probabilities) < 2:
+        return float("inf")
+    return float(2 * CONFIDENCE_Z * probabilities.std(ddof=1) / np.sqrt(len(probabilities)))
+
+
+def _capital_paths_shard(start, stop, rng, costs, annual_contribution, mean_rates, allocations, volatilities,
+                         correlation, sampling="pseudo", starting_capital=0.0):
+    """
+    Capital fund paths start..stop of a sharded Monte Carlo run (see parallel_runner.run_sharded).
+    """
+    returns = blended_returns(
+        draw_bucket_returns(stop - start, len(costs), mean_rates, volatilities, correlation, rng, sampling),
+        allocations
+    )
+    capital_used, capital_remaining = capital_fund_path_by_year(costs, annual_contribution, returns, starting_capital)
+    return {"capital_used": capital_used, "capital_remaining": capital_remaining}
+
+
+def _capital_sketch_shard(start, stop, rng, costs, ages, annual_contribution, mean_rates, allocations,
+                          volatilities, correlation, relative_accuracy, sampling="pseudo", starting_capital=0.0):
+    """
+    Capital fund paths start..stop of a streaming Monte Carlo run, folded into mergeable sketches.
+    """
+    paths = _capital_paths_shard(start, stop, rng, costs, annual_contribution, mean_rates, allocations,
+                                 volatilities, correlation, sampling, starting_capital)
+    sketch = QuantileSketch(len(costs), relative_accuracy).update(paths["capital_remaining"])
+    depletion = DepletionCounter(ages).update(depletion_ages(paths["capital_used"], costs, ages))
+    return sketch, depletion
+
+
+def _strategy_terms(inputs):
+    # Annual contribution, starting capital, expected bucket returns and bucket mix from
+    # run_investment_strategy inputs (plus the optional "starting_capital")
+    params = dict(INVESTMENT_STRATEGY_DEFAULTS)
+    params.update(inputs or {})
+
+    surplus_contribution = params["calculated_surplus"] * params["capital_care_alloc"]
+    premium_contribution = params["reallocated_premium"] if params["eligible_for_reallocation"] else 0.0
+    annual_contribution = surplus_contribution + premium_contribution
+
+    mean_rates = {bucket: params[f"{bucket}_rate"] for bucket in BUCKETS}
+    allocations = {bucket: params[f"{bucket}_alloc"] for bucket in BUCKETS}
+    return annual_contribution, params.get("starting_capital", 0.0), mean_rates, allocations
+
+
+def _strategy_result(ages, annual_contribution, remaining_bands, depletion_summary, n_paths):
+    bands = pd.DataFrame({"Age": ages})
+    for label, band in remaining_bands.items():
+        bands[f"Capital Fund {label}"] = band
+
+    return {
+        "bands": bands,
+        "depletion": depletion_summary,
+        "total_capital_contribution": annual_contribution,
+        "n_paths": n_paths,
+    }
+
+
+def run_investment_strategy_mc(cost_df, inputs=None, n_paths=DEFAULT_PATHS, volatilities=None,
+                               correlation=None, seed=None, workers=None, percentiles=PERCENTILES,
+                               streaming=False, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, sampling="pseudo",
+                               target_ci_width=None):
+    """
+    Monte Carlo counterpart of simulation_kernel.run_investment_strategy.
+
+    The bucket rates in inputs ("short_term_rate", ...) become the expected returns;
+    each path draws its own annual returns and runs the contribute-grow-withdraw recurrence.
+    An optional "starting_capital" in inputs is invested before the first year (default 0).
+
+    With workers set, paths are split into shards with their own seeds and simulated on that
+    many processes (parallel_runner); results then depend on seed only, not on workers, but
+    differ from the single-stream draws used when workers is None.
+
+    With streaming, each shard of paths is folded into mergeable sketches (streaming_quantiles)
+    and discarded, so memory stays bounded at 100k+ paths. Shards use the same seeds as the
+    sharded run: depletion results are identical and bands agree within relative_accuracy.
+
+    sampling picks the variance reduction (SAMPLING_METHODS). Sharded Sobol runs give every shard
+    of BATCH_PATHS paths its own random shift, i.e. each shard is an independent replicate.
+
+    With target_ci_width (e.g. 0.01 for ±0.5 percentage points), the run is adaptive: paths are
+    simulated and streamed in batches of BATCH_PATHS until the 95% confidence interval on the
+    depletion probability is narrower than the target, with n_paths as the cap.
+
+    Returns:
+    - dict with "bands" (DataFrame of Age and one Capital Fund column per percentile), "depletion"
+      (probability and depletion-age percentiles), "total_capital_contribution" and "n_paths"
+      (paths simulated); adaptive runs add "depletion_ci_width"
+    """
+    costs = cost_df["Healthcare Cost"].to_numpy(dtype=float)
+    ages = cost_df["Age"].to_numpy() if "Age" in cost_df else np.arange(len(costs))
+    annual_contribution, starting_capital, mean_rates, allocations = _strategy_terms(inputs)
+    if sampling not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling {sampling!r}; choose one of {', '.join(SAMPLING_METHODS)}")
+    shard_size = BATCH_PATHS if sampling == "sobol" or target_ci_width is not None else DEFAULT_SHARD_SIZE
+
+    if streaming or target_ci_width is not None:
+        sketch = QuantileSketch(len(costs), relative_accuracy)
+        depletion_counter = DepletionCounter(ages)
+        args = (costs, ages, annual_contribution, mean_rates, allocations, volatilities, correlation,
+                relative_accuracy, sampling, starting_capital)
+        shards = map_shards(_capital_sketch_shard, n_paths, args=args, seed=seed, workers=workers or 1,
+                            shard_size=shard_size)
+        batch_probabilities = []
+        try:
+            for shard_sketch, shard_depletion in shards:
+                sketch.merge(shard_sketch)
+                depletion_counter.merge(shard_depletion)
+                if target_ci_width is None:
+                    continue
+                batch_probabilities.append(shard_depletion.summary(())["probability"])
+                if (len(batch_probabilities) >= MIN_ADAPTIVE_BATCHES
+                        and depletion_ci_width(batch_probabilities) < target_ci_width):
+                    break
+        finally:
+            shards.close()  # Stops handing out batches (in-flight ones finish)
+        result = _strategy_result(ages, annual_contribution, sketch.quantiles(percentiles),
+                                  depletion_counter.summary(percentiles), depletion_counter.count)
+        if target_ci_width is not None:
+            result["depletion_ci_width"] = depletion_ci_width(batch_probabilities)
+        return result
+
+    if workers is None:
+        returns = blended_returns(
+            draw_bucket_returns(n_paths, len(costs), mean_rates, volatilities, correlation, seed, sampling),
+            allocations
+        )
+        capital_used, capital_remaining = capital_fund_path_by_year(costs, annual_contribution, returns,
+                                                                    starting_capital)
+        depletion_summary = summarize_depletion(depletion_ages(capital_used, costs, ages), percentiles)
+        remaining_bands = percentile_bands(capital_remaining, percentiles)
+    else:
+        outputs = {"capital_used": ((len(costs),), np.float64), "capital_remaining": ((len(costs),), np.float64)}
+        args = (costs, annual_contribution, mean_rates, allocations, volatilities, correlation, sampling,
+                starting_capital)
+        with run_sharded(_capital_paths_shard, n_paths, outputs, args=args, seed=seed, workers=workers,
+                         shard_size=shard_size) as paths:
+            depletion_summary = summarize_depletion(depletion_ages(paths["capital_used"], costs, ages), percentiles)
+            remaining_bands = percentile_bands(paths["capital_remaining"], percentiles)
+            del paths
+
+    return _strategy_result(ages, annual_contribution, remaining_bands, depletion_summary, n_paths)
+
+
+def compare_strategies_mc(cost_df, scenarios, n_paths=DEFAULT_PATHS, volatilities=None, correlation=None,
+                          seed=None, percentiles=PERCENTILES, sampling="pseudo"):
+    """
+    run_investment_strategy_mc for several input sets on the same market paths (common random
+    numbers): one set of shocks is drawn and every scenario's returns are built from it, so
+    differences between scenarios reflect their inputs rather than sampling noise.
+
+    Parameters:
+    - scenarios: dict of scenario name → inputs, as for run_investment_strategy_mc
+    - other parameters: as for run_investment_strategy_mc (single process, not streamed)
+
+    Returns:
+    - dict of scenario name → run_investment_strategy_mc result
+    """
+    costs = cost_df["Healthcare Cost"].to_numpy(dtype=float)
+    ages = cost_df["Age"].to_numpy() if "Age" in cost_df else np.arange(len(costs))
+    shocks = draw_bucket_shocks(n_paths, len(costs), correlation, seed, sampling)
+
+    results = {}
+    for name, inputs in scenarios.items():
+        annual_contribution, starting_capital, mean_rates, allocations = _strategy_terms(inputs)
+        returns = blended_returns(bucket_returns_from_shocks(shocks, mean_rates, volatilities), allocations)
+        capital_used, capital_remaining = capital_fund_path_by_year(costs, annual_contribution, returns,
+                                                                    starting_capital)
+        results[name] = _strategy_result(
+            ages, annual_contribution, percentile_bands(capital_remaining, percentiles),
+            summarize_depletion(depletion_ages(capital_used, costs, ages), percentiles), n_paths
+        )
+    return results
+
+
+def simulate_full_investment_mc(years, net_income_annual, savings_rate, savings_growth, capital_allocations,
+                                growth_short, growth_mid, growth_long, start_short_term=0, start_mid_term=0,
+                                start_long_term=0, n_paths=DEFAULT_PATHS, volatilities=None, correlation=None,
+                                seed=None):
+    """
+    Monte Carlo counterpart of the short/mid/long bucket part of simulate_full_investment_strategy
+    for a single profile. growth_short/mid/long become the expected returns of each bucket.
+
+    Returns:
+    - dict mapping each bucket (and "total") to its percentile bands {"P5": ..., "P50": ..., "P95": ...}
+    """
+    mean_rates = {"short_term": growth_short, "mid_term": growth_mid, "long_term": growth_long}
+    starts = {"short_term": start_short_term, "mid_term": start_mid_term, "long_term": start_long_term}
+    returns = draw_bucket_returns(n_paths, years, mean_rates, volatilities, correlation, seed)
+    annual_savings = net_income_annual * savings_rate * growth_factors(savings_growth, years)
+
+    result = {}
+    total = 0.0
+    for k, bucket in enumerate(BUCKETS):
+        balances = compound_with_contributions_by_year(
+            starts[bucket], returns[:, :, k], annual_savings * capital_allocations.get(bucket, 0)
+        )
+        total = total + balances
+        result[bucket] = percentile_bands(balances)
+    result["total"] = percentile_bands(total)
+    return result
@@ -0,0 +1,187 @@
+# parallel_runner.py
+#
+# Multi-core execution for heavy runs (Monte Carlo paths, batch books of households). Work is split
+# into fixed-size shards, each with its own seed spawned from the run seed, so results depend only on
+# the seed — not on how many workers ran them. Workers write numeric results straight into shared
+# memory buffers owned by the parent instead of pickling large arrays back.
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+# Environment variable that caps the worker count (e.g., on shared Streamlit hosts)
+WORKERS_ENV_VAR = "HSS_MAX_WORKERS"
+
+# Work items (paths, households) per shard
+DEFAULT_SHARD_SIZE = 2000
+
+# "spawn" is safe inside threaded servers such as Streamlit; fork can deadlock there
+DEFAULT_START_METHOD = "spawn"
+
+
+def resolve_workers(workers=None):
+    """
+    Worker count to use: the requested number (default: all cores), capped by HSS_MAX_WORKERS.
+    """
+    workers = workers or os.cpu_count() or 1
+    cap = os.environ.get(WORKERS_ENV_VAR)
+    if cap:
+        workers = min(workers, max(int(cap), 1))
+    return max(int(workers), 1)
+
+
+def shard_bounds(n_items, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    (start, stop) ranges covering n_items in shards of at most shard_size.
+    """
+    shard_size = max(int(shard_size), 1)
+    return [(start, min(start + shard_size, n_items)) for start in range(0, n_items, shard_size)]
+
+
+def shard_seeds(seed, n_shards):
+    """
+    One independent np.random.SeedSequence per shard, spawned from the run seed.
+    """
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return root.spawn(n_shards)
+
+
+def process_pool(workers, initializer=None, start_method=DEFAULT_START_METHOD):
+    """
+    ProcessPoolExecutor with the given worker count and start method.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context(start_method), initializer=initializer)
+
+
+def imap_ordered(pool, fn, items, max_in_flight):
+    """
+    Results of fn(item) for each item, in input order, with at most max_in_flight tasks submitted
+    at once so a long input stream is never fully materialized.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def map_shards(fn, n_items, args=(), seed=None, workers=None, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Run fn over n_items in shards and yield each shard's result, in shard order.
+
+    Same sharding and seeding as run_sharded, but results are returned (pickled) rather than
+    written to shared memory, so it suits small per-shard summaries such as mergeable sketches.
+
+    Parameters:
+    - fn: module-level function fn(start, stop, rng, *args)
+    - seed, workers, shard_size: as for run_sharded
+    """
+    bounds = shard_bounds(n_items, shard_size)
+    seeds = shard_seeds(seed, len(bounds))
+    workers = min(resolve_workers(workers), max(len(bounds), 1))
+
+    if workers == 1:
+        for (start, stop), shard_seed in zip(bounds, seeds):
+            yield fn(start, stop, np.random.default_rng(shard_seed), *args)
+        return
+
+    with process_pool(workers) as pool:
+        shards = [(fn, start, stop, shard_seed, args) for (start, stop), shard_seed in zip(bounds, seeds)]
+        yield from imap_ordered(pool, _map_shard, shards, max_in_flight=2 * workers)
+
+
+def _map_shard(shard):
+    fn, start, stop, seed, args = shard
+    return fn(start, stop, np.random.default_rng(seed), *args)
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Workers share the parent's resource tracker, so registering the block again is harmless;
+        # the parent unlinks it
+        return shared_memory.SharedMemory(name=name)
+
+
+def _run_shard(fn, start, stop, seed, buffers, args):
+    """
+    Worker side of run_sharded: compute one shard and write it into the shared output buffers.
+    """
+    blocks = {name: _attach(shm_name) for name, (shm_name, _, _) in buffers.items()}
+    try:
+        outputs = {
+            name: np.ndarray(shape, dtype=dtype, buffer=blocks[name].buf)
+            for name, (_, shape, dtype) in buffers.items()
+        }
+        for name, values in fn(start, stop, np.random.default_rng(seed), *args).items():
+            outputs[name][start:stop] = values
+        del outputs
+    finally:
+        for block in blocks.values():
+            block.close()
+
+
+@contextmanager
+def run_sharded(fn, n_items, outputs, args=(), seed=None, workers=None, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Run fn over n_items in shards, in parallel, collecting numeric results in shared memory.
+
+    Parameters:
+    - fn: module-level function fn(start, stop, rng, *args) returning a dict of output name →
+      array whose first dimension is stop - start (rng is the shard's np.random.Generator)
+    - n_items: number of work items (paths, profiles, ...)
+    - outputs: dict of output name → (trailing shape tuple, dtype); each output has shape
+      (n_items, *trailing shape)
+    - seed: run seed; shard seeds are spawned from it, so results do not depend on workers
+    - workers: worker processes (resolve_workers); 1 runs every shard in-process
+
+    Yields:
+    - dict of output name → np.ndarray view of the filled buffers, only valid inside the with
+      block (copy anything that must outlive it)
+    """
+    bounds = shard_bounds(n_items, shard_size)
+    seeds = shard_seeds(seed, len(bounds))
+    workers = min(resolve_workers(workers), max(len(bounds), 1))
+
+    if workers == 1:
+        arrays = {name: np.empty((n_items,) + tuple(shape), dtype=dtype) for name, (shape, dtype) in outputs.items()}
+        for (start, stop), shard_seed in zip(bounds, seeds):
+            for name, values in fn(start, stop, np.random.default_rng(shard_seed), *args).items():
+                arrays[name][start:stop] = values
+        yield arrays
+        return
+
+    blocks = {}
+    arrays = {}
+    try:
+        buffers = {}
+        for name, (shape, dtype) in outputs.items():
+            shape = (n_items,) + tuple(shape)
+            dtype = np.dtype(dtype)
+            blocks[name] = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+            buffers[name] = (blocks[name].name, shape, dtype.str)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=blocks[name].buf)
+
+        with process_pool(workers) as pool:
+            futures = [
+                pool.submit(_run_shard, fn, start, stop, shard_seed, buffers, args)
+                for (start, stop), shard_seed in zip(bounds, seeds)
+            ]
+            for future in futures:
+                future.result()
+        yield arrays
+    finally:
+        arrays.clear()  # Drop the views so the blocks can be closed
+        for block in blocks.values():
+            try:
+                block.close()
+            except BufferError:
+                pass  # A caller kept a view; the mapping goes away with it
+            block.unlink()
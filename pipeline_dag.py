@@ -0,0 +1,483 @@
+# pipeline_dag.py
+#
+# Incremental recomputation for the six-step pipeline. Each derived session-state artifact
+# (household and income projections → premiums/OOP → expense_df/surplus → retirement drawdown)
+# is a node that declares the session keys it reads and the nodes it depends on. A node is
+# recomputed only when the fingerprint of its inputs, or of an upstream node, has changed.
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from chronic_module import get_chronic_multiplier
+from instrumentation import timed
+from projection import Projection, padded
+from result_cache import canonical_key
+from simulation_kernel import (
+    RETIREMENT_AGE, drawdown_capital, project_household_income, project_retirement_savings, retirement_deficits
+)
+
+# Session-state key holding the last fingerprint of every node
+PIPELINE_STATE_KEY = "_pipeline_fingerprints"
+# Session-state key holding the session keys each node wrote when it last ran
+PIPELINE_OUTPUTS_STATE_KEY = "_pipeline_outputs"
+
+# Longest projection Step 4 will chart
+MAX_PROJECTION_YEARS = 85
+
+
+def _fingerprint_value(value):
+    """
+    Reduce a session value to something canonical_key can hash (DataFrames, arrays and
+    projections become a content digest).
+    """
+    if isinstance(value, Projection):
+        digest = hashlib.sha256(np.ascontiguousarray(value.data).tobytes())
+        return ["Projection", list(value.names), value.start_age, str(value.data.dtype), digest.hexdigest()]
+    if isinstance(value, np.ndarray):
+        digest = hashlib.sha256(np.ascontiguousarray(value).tobytes())
+        return ["ndarray", str(value.dtype), list(value.shape), digest.hexdigest()]
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha256(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        columns = list(map(str, value.columns)) if isinstance(value, pd.DataFrame) else [str(value.name)]
+        return [type(value).__name__, columns, digest.hexdigest()]
+    if isinstance(value, dict):
+        return {k: _fingerprint_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint_value(v) for v in value]
+    return value
+
+
+class PipelineDAG:
+    """
+    Dependency graph over session-state artifacts.
+
+    Nodes are registered in dependency order with add_node; run() refreshes the requested
+    nodes and their upstream nodes, skipping every node whose fingerprint is unchanged.
+    """
+
+    def __init__(self):
+        self.nodes = OrderedDict()
+
+    def add_node(self, name, compute, inputs=None, deps=(), outputs=(), state_keys=None):
+        """
+        Register a node.
+
+        Parameters:
+        - compute: function called with the node's inputs as keyword arguments; returns a dict of
+          session keys to write, or None when its inputs are not available yet
+        - inputs: dict mapping each argument of compute to its default value
+        - deps: upstream node names that must be refreshed first
+        - outputs: session keys the node always writes (a missing one forces a recompute)
+        - state_keys: session key for arguments whose name differs from it (e.g., "401k_growth_rate")
+        """
+        missing = [dep for dep in deps if dep not in self.nodes]
+        if missing:
+            raise ValueError(f"Unknown upstream nodes for {name}: {', '.join(missing)}")
+        self.nodes[name] = {"compute": compute, "inputs": dict(inputs or {}), "deps": tuple(deps),
+                            "outputs": tuple(outputs), "state_keys": dict(state_keys or {})}
+
+    def upstream(self, targets=None):
+        """
+        Node names needed for targets (all nodes by default), in dependency order.
+        """
+        if targets is None:
+            return list(self.nodes)
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.nodes[name]["deps"])
+        return [name for name in self.nodes if name in needed]
+
+    def downstream(self, name):
+        """
+        Names of all nodes that depend on name, directly or transitively.
+        """
+        affected = {name}
+        for node_name, node in self.nodes.items():
+            if any(dep in affected for dep in node["deps"]):
+                affected.add(node_name)
+        affected.discard(name)
+        return [node_name for node_name in self.nodes if node_name in affected]
+
+    def _input_values(self, name, state):
+        state_keys = self.nodes[name]["state_keys"]
+        return {arg: state.get(state_keys.get(arg, arg), default) for arg, default in self.nodes[name]["inputs"].items()}
+
+    def _fingerprint(self, name, state, fingerprints):
+        node = self.nodes[name]
+        upstream = [fingerprints.get(dep) for dep in node["deps"]]
+        return canonical_key(name, _fingerprint_value(self._input_values(name, state)), upstream)
+
+    def stale_nodes(self, state, targets=None):
+        """
+        Nodes that run() would recompute, without computing anything.
+        """
+        fingerprints = dict(state.get(PIPELINE_STATE_KEY, {}))
+        stale = []
+        for name in self.upstream(targets):
+            node = self.nodes[name]
+            if (any(dep in stale for dep in node["deps"])
+                    or self._fingerprint(name, state, fingerprints) != fingerprints.get(name)
+                    or any(key not in state for key in node["outputs"])):
+                stale.append(name)
+        return stale
+
+    def run(self, state, targets=None):
+        """
+        Bring targets (and their upstream nodes) up to date in state.
+
+        Returns:
+        - list of node names that were recomputed
+        """
+        fingerprints = dict(state.get(PIPELINE_STATE_KEY, {}))
+        written = dict(state.get(PIPELINE_OUTPUTS_STATE_KEY, {}))
+        recomputed = []
+        for name in self.upstream(targets):
+            node = self.nodes[name]
+            fingerprint = self._fingerprint(name, state, fingerprints)
+            if fingerprint == fingerprints.get(name) and all(key in state for key in node["outputs"]):
+                continue
+            with timed("compute", f"pipeline.{name}"):
+                result = node["compute"](**self._input_values(name, state))
+            for key, value in (result or {}).items():
+                state[key] = value
+            self._drop_superseded(state, name, list(result or {}), written)
+            fingerprints[name] = fingerprint
+            recomputed.append(name)
+        state[PIPELINE_STATE_KEY] = fingerprints
+        state[PIPELINE_OUTPUTS_STATE_KEY] = written
+        return recomputed
+
+    def _drop_superseded(self, state, name, keys, written):
+        # Keys the node wrote last time but not this time (e.g., an old expense_df next to a new
+        # expense_error) no longer match its inputs; drop them unless another node also writes them
+        others = {key for node_name, node_keys in written.items() if node_name != name for key in node_keys}
+        for key in set(written.get(name, ())) - set(keys) - others:
+            state.pop(key, None)
+        written[name] = keys
+
+    def evaluate(self, state, targets=None):
+        """
+        Compute targets (and their upstream nodes) into a plain dict, unconditionally and without
+        fingerprinting. For headless batch runs where every state is used once.
+
+        Returns:
+        - state, updated with every node's outputs
+        """
+        for name in self.upstream(targets):
+            result = self.nodes[name]["compute"](**self._input_values(name, state))
+            for key, value in (result or {}).items():
+                state[key] = value
+        return state
+
+    def invalidate(self, state, name):
+        """
+        Force name and everything downstream of it to recompute on the next run().
+        """
+        fingerprints = dict(state.get(PIPELINE_STATE_KEY, {}))
+        for node_name in [name] + self.downstream(name):
+            fingerprints.pop(node_name, None)
+        state[PIPELINE_STATE_KEY] = fingerprints
+
+
+# --- Step 2: household expenses, debt and baseline premiums ---
+def household_projection(cost_df, monthly_expenses, debt_monthly_payment, inflation_rate, base_premium):
+    if cost_df is None or monthly_expenses is None:
+        return None
+    years = len(cost_df)
+    growth = (1 + inflation_rate) ** np.arange(years)
+    projection = Projection(("Household", "Debt", "Premiums"), years)
+    projection["Household"] = monthly_expenses * 12 * growth
+    projection["Debt"] = np.full(years, debt_monthly_payment * 12)  # constant assumption
+    projection["Premiums"] = base_premium * growth
+    projection.freeze()
+    return {
+        "household_projection": projection,
+        "household_proj": projection["Household"],
+        "debt_proj": projection["Debt"],
+        "premiums": projection["Premiums"],
+        "projected_premiums": projection["Premiums"],
+    }
+
+
+# --- Step 2: income, savings and 401(k) projections ---
+def income_projection(cost_df, profile, step2_inputs, premium_inflation):
+    if cost_df is None or not step2_inputs:
+        return None
+    years = len(cost_df)
+    family_status = profile.get("family_status", "single")
+    user_age = profile.get("age", 30)
+
+    income = project_household_income(
+        years, user_age, step2_inputs["net_income_annual"], step2_inputs["income_growth"],
+        family_status=family_status,
+        partner_age=profile.get("partner_age", 65),
+        net_income_annual_partner=step2_inputs.get("net_income_annual_partner", 0),
+        income_growth_partner=step2_inputs.get("income_growth_partner", 0),
+        retirement_age=RETIREMENT_AGE
+    )
+    savings = project_retirement_savings(
+        years, user_age, premium_inflation,
+        start_401k_user=profile.get("start_401k_user", 0),
+        contrib_401k_annual=step2_inputs["contrib_401k_annual"],
+        growth_401k=step2_inputs["growth_401k"],
+        savings_start=step2_inputs["savings_start"],
+        annual_savings_contrib=step2_inputs["annual_contrib"],
+        savings_growth=step2_inputs["savings_growth"],
+        family_status=family_status,
+        partner_age=profile.get("partner_age", 65),
+        start_401k_partner=profile.get("start_401k_partner", 0),
+        partner_contrib_401k_annual=step2_inputs.get("partner_contrib_401k_annual", 0),
+        growth_401k_partner=profile.get("partner_growth_401k", step2_inputs["growth_401k"]),
+        retirement_age=RETIREMENT_AGE
+    )
+    projection = Projection.from_columns({
+        "Income": income["combined_income_proj"],
+        "Income Partner": income["income_proj_partner"],
+        "Savings": savings["savings_proj"],
+        "401(k)": savings["proj_401k"],
+        "401(k) Partner": savings["proj_401k_partner"],
+    }, years, start_age=user_age).freeze()
+    return {
+        "income_projection": projection,
+        "combined_income_proj": projection["Income"],
+        "income_proj": projection["Income"],
+        "income_proj_partner": projection["Income Partner"],
+        "savings_proj": projection["Savings"],
+        "proj_401k": projection["401(k)"],
+        "proj_401k_partner": projection["401(k) Partner"],
+    }
+
+
+# --- Step 3: premium and OOP projections ---
+def premiums_oop_projection(cost_df, profile, base_premium, base_oop, inflation_rate, chronic_multiplier,
+                            step3_calibrated_costs):
+    years = len(cost_df) if cost_df is not None else 0
+    user_age = profile.get("age", 40)
+
+    calibrated_costs = list(step3_calibrated_costs or [])
+    if calibrated_costs:
+        if len(calibrated_costs) < years:
+            calibrated_costs += [calibrated_costs[-1]] * (years - len(calibrated_costs))
+        projection = Projection.from_columns({"Healthcare": calibrated_costs}, years, start_age=user_age).freeze()
+        return {"cost_projection": projection, "healthcare": projection["Healthcare"], "ages": projection.ages}
+
+    base_premium *= chronic_multiplier
+    base_oop *= chronic_multiplier
+    growth = (1 + inflation_rate) ** np.arange(years)
+    projection = Projection(("Premiums", "OOP", "Healthcare"), years, start_age=user_age)
+    projection["Premiums"] = base_premium * growth
+    projection["OOP"] = base_oop * growth
+    projection["Healthcare"] = projection.total("Premiums", "OOP")
+    projection.freeze()
+    return {
+        "cost_projection": projection,
+        "premiums": projection["Premiums"],
+        "oop": projection["OOP"],
+        "healthcare": projection["Healthcare"],
+        "ages": projection.ages,
+    }
+
+
+# --- Step 4: retirement-adjusted expense projection and surplus ---
+# Column order of expense_df; Savings and 401(k) stay adjacent so capital_graph_df is a view
+EXPENSE_COLUMNS = ("Income", "Household", "Premiums", "OOP", "Total Expenses", "Surplus", "Savings", "401(k)", "Debt")
+
+
+def _array(values):
+    """
+    A writable float copy of a session list/array (None becomes empty).
+    """
+    return np.array(values if values is not None else [], dtype=float).ravel()
+
+
+def _combined_401k(proj_401k_user, proj_401k_partner):
+    user = _array(proj_401k_user)
+    partner = _array(proj_401k_partner)
+    max_len = max(len(user), len(partner))
+    return padded(user, max_len) + padded(partner, max_len)
+
+
+def expense_projection(income_proj, savings_proj, proj_401k, proj_401k_partner, household_proj, debt_proj,
+                       premiums, oop, pension_user, pension_partner, age, user_chronic_count, insurance_type,
+                       savings_growth_rate, k401_growth_rate):
+    """
+    Step 4 projection: income switches to 40% of final income plus pensions after retirement,
+    savings/401(k) only grow after 65, household spending drops 15% then 1% a year, and
+    healthcare costs carry the chronic multiplier.
+
+    Returns:
+    - dict with "expense_projection" (a Projection of EXPENSE_COLUMNS), "expense_df" and
+      "capital_graph_df" (DataFrames over the same array), "surplus" (a column view) and
+      "expense_error" (None on success), or only "expense_error" when inputs are missing or misaligned
+    """
+    income_proj = _array(income_proj)
+    savings_proj = _array(savings_proj)
+    household_proj = _array(household_proj)
+    current_age = age
+    retirement_age = RETIREMENT_AGE
+    retirement_index = retirement_age - current_age
+
+    # Income at and after retirement
+    if len(income_proj):
+        final_income = income_proj[retirement_index - 1] if 0 <= retirement_index - 1 < len(income_proj) else income_proj[-1]
+        income_ages = current_age + np.arange(len(income_proj))
+        income_proj[income_ages == retirement_age] = final_income  # Full final income at retirement
+        income_proj[income_ages > retirement_age] = (final_income * 0.40) + pension_user + pension_partner
+
+    # Combined household 401(k)
+    proj_401k = _combined_401k(proj_401k, proj_401k_partner)
+
+    # Post-retirement savings, 401(k) and household spending
+    retirement_savings_value = savings_proj[retirement_index] if 0 <= retirement_index < len(savings_proj) else 0
+    retirement_401k_value = proj_401k[retirement_index] if 0 <= retirement_index < len(proj_401k) else 0
+    base_post_retirement_household = household_proj[retirement_index] * 0.85 if 0 <= retirement_index < len(household_proj) else None
+    years_post = current_age + np.arange(len(savings_proj)) - retirement_age
+    post = years_post > 0
+    savings_proj[post] = retirement_savings_value * ((1 + savings_growth_rate) ** years_post[post])
+    post_401k = post[:len(proj_401k)]
+    proj_401k[:len(post_401k)][post_401k] = retirement_401k_value * ((1 + k401_growth_rate) ** years_post[:len(proj_401k)][post_401k])
+    household_years_post = years_post[:len(household_proj)]
+    first_year = np.flatnonzero(household_years_post == 1)
+    if len(first_year):
+        household_proj[first_year] = household_proj[first_year] * 0.85
+        base_post_retirement_household = household_proj[first_year[0]]
+    later = household_years_post > 1
+    if base_post_retirement_household is not None:
+        household_proj[:len(later)][later] = base_post_retirement_household * ((1 - 0.01) ** (household_years_post[later] - 1))
+
+    # Chronic multiplier on healthcare costs, no premiums if uninsured
+    chronic_multiplier = get_chronic_multiplier(current_age, user_chronic_count.lower().replace(" ", "_"))
+    premiums = _array(premiums)
+    if insurance_type == "None":
+        premiums = np.zeros(len(premiums))
+    else:
+        premiums = premiums * chronic_multiplier
+    oop = _array(oop) * chronic_multiplier
+    debt = _array(debt_proj)
+
+    projection_arrays = [income_proj, savings_proj, proj_401k, household_proj, debt, premiums, oop]
+    empty_arrays = [name for name, arr in zip(
+        ["income", "savings", "401k", "household", "debt", "premiums", "oop"],
+        projection_arrays) if not len(arr)]
+    if empty_arrays:
+        return {"expense_error": f"❌ Missing data in: {', '.join(empty_arrays)}. Please revisit earlier steps."}
+
+    years = min(MAX_PROJECTION_YEARS, *[len(arr) for arr in projection_arrays])
+    if any(len(arr) != years for arr in projection_arrays):
+        return {"expense_error": "⚠️ Data mismatch: Please ensure Step 2 has been completed and submitted."}
+
+    projection = Projection(EXPENSE_COLUMNS, years, start_age=current_age)
+    projection["Income"] = income_proj
+    projection["Household"] = household_proj
+    projection["Premiums"] = premiums
+    projection["OOP"] = oop
+    projection["Total Expenses"] = projection.total("Household", "Premiums", "OOP")
+    projection["Surplus"] = projection["Income"] - projection["Total Expenses"]
+    projection["Savings"] = savings_proj
+    projection["401(k)"] = proj_401k
+    projection["Debt"] = -np.abs(debt)
+    projection.freeze()
+    return {
+        "expense_projection": projection,
+        "expense_df": projection.to_frame(),
+        "surplus": projection["Surplus"],
+        "capital_graph_df": projection.to_frame(("Savings", "401(k)")),
+        "expense_error": None,
+    }
+
+
+# --- Step 4: retirement drawdown of savings, 401(k) and pensions against deficits ---
+def retirement_drawdown(expense_projection, proj_401k, proj_401k_partner, pension_user, pension_partner, age,
+                        expense_error):
+    """
+    Capital drawn each year from 65 onward to cover deficits, starting from savings + 401(k)
+    at retirement plus lifetime pensions.
+
+    Returns:
+    - dict with "retirement_drawdown": {"ages", "used", "remaining", "gap", "final_capital", "depletion_age"},
+      None when there is no valid Step 4 projection or no retirement years in range
+    """
+    if expense_error or expense_projection is None or not len(expense_projection):
+        return {"retirement_drawdown": None}
+    retirement_index = RETIREMENT_AGE - age
+    savings_proj = expense_projection["Savings"]
+    surplus = expense_projection["Surplus"]
+    proj_401k_combined = _combined_401k(proj_401k, proj_401k_partner)
+
+    chart_ages, deficit_values = retirement_deficits(expense_projection.ages, surplus)
+    if not len(chart_ages):
+        return {"retirement_drawdown": None}
+
+    savings_total = savings_proj[retirement_index] if 0 <= retirement_index < len(savings_proj) else 0
+    proj_401k_val = proj_401k_combined[retirement_index] if 0 <= retirement_index < len(proj_401k_combined) else 0
+    starting_capital = savings_total + proj_401k_val + ((pension_user + pension_partner) * len(chart_ages))
+    drawdown = drawdown_capital(deficit_values, starting_capital, ages=chart_ages)
+
+    return {"retirement_drawdown": {
+        "ages": chart_ages,
+        "used": drawdown["used"],
+        "remaining": drawdown["remaining"],
+        "gap": drawdown["gap"],
+        "final_capital": drawdown["final_capital"],
+        "depletion_age": drawdown["depletion_age"],
+    }}
+
+
+def build_pipeline():
+    """
+    The Steps 2–4 dependency graph over st.session_state artifacts.
+    """
+    dag = PipelineDAG()
+    dag.add_node(
+        "household_projection", household_projection,
+        inputs={"cost_df": None, "monthly_expenses": None, "debt_monthly_payment": 0, "inflation_rate": 0.03,
+                "base_premium": 6000},
+        outputs=("household_projection",)
+    )
+    dag.add_node(
+        "income_projection", income_projection,
+        inputs={"cost_df": None, "profile": {}, "step2_inputs": None, "premium_inflation": 0.05}
+    )
+    # Step 3 premiums overwrite Step 2's baseline premiums, so it depends on household_projection
+    dag.add_node(
+        "premiums_oop", premiums_oop_projection,
+        inputs={"cost_df": None, "profile": {}, "base_premium": 6000, "base_oop": 3000, "inflation_rate": 0.03,
+                "chronic_multiplier": 1.0, "step3_calibrated_costs": []},
+        deps=("household_projection",),
+        outputs=("healthcare", "ages")
+    )
+    dag.add_node(
+        "expense_projection", expense_projection,
+        inputs={"income_proj": [], "savings_proj": [], "proj_401k": [], "proj_401k_partner": [],
+                "household_proj": [], "debt_proj": [], "premiums": [], "oop": [], "pension_user": 0,
+                "pension_partner": 0, "age": 30, "user_chronic_count": "None",
+                "insurance_type": "Employer-based", "savings_growth_rate": 0.03, "k401_growth_rate": 0.03},
+        deps=("income_projection", "premiums_oop"),
+        outputs=("expense_error",),
+        state_keys={"k401_growth_rate": "401k_growth_rate"}
+    )
+    dag.add_node(
+        "retirement_drawdown", retirement_drawdown,
+        inputs={"expense_projection": None, "proj_401k": [], "proj_401k_partner": [], "pension_user": 0,
+                "pension_partner": 0, "age": 30, "expense_error": None},
+        deps=("expense_projection",),
+        outputs=("retirement_drawdown",)
+    )
+    return dag
+
+
+PIPELINE = build_pipeline()
+
+
+def run_pipeline(state, targets=None):
+    """
+    Refresh the stale nodes needed for targets in state (st.session_state).
+    """
+    return PIPELINE.run(state, targets)
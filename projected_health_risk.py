@@ -1,5 +1,7 @@
 # projected_health_risk.py
 
+import numpy as np
+
 def get_risk_insight(age, health_status):
     # Returns a simple qualitative insight
     if health_status == "high":
@@ -9,6 +11,31 @@ def get_risk_insight(age, health_status):
     else:
         return "You are currently low-risk. Maintain preventive care."
 
+def household_members(user_profile):
+    """
+    Members of a user profile's household: the user, the partner (family households), then dependents.
+
+    Returns:
+    - (labels, ages, statuses) lists
+    """
+    labels = ["user"]
+    ages = [user_profile["age"]]
+    statuses = [user_profile.get("health_status", "healthy")]
+
+    if user_profile.get("family_status") == "family" and user_profile.get("partner_age") is not None:
+        labels.append("partner")
+        ages.append(user_profile["partner_age"])
+        statuses.append(user_profile.get("partner_health_status", "healthy"))
+
+    dep_ages = user_profile.get("dependent_ages", [])
+    dep_healths = user_profile.get("dependent_health_statuses", [])
+    for i, (age, status) in enumerate(zip(dep_ages, dep_healths)):
+        labels.append(f"dependent_{i+1}")
+        ages.append(age)
+        statuses.append(status)
+
+    return labels, ages, statuses
+
 def get_risk_trajectory(age, health_status):
     # Returns a risk trajectory list based on age and health status
     years = list(range(age, 86))
@@ -30,4 +57,37 @@ def get_risk_trajectory(age, health_status):
         risk = min(1.0, base_risk + slope * i)
         trajectory.append(risk)
 
-    return trajectory
\ No newline at end of file
+    return trajectory
+
+def risk_trajectory_rows(ages, health_statuses, max_age=85):
+    """
+    get_risk_trajectory for many people at once, stacked year by year.
+
+    Parameters:
+    - ages, health_statuses: one entry per person
+    - max_age: last age of every trajectory (get_risk_trajectory runs through 85)
+
+    Returns:
+    - (risk, lengths): risk is (people × years), row i holding person i's trajectory from their
+      current age with 0 past their max_age; lengths is each person's trajectory length
+    """
+    ages = np.asarray(ages, dtype=int).reshape(-1)
+    lengths = np.maximum(max_age + 1 - ages, 0)
+    years = np.arange(lengths.max(initial=0))
+
+    # Same starting risk and slope per status as get_risk_trajectory
+    high_risk = np.array([status == "high_risk" for status in health_statuses], dtype=bool)
+    chronic = np.array([status == "chronic" for status in health_statuses], dtype=bool)
+    minor = ages < 18
+    base_risk = np.where(high_risk, np.where(minor, 0.5, 0.6), np.where(minor, 0.1, 0.2))
+    slope = np.where(high_risk, 0.025, 0.01)
+
+    risk = np.minimum(1.0, base_risk[:, None] + slope[:, None] * years)
+    risk[chronic] = 0.75
+    risk[years >= lengths[:, None]] = 0.0
+    return risk, lengths
+
+def get_stochastic_risk_trajectory(age, health_status, n_paths=1000, seed=None):
+    # Markov alternative to get_risk_trajectory: members can move between healthy/chronic/high_risk
+    from health_state_module import expected_risk_trajectory
+    return expected_risk_trajectory(age, health_status, n_paths=n_paths, seed=seed)
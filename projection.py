@@ -0,0 +1,115 @@
+# projection.py
+#
+# Compact container for the year-by-year projections of Steps 2–5. Every column lives as one row
+# of a single contiguous 2-D array, so steps share column views instead of holding parallel Python
+# lists (about 32 bytes per year each) and re-padding them to a common length.
+
+import numpy as np
+import pandas as pd
+
+# float32 halves memory again when cents-level precision is not needed
+PROJECTION_DTYPE = np.float64
+
+
+def padded(values, length, dtype=PROJECTION_DTYPE):
+    """
+    values as a float array of exactly length entries (zero-padded or truncated).
+    """
+    out = np.zeros(length, dtype=dtype)
+    if values is None:
+        return out
+    values = np.asarray(values, dtype=dtype).ravel()[:length]
+    out[:len(values)] = values
+    return out
+
+
+class Projection:
+    """
+    Named year-by-year columns backed by one contiguous (columns × years) array.
+
+    projection["Income"] returns a view of that column (no copy); assigning to it writes into
+    the shared array. ages are derived from start_age rather than stored.
+    """
+
+    __slots__ = ("names", "start_age", "data", "_index")
+
+    def __init__(self, names, years, start_age=0, dtype=PROJECTION_DTYPE):
+        self.names = tuple(names)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Duplicate projection columns: {', '.join(self.names)}")
+        self.start_age = int(start_age)
+        self.data = np.zeros((len(self.names), int(years)), dtype=dtype)
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_columns(cls, columns, years=None, start_age=0, dtype=PROJECTION_DTYPE):
+        """
+        Build a projection from a dict of column name → sequence.
+
+        Parameters:
+        - columns: dict of name → list/array (None counts as an empty column)
+        - years: projection length; defaults to the longest column. Shorter columns are
+          zero-padded and longer ones truncated
+        - start_age: age in the first projection year
+        - dtype: PROJECTION_DTYPE (float64) or np.float32
+
+        Returns:
+        - Projection
+        """
+        if years is None:
+            years = max((len(values) for values in columns.values() if values is not None), default=0)
+        projection = cls(columns.keys(), years, start_age=start_age, dtype=dtype)
+        for name, values in columns.items():
+            projection[name] = values
+        return projection
+
+    @property
+    def years(self):
+        return self.data.shape[1]
+
+    @property
+    def ages(self):
+        return np.arange(self.start_age, self.start_age + self.years)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def __len__(self):
+        return self.years
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __getitem__(self, name):
+        return self.data[self._index[name]]
+
+    def __setitem__(self, name, values):
+        self.data[self._index[name]] = padded(values, self.years, dtype=self.data.dtype)
+
+    def __repr__(self):
+        return f"Projection({', '.join(self.names)}; years={self.years}, start_age={self.start_age}, dtype={self.data.dtype})"
+
+    def total(self, *names):
+        """
+        Year-by-year sum of the given columns (a new array).
+        """
+        return self.data[[self._index[name] for name in names]].sum(axis=0)
+
+    def freeze(self):
+        """
+        Make the backing array read-only, so views handed to other steps cannot change it.
+        Returns the projection for chaining.
+        """
+        self.data.flags.writeable = False
+        return self
+
+    def to_frame(self, names=None, age_column="Age"):
+        """
+        DataFrame with an integer age column followed by the given columns (all by default).
+        The columns wrap the backing array without copying it.
+        """
+        names = self.names if names is None else tuple(names)
+        columns = {age_column: self.ages} if age_column else {}
+        columns.update((name, self[name]) for name in names)
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,141 @@
+# result_cache.py
+#
+# Process-wide cache for projection results. Streamlit reruns recompute Steps 1–6 from scratch
+# and many sessions share the same default profiles, so projections are memoized on a canonical
+# hash of their (normalized) inputs and shared across sessions with bounded LRU eviction.
+
+import copy
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from instrumentation import timed
+
+RESULT_CACHE_SIZE = 512
+
+
+def _normalize(value):
+    """
+    Convert a value into a JSON-serializable form with a stable ordering.
+    Raises TypeError for values that cannot be keyed reliably (e.g., DataFrames).
+    """
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_normalize(v) for v in value)
+    if isinstance(value, np.ndarray):
+        return [_normalize(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+
+
+def canonical_key(name, *args, **kwargs):
+    """
+    Canonical SHA-256 key for a function name and its arguments (dict key order does not matter).
+    """
+    payload = json.dumps([name, _normalize(args), _normalize(kwargs)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def canonical_profile_hash(profile):
+    """
+    Canonical hash of a profile dict (age, health_status, insurance_type, family_status, inflation, ...).
+    """
+    return canonical_key("profile", profile)
+
+
+class ResultCache:
+    """
+    Thread-safe, size-bounded LRU cache with hit/miss counters.
+    Values are copied on the way in and out, so callers may mutate what they get back.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = self._entries[key]
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by every session in the process
+PROJECTION_CACHE = ResultCache()
+
+_MISSING = object()
+
+
+def cached_projection(fn=None, cache=None):
+    """
+    Decorator memoizing a projection function in PROJECTION_CACHE (or the given cache).
+    Calls whose arguments cannot be keyed, or made while the cache has maxsize 0 (e.g., batch
+    jobs where every input is new), fall through to the function uncached.
+    The undecorated function stays available as fn.__wrapped__.
+    """
+    if fn is None:
+        return functools.partial(cached_projection, cache=cache)
+
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        target = cache if cache is not None else PROJECTION_CACHE
+        if target.maxsize <= 0:
+            return fn(*args, **kwargs)
+        try:
+            key = canonical_key(name, *args, **kwargs)
+        except TypeError:
+            return fn(*args, **kwargs)
+        result = target.get(key, _MISSING)
+        if result is _MISSING:
+            with timed("compute", name):
+                result = fn(*args, **kwargs)
+            target.put(key, result)
+        return result
+
+    return wrapper
@@ -0,0 +1,264 @@
+# session_memory.py
+#
+# Per-session memory accounting and compaction. Server memory per concurrent user is what limits how
+# many sessions one process can host, and session state only ever grows until "Restart Plan". This
+# module measures what each session_state key holds (counting shared NumPy buffers once), takes
+# tracemalloc snapshots on demand, and compacts a session: identical arrays and number lists are
+# shared instead of stored twice, and derived artifacts whose inputs have changed are dropped.
+
+import hashlib
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from pipeline_dag import _fingerprint_value
+from projection import Projection
+from result_cache import canonical_key
+from simulation_kernel import INVESTMENT_STRATEGY_DEFAULTS
+
+# Session-state key recording the inputs each derived artifact was built from
+ARTIFACT_STATE_KEY = "_artifact_inputs"
+
+# Step 6 inputs shared by the Monte Carlo and allocation artifacts (session keys)
+_CAPITAL_FUND_INPUTS = ("cost_df", "annual_contribution", "oop_savings", "starting_capital") + tuple(INVESTMENT_STRATEGY_DEFAULTS)
+
+# Derived artifacts outside the pipeline → session keys they are computed from. Their writers record
+# the inputs' fingerprint (record_artifacts); readers check it (artifact_is_current), and once an
+# input has changed compact_session drops the artifact (Step 6 rebuilds it on demand).
+DERIVED_ARTIFACTS = {
+    "capital_mc_bands": _CAPITAL_FUND_INPUTS + ("optimal_allocation",),
+    "capital_mc_depletion": _CAPITAL_FUND_INPUTS + ("optimal_allocation",),
+    "capital_mc_paths": _CAPITAL_FUND_INPUTS + ("optimal_allocation",),
+    "optimal_allocation": _CAPITAL_FUND_INPUTS + ("allocation_objective",),
+    "optimal_allocation_scores": _CAPITAL_FUND_INPUTS + ("allocation_objective",),
+}
+
+# Values smaller than this are not worth deduplicating
+DEDUPE_MIN_BYTES = 1024
+
+
+def _array_root(array):
+    # The array that owns the memory a view points into
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def value_nbytes(value, seen=None):
+    """
+    Approximate memory held by a session value, in bytes.
+
+    Parameters:
+    - value: any session value (DataFrames, arrays, projections, lists, dicts, scalars, ...)
+    - seen: set of object ids already counted; shared buffers (array views, DataFrames wrapping
+      projection rows, the same list under two keys) are only counted the first time
+
+    Returns:
+    - int bytes not already in seen
+    """
+    seen = set() if seen is None else seen
+    if isinstance(value, np.ndarray):
+        root = _array_root(value)
+        if id(root) in seen:
+            return 0
+        seen.add(id(root))
+        return int(root.nbytes)
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, Projection):
+        return sys.getsizeof(value) + value_nbytes(value.data, seen)
+    if isinstance(value, pd.Series):
+        return _column_nbytes(value, seen) + int(value.index.memory_usage(deep=True))
+    if isinstance(value, pd.DataFrame):
+        total = int(value.index.memory_usage(deep=True))
+        for _, column in value.items():
+            total += _column_nbytes(column, seen)
+        return total
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_nbytes(k, seen) + value_nbytes(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(value_nbytes(v, seen) for v in value)
+    return sys.getsizeof(value)
+
+
+def _column_nbytes(column, seen):
+    # NumPy-backed columns wrap an ndarray that may be shared with other keys (e.g. projection rows);
+    # strings, objects and extension types are measured by pandas
+    if not isinstance(column.dtype, np.dtype) or column.dtype == object:
+        return int(column.memory_usage(index=False, deep=True))
+    return value_nbytes(np.asarray(column.array), seen)
+
+
+def session_memory_report(state, keys=None):
+    """
+    Bytes held by each session_state key, largest first.
+
+    Returns:
+    - DataFrame with "key", "type", "bytes" (the value on its own) and "unique_bytes" (excluding
+      buffers already counted for a larger key); unique_bytes sums to the session total
+    """
+    keys = list(state.keys()) if keys is None else list(keys)
+    rows = []
+    for key in keys:
+        value = state.get(key)
+        rows.append({"key": str(key), "type": type(value).__name__, "bytes": value_nbytes(value), "_value": value})
+    rows.sort(key=lambda row: row["bytes"], reverse=True)
+    seen = set()
+    for row in rows:
+        row["unique_bytes"] = value_nbytes(row.pop("_value"), seen)
+    return pd.DataFrame(rows, columns=["key", "type", "bytes", "unique_bytes"])
+
+
+def session_memory_total(state):
+    """
+    Total bytes held by a session (shared buffers counted once).
+    """
+    seen = set()
+    return sum(value_nbytes(state.get(key), seen) for key in list(state.keys()))
+
+
+# --- tracemalloc snapshots on demand ---
+def start_allocation_tracing(frames=1):
+    """
+    Start tracemalloc if it is not running. Only allocations made after this are traced.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_allocation_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def allocation_snapshot(limit=20, key_type="lineno"):
+    """
+    Largest live allocations by source line (or "filename"/"traceback") since tracing started.
+
+    Returns:
+    - DataFrame with "location", "bytes" and "count", or None when tracemalloc is not tracing
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    stats = tracemalloc.take_snapshot().statistics(key_type)[:limit]
+    return pd.DataFrame(
+        [{"location": str(stat.traceback), "bytes": stat.size, "count": stat.count} for stat in stats],
+        columns=["location", "bytes", "count"],
+    )
+
+
+# --- Compaction ---
+def _dedupe_digest(value):
+    # Content key for values worth sharing, or None
+    if isinstance(value, np.ndarray):
+        if value.nbytes < DEDUPE_MIN_BYTES or value.dtype == object:
+            return None
+        digest = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        return ("ndarray", str(value.dtype), value.shape, digest)
+    if isinstance(value, list) and len(value) * 8 >= DEDUPE_MIN_BYTES:
+        if not all(type(v) in (float, int) or isinstance(v, (np.floating, np.integer)) for v in value):
+            return None
+        # repr keeps 1 and 1.0 (and np.float64(1.0)) apart
+        digest = hashlib.sha256(repr(value).encode()).hexdigest()
+        return ("list", len(value), digest)
+    return None
+
+
+def deduplicate_values(state):
+    """
+    Point session keys holding identical arrays or number lists at a single shared object.
+
+    Shared arrays are made read-only, so an accidental in-place write raises instead of changing
+    every key at once; session lists are treated as values and never mutated in place.
+
+    Returns:
+    - dict of deduplicated key → key it now shares with
+    """
+    first = {}
+    shared = {}
+    for key in list(state.keys()):
+        value = state.get(key)
+        digest = _dedupe_digest(value)
+        if digest is None:
+            continue
+        if digest not in first:
+            first[digest] = key
+            continue
+        original = state.get(first[digest])
+        if original is value or (isinstance(value, np.ndarray) and np.shares_memory(original, value)):
+            continue
+        if isinstance(original, np.ndarray):
+            original.flags.writeable = False
+        state[key] = original
+        shared[key] = first[digest]
+    return shared
+
+
+def artifact_fingerprint(state, artifact):
+    """
+    Fingerprint of the session inputs a DERIVED_ARTIFACTS entry is computed from.
+    """
+    inputs = DERIVED_ARTIFACTS[artifact]
+    return canonical_key(artifact, _fingerprint_value({key: state.get(key) for key in inputs}))
+
+
+def record_artifacts(state, artifacts):
+    """
+    Record the inputs of artifacts just written to the session. Call it right after storing them,
+    while the session still holds the inputs they were built from.
+    """
+    records = dict(state.get(ARTIFACT_STATE_KEY, {}))
+    for artifact in artifacts:
+        records[artifact] = artifact_fingerprint(state, artifact)
+    state[ARTIFACT_STATE_KEY] = records
+
+
+def artifact_is_current(state, artifact):
+    """
+    Whether a derived artifact is in the session and was recorded with the inputs it holds now.
+    """
+    record = state.get(ARTIFACT_STATE_KEY, {}).get(artifact)
+    return artifact in state and record is not None and record == artifact_fingerprint(state, artifact)
+
+
+def drop_stale_artifacts(state):
+    """
+    Drop DERIVED_ARTIFACTS whose inputs changed since they were recorded (see record_artifacts);
+    artifacts never recorded are dropped too. (Pipeline nodes drop their own superseded outputs
+    when they recompute, see PipelineDAG.run.)
+
+    Returns:
+    - list of dropped session keys
+    """
+    dropped = []
+    records = dict(state.get(ARTIFACT_STATE_KEY, {}))
+    for artifact in DERIVED_ARTIFACTS:
+        if artifact in state and not artifact_is_current(state, artifact):
+            del state[artifact]
+            dropped.append(artifact)
+        if artifact not in state:
+            records.pop(artifact, None)
+    state[ARTIFACT_STATE_KEY] = records
+    return dropped
+
+
+def compact_session(state):
+    """
+    Drop stale derived artifacts, then deduplicate what remains.
+
+    Returns:
+    - dict with "dropped" (keys removed), "shared" (key → key it now shares with),
+      "bytes_before" and "bytes_after"
+    """
+    bytes_before = session_memory_total(state)
+    dropped = drop_stale_artifacts(state)
+    shared = deduplicate_values(state)
+    return {
+        "dropped": dropped,
+        "shared": shared,
+        "bytes_before": bytes_before,
+        "bytes_after": session_memory_total(state),
+    }
@@ -0,0 +1,581 @@
+# simulation_kernel.py
+#
+# Vectorized NumPy kernels for the simulator. Nothing in this module touches
+# st.session_state, so it can run inside Streamlit, in batch jobs or in benchmarks.
+
+import numpy as np
+
+from cost_library import (
+    CALIBRATED_LIFETIME_TOTALS, CALIBRATED_COST_INFLATION, HIGH_RISK_CURVE_BASE, HIGH_RISK_CURVE_INFLATION
+)
+from result_cache import cached_projection
+
+# Projections run from the user's current age through this age (inclusive)
+MAX_AGE = 85
+
+# Regular income and 401(k)/savings contributions stop at this age
+RETIREMENT_AGE = 65
+RETIREMENT_INCOME_SHARE = 0.4  # User income after retirement, as a share of today's net income
+
+# Insurance payment assumptions used by generate_costs: base premium, base OOP, annual growth
+INSURANCE_PAYMENT_SCHEDULES = {
+    "Employer": {"premium": 12912, "oop": 3300, "growth": 0.03},    # Average employee contribution, risk-adjusted OOP
+    "Marketplace": {"premium": 7200, "oop": 4200, "growth": 0.04},
+}
+UNINSURED_OOP_SHARE = 0.5  # Uninsured users pay half the true cost out of pocket
+
+# Inputs to the capital care investment strategy, keyed as in st.session_state, with their defaults
+INVESTMENT_STRATEGY_DEFAULTS = {
+    "calculated_surplus": 0.0,
+    "capital_care_alloc": 0.0,  # e.g., 0.3 = 30% of surplus
+    "reallocated_premium": 0.0,
+    "eligible_for_reallocation": False,
+    "short_term_rate": 0.02,
+    "mid_term_rate": 0.05,
+    "long_term_rate": 0.07,
+    "short_term_alloc": 0.2,
+    "mid_term_alloc": 0.3,
+    "long_term_alloc": 0.5,
+}
+
+
+def _as_batch(values, length):
+    """
+    Broadcast a scalar or sequence to a list of the given length.
+    """
+    if isinstance(values, (str, type(None))) or np.ndim(values) == 0:
+        return [values] * length
+    values = list(values)
+    if len(values) != length:
+        raise ValueError("Batch inputs must all have the same number of profiles.")
+    return values
+
+
+def growth_factors(rates, years):
+    """
+    Cumulative growth factors (1 + r) ** i for i in range(years).
+
+    Parameters:
+    - rates: scalar or 1-D array of annual rates (one per profile)
+    - years: number of projection years
+
+    Returns:
+    - np.ndarray of shape (years,) for a scalar rate, otherwise (profiles × years)
+    """
+    rates = np.asarray(rates, dtype=float)
+    return np.power.outer(1 + rates, np.arange(years, dtype=float))
+
+
+def project_cost_matrix(start_ages, profile_types, insurance_types, max_age=MAX_AGE):
+    """
+    Vectorized True Cost / OOP / Premium projection for a batch of profiles.
+
+    Every row covers one profile from its start age through max_age. Rows are
+    aligned on projection year (column i is start_age + i); years past a
+    profile's horizon are NaN.
+
+    Parameters:
+    - start_ages: int or sequence of ints
+    - profile_types: "healthy", "chronic", "high_risk" or None (one per profile, or a scalar)
+    - insurance_types: "Employer", "Marketplace" or anything else for uninsured (one per profile, or a scalar)
+    - max_age: last projected age (inclusive)
+
+    Returns:
+    - dict with "ages", "true_cost", "oop", "premium" arrays of shape (profiles × years)
+      and "n_years" (profiles,) giving the valid length of each row
+    """
+    start_ages = np.atleast_1d(np.asarray(start_ages, dtype=int))
+    n_profiles = len(start_ages)
+    profile_types = _as_batch(profile_types, n_profiles)
+    insurance_types = _as_batch(insurance_types, n_profiles)
+
+    n_years = np.clip(max_age + 1 - start_ages, 0, None)
+    width = int(n_years.max()) if n_profiles else 0
+    offsets = np.arange(width)
+    valid = offsets[None, :] < n_years[:, None]
+    ages = start_ages[:, None] + offsets[None, :]
+
+    # --- True cost: scale * (1 + r) ** i, calibrated curves are normalized over their own horizon ---
+    # High-risk and unclassified profiles use the estimate_high_risk_curve defaults
+    cost_rate = np.full(n_profiles, HIGH_RISK_CURVE_INFLATION)
+    cost_scale = np.full(n_profiles, float(HIGH_RISK_CURVE_BASE))
+    calibrated = np.zeros(n_profiles, dtype=bool)
+    for j, profile_type in enumerate(profile_types):
+        if profile_type in CALIBRATED_LIFETIME_TOTALS:
+            cost_rate[j] = CALIBRATED_COST_INFLATION[profile_type]
+            cost_scale[j] = CALIBRATED_LIFETIME_TOTALS[profile_type]
+            calibrated[j] = True
+
+    cost_growth = np.where(valid, growth_factors(cost_rate, width), 0.0)
+    if calibrated.any():
+        # Profiles already past max_age have no projection years (zero total); their scale stays 0
+        totals = cost_growth[calibrated].sum(axis=1)
+        cost_scale[calibrated] = np.divide(cost_scale[calibrated], totals, out=np.zeros_like(totals), where=totals > 0)
+    true_cost = cost_scale[:, None] * cost_growth
+
+    # --- Premium / OOP: base * (1 + g) ** i for insured, OOP share of true cost otherwise ---
+    base_premium = np.zeros(n_profiles)
+    base_oop = np.zeros(n_profiles)
+    payment_rate = np.zeros(n_profiles)
+    insured = np.zeros(n_profiles, dtype=bool)
+    for j, insurance_type in enumerate(insurance_types):
+        schedule = INSURANCE_PAYMENT_SCHEDULES.get(insurance_type)
+        if schedule is not None:
+            base_premium[j] = schedule["premium"]
+            base_oop[j] = schedule["oop"]
+            payment_rate[j] = schedule["growth"]
+            insured[j] = True
+
+    payment_growth = growth_factors(payment_rate, width)
+    premium = base_premium[:, None] * payment_growth
+    oop = np.where(insured[:, None], base_oop[:, None] * payment_growth, true_cost * UNINSURED_OOP_SHARE)
+
+    return {
+        "ages": ages,
+        "true_cost": np.where(valid, true_cost, np.nan),
+        "oop": np.where(valid, oop, np.nan),
+        "premium": np.where(valid, premium, np.nan),
+        "n_years": n_years,
+    }
+
+
+def blended_growth_rate(short_rate, mid_rate, long_rate, short_alloc, mid_alloc, long_alloc):
+    """
+    Allocation-weighted growth rate of the short/mid/long-term buckets.
+    Works on scalars or arrays of allocations.
+    """
+    return short_rate * short_alloc + mid_rate * mid_alloc + long_rate * long_alloc
+
+
+def capital_fund_path(costs, annual_contribution, growth_rate, starting_capital=0.0):
+    """
+    Contribute-grow-withdraw recurrence of the capital care fund, vectorized over scenarios.
+
+    Each year the contribution is added, the fund grows, then it pays as much of
+    that year's healthcare cost as it can:
+        fund_t = max((fund_{t-1} + c) * (1 + g) - cost_t, 0),  fund_0 = starting capital
+
+    Parameters:
+    - costs: (years,) or (scenarios × years) array of annual healthcare costs
+    - annual_contribution: scalar or (scenarios,) array
+    - growth_rate: scalar or (scenarios,) array, must be greater than -1
+    - starting_capital: scalar or (scenarios,) capital invested before the first year
+
+    Returns:
+    - (capital_used, capital_remaining) arrays broadcast to (scenarios × years),
+      or (years,) when every input is a single scenario
+    """
+    costs = np.asarray(costs, dtype=float)
+    growth_rate = np.asarray(growth_rate, dtype=float)[..., None]
+    annual_returns = np.broadcast_to(growth_rate, growth_rate.shape[:-1] + costs.shape[-1:])
+    return capital_fund_path_by_year(costs, annual_contribution, annual_returns, starting_capital)
+
+
+def capital_fund_path_by_year(costs, annual_contribution, annual_returns, starting_capital=0.0):
+    """
+    Same recurrence as capital_fund_path with a different return every year
+    (e.g., Monte Carlo paths).
+
+    Discounting by the cumulative growth turns the recurrence into a running sum
+    with a floor at zero, which is solved with a cumulative sum minus its running
+    minimum (no Python loop).
+
+    Parameters:
+    - costs: (years,) or (scenarios × years) array of annual healthcare costs
+    - annual_contribution: scalar or (scenarios,) array
+    - annual_returns: (years,) or (scenarios × years) array of returns, each greater than -1
+    - starting_capital: scalar or (scenarios,) capital invested before the first year
+
+    Returns:
+    - (capital_used, capital_remaining) arrays broadcast to (scenarios × years)
+    """
+    costs = np.asarray(costs, dtype=float)
+    contribution = np.asarray(annual_contribution, dtype=float)[..., None]
+    start = np.asarray(starting_capital, dtype=float)[..., None]
+    growth = 1 + np.asarray(annual_returns, dtype=float)
+
+    # Starting capital is already in today's dollars, so it seeds the discounted running sum
+    discount = np.cumprod(growth, axis=-1)
+    net_inflow = start + np.cumsum((contribution * growth - costs) / discount, axis=-1)
+    floor = np.minimum(np.minimum.accumulate(net_inflow, axis=-1), 0.0)
+    capital_remaining = (net_inflow - floor) * discount
+
+    previous = np.zeros_like(capital_remaining)
+    previous[..., :1] = start
+    previous[..., 1:] = capital_remaining[..., :-1]
+    capital_used = np.minimum((previous + contribution) * growth, costs)
+    return capital_used, capital_remaining
+
+
+# --- Goal seek: minimum funding that keeps the capital care fund covering every year's cost ---
+def funding_coefficients(costs, annual_returns):
+    """
+    The contribute-grow-withdraw recurrence as long as the fund never runs short.
+
+    With starting capital S (invested before the first contribution) and a fixed annual
+    contribution c, the fund after year t is
+        fund_t = D_t * (S + c * A_t - B_t)
+    where D_t is the cumulative growth, A_t = sum of 1 / D_{k-1} and B_t = sum of cost_k / D_k
+    over years k <= t. The fund covers every cost exactly when S + c * A_t >= B_t in every year.
+
+    Parameters:
+    - costs: (years,) or (scenarios × years) array of annual healthcare costs
+    - annual_returns: scalar, (years,) or (scenarios × years) returns, each greater than -1
+
+    Returns:
+    - (A, B) arrays broadcast to the shape of costs and returns
+    """
+    costs = np.asarray(costs, dtype=float)
+    annual_returns = np.asarray(annual_returns, dtype=float)
+    shape = np.broadcast_shapes(costs.shape, annual_returns.shape if annual_returns.ndim else costs.shape[-1:])
+    growth = np.broadcast_to(1 + annual_returns, shape)
+
+    discount = np.cumprod(growth, axis=-1)
+    previous_discount = discount / growth
+    return np.cumsum(1 / previous_discount, axis=-1), np.cumsum(costs / discount, axis=-1)
+
+
+def minimum_annual_contribution(costs, annual_returns, starting_capital=0.0):
+    """
+    Smallest fixed annual contribution for which the capital fund pays every year's cost in
+    full (never runs short), solved in closed form from funding_coefficients.
+
+    Parameters:
+    - costs, annual_returns: as for funding_coefficients
+    - starting_capital: scalar or (scenarios,) capital invested before the first year
+
+    Returns:
+    - float, or (scenarios,) array for batch inputs; 0 when the starting capital already suffices
+    """
+    a, b = funding_coefficients(costs, annual_returns)
+    start = np.asarray(starting_capital, dtype=float)[..., None]
+    required = np.max((b - start) / a, axis=-1, initial=0.0)
+    return float(required) if np.ndim(required) == 0 else required
+
+
+def minimum_starting_capital(costs, annual_returns, annual_contribution=0.0):
+    """
+    Smallest starting capital for which the capital fund pays every year's cost in full,
+    given a fixed annual contribution.
+
+    Parameters:
+    - costs, annual_returns: as for funding_coefficients
+    - annual_contribution: scalar or (scenarios,) annual contribution
+
+    Returns:
+    - float, or (scenarios,) array for batch inputs; 0 when contributions alone suffice
+    """
+    a, b = funding_coefficients(costs, annual_returns)
+    contribution = np.asarray(annual_contribution, dtype=float)[..., None]
+    required = np.max(b - contribution * a, axis=-1, initial=0.0)
+    return float(required) if np.ndim(required) == 0 else required
+
+
+def run_investment_strategy(cost_df, inputs=None):
+    """
+    Capital care fund simulation from surplus and premium reallocation.
+
+    Parameters:
+    - cost_df: DataFrame with a "Healthcare Cost" column
+    - inputs: dict of strategy inputs; missing keys fall back to INVESTMENT_STRATEGY_DEFAULTS
+
+    Returns:
+    - dict with the contribution breakdown ("capital_from_surplus", "capital_from_reallocation",
+      "total_capital_contribution") and "capital_graph_df", a copy of cost_df with
+      "Capital Used" and "Capital Fund Remaining" columns
+    """
+    params = dict(INVESTMENT_STRATEGY_DEFAULTS)
+    params.update(inputs or {})
+
+    blended_growth = blended_growth_rate(
+        params["short_term_rate"], params["mid_term_rate"], params["long_term_rate"],
+        params["short_term_alloc"], params["mid_term_alloc"], params["long_term_alloc"]
+    )
+
+    surplus_contribution = params["calculated_surplus"] * params["capital_care_alloc"]
+    premium_contribution = params["reallocated_premium"] if params["eligible_for_reallocation"] else 0.0
+    annual_contribution = surplus_contribution + premium_contribution
+
+    df = cost_df.copy()
+    capital_used, capital_balance = capital_fund_path(df["Healthcare Cost"].to_numpy(), annual_contribution, blended_growth)
+    df["Capital Used"] = capital_used
+    df["Capital Fund Remaining"] = capital_balance
+
+    return {
+        "capital_from_surplus": surplus_contribution,
+        "capital_from_reallocation": premium_contribution,
+        "total_capital_contribution": annual_contribution,
+        "capital_graph_df": df,
+    }
+
+
+def compound_with_contributions(start_value, growth_rate, contributions):
+    """
+    Vectorized compounding of a balance that grows, then receives a contribution, each year:
+        value_t = value_{t-1} * (1 + g) + contribution_t
+
+    Parameters:
+    - start_value: scalar or (profiles,) starting balances
+    - growth_rate: scalar or (profiles,) annual growth rates
+    - contributions: (years,) or (profiles × years) contributions
+
+    Returns:
+    - np.ndarray of end-of-year balances, shape (profiles × years)
+    """
+    contributions = np.asarray(contributions, dtype=float)
+    growth_rate = np.asarray(growth_rate, dtype=float)[..., None]
+    annual_returns = np.broadcast_to(growth_rate, growth_rate.shape[:-1] + contributions.shape[-1:])
+    return compound_with_contributions_by_year(start_value, annual_returns, contributions)
+
+
+def compound_with_contributions_by_year(start_value, annual_returns, contributions):
+    """
+    Same compounding as compound_with_contributions with a different return every year.
+
+    Parameters:
+    - start_value: scalar or (profiles,) starting balances
+    - annual_returns: (years,) or (profiles × years) returns, each greater than -1
+    - contributions: (years,) or (profiles × years) contributions
+
+    Returns:
+    - np.ndarray of end-of-year balances, shape (profiles × years)
+    """
+    start_value = np.asarray(start_value, dtype=float)[..., None]
+    compounding = np.cumprod(1 + np.asarray(annual_returns, dtype=float), axis=-1)
+    contributions = np.asarray(contributions, dtype=float)
+    return compounding * (start_value + np.cumsum(contributions / compounding, axis=-1))
+
+
+def simulate_full_investment_batch(
+    years,
+    net_income_annual,
+    savings_rate,
+    savings_growth,
+    capital_allocations,
+    growth_short,
+    growth_mid,
+    growth_long,
+    contrib_401k_employee,
+    contrib_401k_employer,
+    growth_401k,
+    partner_401k_contrib,
+    partner_employer_401k_contrib,
+    start_short_term=0,
+    start_mid_term=0,
+    start_long_term=0,
+    start_401k_user=0,
+    start_401k_partner=0,
+    is_family=False
+):
+    """
+    Batched simulate_full_investment_strategy over N household profiles.
+
+    Every argument except years may be a scalar or a (profiles,) array;
+    capital_allocations maps "short_term"/"mid_term"/"long_term" to such values.
+    All profiles share the same projection horizon (years).
+
+    Returns:
+    - dict of (profiles × years) arrays: "short_term", "mid_term", "long_term",
+      "user_401k", "partner_401k" (zeros for profiles that are not families)
+    """
+    n_profiles = np.broadcast(
+        net_income_annual, savings_rate, savings_growth, growth_short, growth_mid, growth_long,
+        contrib_401k_employee, contrib_401k_employer, growth_401k, partner_401k_contrib,
+        partner_employer_401k_contrib, start_short_term, start_mid_term, start_long_term,
+        start_401k_user, start_401k_partner, is_family,
+        *[capital_allocations.get(bucket, 0) for bucket in ["short_term", "mid_term", "long_term"]]
+    ).size
+
+    # Annual savings for every profile and year, compounded by savings growth
+    annual_savings = (
+        np.asarray(net_income_annual, dtype=float)[..., None]
+        * np.asarray(savings_rate, dtype=float)[..., None]
+        * growth_factors(np.broadcast_to(savings_growth, (n_profiles,)), years)
+    )
+
+    result = {}
+    for bucket, start, growth in [
+        ("short_term", start_short_term, growth_short),
+        ("mid_term", start_mid_term, growth_mid),
+        ("long_term", start_long_term, growth_long),
+    ]:
+        allocation = np.asarray(capital_allocations.get(bucket, 0), dtype=float)[..., None]
+        result[bucket] = compound_with_contributions(
+            np.broadcast_to(start, (n_profiles,)), growth, annual_savings * allocation
+        )
+
+    # --- 401(k): constant annual contributions ---
+    user_contrib = np.asarray(contrib_401k_employee, dtype=float) + np.asarray(contrib_401k_employer, dtype=float)
+    result["user_401k"] = compound_with_contributions(
+        np.broadcast_to(start_401k_user, (n_profiles,)),
+        growth_401k,
+        np.broadcast_to(user_contrib[..., None], (n_profiles, years))
+    )
+
+    partner_contrib = np.asarray(partner_401k_contrib, dtype=float) + np.asarray(partner_employer_401k_contrib, dtype=float)
+    partner_401k = compound_with_contributions(
+        np.broadcast_to(start_401k_partner, (n_profiles,)),
+        growth_401k,
+        np.broadcast_to(partner_contrib[..., None], (n_profiles, years))
+    )
+    result["partner_401k"] = np.where(np.asarray(is_family, dtype=bool)[..., None], partner_401k, 0.0)
+
+    return result
+
+
+# --- Step 2 income and savings projections (cached across sessions) ---
+@cached_projection
+def project_household_income(years, user_age, net_income_annual, income_growth, family_status="single",
+                             partner_age=65, net_income_annual_partner=0, income_growth_partner=0,
+                             retirement_age=RETIREMENT_AGE):
+    """
+    Retirement-aware income projection used by Step 2.
+    User income grows until retirement, then drops to RETIREMENT_INCOME_SHARE of today's net income;
+    partner income grows until the partner turns 65, then stops.
+
+    Returns:
+    - dict of lists: "income_proj" (user), "income_proj_partner", "combined_income_proj"
+    """
+    offsets = np.arange(years)
+    income = np.where(
+        user_age + offsets < retirement_age,
+        net_income_annual * growth_factors(income_growth, years),
+        net_income_annual * RETIREMENT_INCOME_SHARE
+    )
+    income_proj = income.tolist()
+
+    if family_status != "family":
+        return {
+            "income_proj": income_proj,
+            "income_proj_partner": [0] * years,
+            "combined_income_proj": income_proj,
+        }
+
+    partner_income = np.where(
+        partner_age + offsets < 65,
+        net_income_annual_partner * growth_factors(income_growth_partner, years),
+        0.0
+    )
+    return {
+        "income_proj": income_proj,
+        "income_proj_partner": partner_income.tolist(),
+        "combined_income_proj": (income + partner_income).tolist(),
+    }
+
+
+def _retirement_balance(start_value, growth_rate, annual_contribution, ages, retirement_age):
+    contributions = np.where(ages < retirement_age, float(annual_contribution), 0.0)
+    return compound_with_contributions(start_value, growth_rate, contributions).tolist()
+
+
+@cached_projection
+def project_retirement_savings(years, user_age, inflation_rate, start_401k_user, contrib_401k_annual, growth_401k,
+                               savings_start, annual_savings_contrib, savings_growth, family_status="single",
+                               partner_age=65, start_401k_partner=0, partner_contrib_401k_annual=0,
+                               growth_401k_partner=None, retirement_age=RETIREMENT_AGE):
+    """
+    Step 2 401(k) and savings projections: balances grow at (growth + inflation) every year
+    and receive contributions only before retirement.
+
+    Returns:
+    - dict of lists: "proj_401k", "savings_proj", "proj_401k_partner" (zeros unless family)
+    """
+    ages = user_age + np.arange(years)
+    result = {
+        "proj_401k": _retirement_balance(
+            start_401k_user, growth_401k + inflation_rate, contrib_401k_annual, ages, retirement_age
+        ),
+        "savings_proj": _retirement_balance(
+            savings_start, savings_growth + inflation_rate, annual_savings_contrib, ages, retirement_age
+        ),
+        "proj_401k_partner": [0] * years,
+    }
+    if family_status == "family":
+        if growth_401k_partner is None:
+            growth_401k_partner = growth_401k
+        result["proj_401k_partner"] = _retirement_balance(
+            start_401k_partner, growth_401k_partner + inflation_rate, partner_contrib_401k_annual,
+            partner_age + np.arange(years), retirement_age
+        )
+    return result
+
+
+def retirement_deficits(ages, surplus, retirement_age=RETIREMENT_AGE):
+    """
+    Retirement years and the deficit to cover in each (the shortfall when surplus is negative, else 0).
+
+    Parameters:
+    - ages: (years,) projection ages
+    - surplus: (years,) or (scenarios × years) income minus expenses, aligned with ages
+
+    Returns:
+    - (retirement ages, deficits) as np.ndarrays; deficits keep the batch dimension
+    """
+    ages = np.asarray(ages)
+    surplus = np.asarray(surplus, dtype=float)
+    years = min(len(ages), surplus.shape[-1])
+    retired = ages[:years] >= retirement_age
+    retired_surplus = surplus[..., :years][..., retired]
+    return ages[:years][retired], np.where(retired_surplus < 0, -retired_surplus, 0.0)
+
+
+def drawdown_capital(deficits, starting_capital, ages=None):
+    """
+    Vectorized retirement drawdown: each year draws min(deficit, capital) from the remaining
+    capital, and whatever capital cannot cover is an unfunded gap. Capital is subtracted year by
+    year in the same order as a plain loop, so single-scenario results match it exactly.
+
+    Parameters:
+    - deficits: (years,) or (scenarios × years) non-negative deficits
+    - starting_capital: scalar or (scenarios,) capital at retirement
+    - ages: optional (years,) ages used to report the depletion age
+
+    Returns:
+    - dict with "used", "remaining" (never below 0) and "gap" arrays shaped like deficits,
+      "final_capital", "depletion_index" (first year remaining capital is 0, -1 if never) and,
+      when ages are given, "depletion_age" (None, or NaN per scenario, if never depleted)
+    """
+    deficits = np.asarray(deficits, dtype=float)
+    single = deficits.ndim == 1
+    deficits = np.atleast_2d(deficits)
+    start = np.broadcast_to(np.asarray(starting_capital, dtype=float), deficits.shape[:1])
+    years = deficits.shape[1]
+    drawing = deficits > 0
+
+    # Capital before each year's draw: the running balance start - d_1 - d_2 - ..., held at 0 once
+    # it runs out. A negative start is drawn once, at the first deficit, and is 0 afterwards.
+    running = np.subtract.accumulate(np.concatenate([start[:, None], deficits], axis=1), axis=1)
+    balance = np.maximum(running, 0.0)
+    negative_start = start < 0
+    if negative_start.any():
+        started = np.cumsum(drawing, axis=1) > 0
+        balance[negative_start, 1:] = np.where(started[negative_start], 0.0, start[negative_start, None])
+        balance[negative_start, 0] = start[negative_start]
+    before = balance[:, :years]
+
+    used = np.where(drawing, np.minimum(deficits, before), 0.0)
+    gap = np.where(drawing, np.maximum(deficits - used, 0.0), 0.0)
+    final_capital = balance[:, years] if years else start.copy()
+    remaining = np.maximum(balance[:, 1:], 0.0)
+
+    depleted = remaining == 0
+    depletion_index = np.full(len(start), -1)
+    if years:
+        depletion_index = np.where(depleted.any(axis=1), depleted.argmax(axis=1), -1)
+    result = {
+        "used": used[0] if single else used,
+        "remaining": remaining[0] if single else remaining,
+        "gap": gap[0] if single else gap,
+        "final_capital": float(final_capital[0]) if single else final_capital,
+        "depletion_index": int(depletion_index[0]) if single else depletion_index,
+    }
+    if ages is not None:
+        ages = np.asarray(ages)
+        depletion_age = np.full(len(start), np.nan)
+        depleted_rows = depletion_index >= 0
+        depletion_age[depleted_rows] = ages[depletion_index[depleted_rows]]
+        if single:
+            result["depletion_age"] = int(depletion_age[0]) if depletion_index[0] >= 0 else None
+        else:
+            result["depletion_age"] = depletion_age
+    return result
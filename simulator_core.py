@@ -1,101 +1,72 @@
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-from cost_library import get_calibrated_cost_curve, determine_profile_type, estimate_high_risk_curve
+from instrumentation import instrumented
+from monte_carlo_module import run_investment_strategy_mc, DEFAULT_PATHS, PERCENTILES
+from result_cache import cached_projection
+from session_memory import record_artifacts
+from simulation_kernel import (
+    project_cost_matrix, run_investment_strategy, simulate_full_investment_batch, INVESTMENT_STRATEGY_DEFAULTS
+)
 
 
+@cached_projection
 def generate_costs(profile, care_preferences):
-    ages = list(range(profile["age"], 86))
-    cost_data = []
-
-    profile_type = profile.get("health_profile_type", None)
-    if profile_type == "healthy":
-        calibrated_costs = get_calibrated_cost_curve("healthy", years=len(ages))
-    elif profile_type == "chronic":
-        calibrated_costs = get_calibrated_cost_curve("chronic", years=len(ages))
-    elif profile_type == "high_risk":
-        calibrated_costs = estimate_high_risk_curve(years=len(ages))
-    else:
-        calibrated_costs = estimate_high_risk_curve(years=len(ages))  # fallback
+    # Vectorized projection: growth factors are computed once for the whole age range
+    projection = project_cost_matrix(
+        profile["age"],
+        profile.get("health_profile_type", None),
+        profile.get("insurance_type", "None")
+    )
+    n_years = projection["n_years"][0]
 
-    for i, age in enumerate(ages):
-        insurance_type = profile.get("insurance_type", "None")
+    # True Cost is the actual cost to treat the user (reference only); OOP + Premium are user payments
+    return pd.DataFrame({
+        "Age": projection["ages"][0, :n_years],
+        "True Cost": projection["true_cost"][0, :n_years],
+        "OOP": projection["oop"][0, :n_years],
+        "Premium": projection["premium"][0, :n_years]
+    })
 
-        true_cost = calibrated_costs[i]  # Actual cost to treat user, used for reference only
+@instrumented("compute")
+def simulate_investment_strategy(cost_df, strategy=None):
+    # Extract user-defined surplus, capital care allocation and investment strategy from session state
+    inputs = {key: st.session_state.get(key, default) for key, default in INVESTMENT_STRATEGY_DEFAULTS.items()}
 
-        # Estimate user payments (OOP + premium) based on insurance type
-        if insurance_type == "Employer":
-            premium = 12912 * ((1 + 0.03) ** i)  # Average employee contribution
-            oop = 3300 * ((1 + 0.03) ** i)       # Typical risk-adjusted OOP
-        elif insurance_type == "Marketplace":
-            premium = 7200 * ((1 + 0.04) ** i)
-            oop = 4200 * ((1 + 0.04) ** i)
-        else:  # Uninsured fallback
-            premium = 0
-            oop = true_cost * 0.5
+    # Headless kernel does the simulation; this wrapper only syncs Streamlit state
+    result = run_investment_strategy(cost_df, inputs)
 
-        cost_data.append({
-            "Age": age,
-            "True Cost": true_cost,
-            "OOP": oop,
-            "Premium": premium
-        })
+    # Optionally store in session state for visibility
+    st.session_state.capital_from_surplus = result["capital_from_surplus"]
+    st.session_state.capital_from_reallocation = result["capital_from_reallocation"]
+    st.session_state.total_capital_contribution = result["total_capital_contribution"]
 
-    return pd.DataFrame(cost_data)
+    # Export DataFrame for downstream rendering (full DataFrame, no chart rendering here)
+    st.session_state.capital_graph_df = result["capital_graph_df"]
 
-def simulate_investment_strategy(cost_df, strategy=None):
-    df = cost_df.copy()
-
-    # Extract user-defined surplus and capital care allocation
-    total_surplus = st.session_state.get("calculated_surplus", 0.0)
-    capital_care_alloc = st.session_state.get("capital_care_alloc", 0.0)  # e.g., 0.3 = 30%
-    reallocated_premium = st.session_state.get("reallocated_premium", 0.0)
-    eligible_for_reallocation = st.session_state.get("eligible_for_reallocation", False)
-
-    # Extract investment strategy rates and allocations
-    short_rate = st.session_state.get("short_term_rate", 0.02)
-    mid_rate = st.session_state.get("mid_term_rate", 0.05)
-    long_rate = st.session_state.get("long_term_rate", 0.07)
-
-    short_alloc = st.session_state.get("short_term_alloc", 0.2)
-    mid_alloc = st.session_state.get("mid_term_alloc", 0.3)
-    long_alloc = st.session_state.get("long_term_alloc", 0.5)
-
-    # Calculate blended growth rate
-    blended_growth = (
-        short_rate * short_alloc +
-        mid_rate * mid_alloc +
-        long_rate * long_alloc
-    )
+    return result["capital_graph_df"]
 
-    # Capital investment simulation from surplus and premium reallocation
-    surplus_contribution = total_surplus * capital_care_alloc
-    premium_contribution = reallocated_premium if eligible_for_reallocation else 0.0
-    annual_contribution = surplus_contribution + premium_contribution
-    # Optionally store in session state for visibility
-    st.session_state.capital_from_surplus = surplus_contribution
-    st.session_state.capital_from_reallocation = premium_contribution
-    st.session_state.total_capital_contribution = annual_contribution
-    capital_fund_value = 0
-    capital_used = []
-    capital_balance = []
-    income_available = []
-    surplus_allocated = []
-
-    for cost in df["Healthcare Cost"]:
-        capital_fund_value = (capital_fund_value + annual_contribution) * (1 + blended_growth)
-        used = min(capital_fund_value, cost)
-        capital_fund_value -= used
-        capital_used.append(used)
-        capital_balance.append(capital_fund_value)
-
-    df["Capital Used"] = capital_used
-    df["Capital Fund Remaining"] = capital_balance
 
-    # Export DataFrame for downstream rendering (full DataFrame, no chart rendering here)
-    st.session_state.capital_graph_df = df
+@instrumented("compute")
+def simulate_investment_strategy_mc(cost_df, n_paths=DEFAULT_PATHS, seed=None, workers=None, overrides=None,
+                                   percentiles=PERCENTILES, streaming=False, sampling="pseudo",
+                                   target_ci_width=None):
+    # Monte Carlo mode: same session inputs, bucket rates become expected returns
+    inputs = {key: st.session_state.get(key, default) for key, default in INVESTMENT_STRATEGY_DEFAULTS.items()}
+    inputs.update(overrides or {})
+    # workers shards the paths across processes (parallel_runner) for heavy runs;
+    # streaming folds them into bounded-memory sketches (streaming_quantiles) for 100k+ paths;
+    # sampling and target_ci_width reach the same precision with fewer paths (n_paths becomes a cap)
+    result = run_investment_strategy_mc(cost_df, inputs, n_paths=n_paths, seed=seed, workers=workers,
+                                        percentiles=percentiles, streaming=streaming, sampling=sampling,
+                                        target_ci_width=target_ci_width)
 
-    return df
+    # Percentile bands, depletion summary and paths actually simulated for downstream rendering
+    st.session_state.capital_mc_bands = result["bands"]
+    st.session_state.capital_mc_depletion = result["depletion"]
+    st.session_state.capital_mc_paths = result["n_paths"]
+    record_artifacts(st.session_state, ["capital_mc_bands", "capital_mc_depletion", "capital_mc_paths"])
+
+    return result["bands"]
 
 
 # --- AI Recommendation Section (to be called after simulation outputs are calculated) ---
@@ -128,6 +99,7 @@ def display_ai_recommendations(after_capital_strategy):
     st.markdown("### 🤖 Personalized Strategy Breakdown")
 
 
+@instrumented("compute")
 def simulate_capital_allocation(cost_df, strategy_allocation, initial_capital, monthly_contribution, fund_source,
                                 pct_from_savings, base_surplus=None):
     updated_df = cost_df.copy()
@@ -158,6 +130,7 @@ def simulate_capital_allocation(cost_df, strategy_allocation, initial_capital, m
 
     return updated_df
 
+@instrumented("compute")
 def simulate_full_investment_strategy(
     profile,
     net_income_annual,
@@ -175,53 +148,26 @@ def simulate_full_investment_strategy(
 ):
     years = profile.get("simulation_years", 40)
 
-    # Initialize investment buckets
-    short_term = []
-    mid_term = []
-    long_term = []
-
-    value_short = profile.get("start_short_term", 0)
-    value_mid = profile.get("start_mid_term", 0)
-    value_long = profile.get("start_long_term", 0)
-
-    for i in range(years):
-        annual_savings = net_income_annual * savings_rate * ((1 + savings_growth) ** i)
-
-        value_short *= (1 + growth_short)
-        value_short += annual_savings * capital_allocations.get("short_term", 0)
-        short_term.append(value_short)
-
-        value_mid *= (1 + growth_mid)
-        value_mid += annual_savings * capital_allocations.get("mid_term", 0)
-        mid_term.append(value_mid)
-
-        value_long *= (1 + growth_long)
-        value_long += annual_savings * capital_allocations.get("long_term", 0)
-        long_term.append(value_long)
-
-    # --- USER 401(k) ---
-    user_401k = []
-    value_401k = profile.get("start_401k_user", 0)
-    for i in range(years):
-        value_401k *= (1 + growth_401k)
-        value_401k += contrib_401k_employee + contrib_401k_employer
-        user_401k.append(value_401k)
-
-    # --- PARTNER 401(k) ---
-    partner_401k = []
-    if profile.get("family_status") == "family":
-        value_partner_401k = profile.get("start_401k_partner", 0)
-        for i in range(years):
-            value_partner_401k *= (1 + growth_401k)
-            value_partner_401k += partner_401k_contrib + partner_employer_401k_contrib
-            partner_401k.append(value_partner_401k)
-    else:
-        partner_401k = [0] * years
-
-    return {
-        "short_term": short_term,
-        "mid_term": mid_term,
-        "long_term": long_term,
-        "user_401k": user_401k,
-        "partner_401k": partner_401k
-    }
\ No newline at end of file
+    # Single-profile call of the batched kernel; lists keep the original return type
+    batch = simulate_full_investment_batch(
+        years,
+        net_income_annual,
+        savings_rate,
+        savings_growth,
+        capital_allocations,
+        growth_short,
+        growth_mid,
+        growth_long,
+        contrib_401k_employee,
+        contrib_401k_employer,
+        growth_401k,
+        partner_401k_contrib,
+        partner_employer_401k_contrib,
+        start_short_term=profile.get("start_short_term", 0),
+        start_mid_term=profile.get("start_mid_term", 0),
+        start_long_term=profile.get("start_long_term", 0),
+        start_401k_user=profile.get("start_401k_user", 0),
+        start_401k_partner=profile.get("start_401k_partner", 0),
+        is_family=profile.get("family_status") == "family"
+    )
+    return {bucket: values[0].tolist() for bucket, values in batch.items()}
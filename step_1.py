@@ -1,5 +1,4 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 from insurance_module import get_insurance_costs_over_time, get_base_premium, get_oop_correction_ratio
 from simulator_core import generate_costs
 from cost_library import estimate_uninsured_oop_by_year
@@ -1,4 +1,5 @@
 import streamlit as st
+from pipeline_dag import run_pipeline
 
 
 
@@ -88,26 +89,14 @@ def run_step_2(tab3):
             debt_monthly_payment = st.number_input("Monthly Debt Payments (Credit Cards, Loans)", min_value=0,
                                                    value=1500)
 
-            # --- Inflation rate pulled from Step 1 ---
-            inflation = st.session_state.get("inflation_rate", 0.03)
-
             # --- Retrieve projection length ---
             years = len(cost_df)
             st.session_state["years"] = years
 
-            # --- Project household expenses and debt over time ---
-            household_proj = [monthly_expenses * 12 * ((1 + inflation) ** i) for i in range(years)]
-            debt_proj = [debt_monthly_payment * 12 for _ in range(years)]  # constant assumption
-
-            # --- Projected Health Premiums ---
-            base_premium = st.session_state.get("base_premium", 6000)
-            premiums = [base_premium * ((1 + inflation) ** i) for i in range(years)]
-            st.session_state["premiums"] = premiums
-            st.session_state["projected_premiums"] = premiums
-
-            # --- Store in session state for downstream use ---
-            st.session_state.household_proj = household_proj
-            st.session_state.debt_proj = debt_proj
+            # --- Project household expenses, debt and health premiums over time ---
+            # Recomputed by the pipeline only when expenses, debt, inflation or the horizon change
+            st.session_state.debt_monthly_payment = debt_monthly_payment
+            run_pipeline(st.session_state, ["household_projection"])
 
             # --- 💼 401(k) Contributions ---
             st.markdown("### 💼 401(k) Contributions")
@@ -217,91 +206,23 @@ def run_step_2(tab3):
             )
 
             if st.button("Run Step 2"):
-                    years = len(cost_df)
-                    user_age = profile.get("age", 30)
-                    retirement_age = 65
-                    # --- Revised Retirement-aware income projection (stop regular income after retirement) ---
-                    # Use only income_growth in income projection (remove inflation_rate)
-                    income_proj = [
-                        net_income_annual * ((1 + income_growth) ** i) if (
-                            user_age + i) < retirement_age else net_income_annual * 0.4
-                        for i in range(years)
-                    ]
-
-                    # --- Partner income projection using new variables ---
-                    if family_status == "family":
-                        income_proj_partner = []
-                        for i in range(years):
-                            partner_age_i = partner_age + i  # partner's age this year
-                            if partner_age_i < 65:
-                                income = net_income_annual_partner * ((1 + income_growth_partner) ** i)
-                            else:
-                                income = 0
-                            income_proj_partner.append(income)
-                    else:
-                        income_proj_partner = [0 for _ in range(years)]
-
-                    # --- Combined income projection ---
-                    if family_status == "family":
-                        combined_income_proj = [user + partner for user, partner in
-                                                zip(income_proj, income_proj_partner)]
-                    else:
-                        combined_income_proj = income_proj
-
-                    # Store the combined projection in session state
-                    st.session_state.combined_income_proj = combined_income_proj
-
-                    # --- Revised savings and 401(k) projections: contributions before retirement, only growth after ---
-                    # User projections
-                    proj_401k = []
-                    savings_proj = []
-                    user_401k_balance = profile.get("start_401k_user", 0)
-                    current_401k = user_401k_balance
-                    current_savings = savings_start
-                    monthly_contrib_401k = (contrib_401k_employee + contrib_401k_employer) / 12
-                    monthly_savings = annual_contrib / 12
-                    growth_rate_401k = growth_401k
-                    growth_rate_savings = savings_growth
-                    for i in range(years):
-                        age_iter = user_age + i
-                        if age_iter < retirement_age:
-                            current_401k = current_401k * (1 + growth_rate_401k + inflation_rate) + monthly_contrib_401k * 12
-                            current_savings = current_savings * (1 + growth_rate_savings + inflation_rate) + monthly_savings * 12
-                        else:
-                            current_401k = current_401k * (1 + growth_rate_401k + inflation_rate)
-                            current_savings = current_savings * (1 + growth_rate_savings + inflation_rate)
-                        proj_401k.append(current_401k)
-                        savings_proj.append(current_savings)
-
-                    # Partner projections for family mode
-                    if family_status == "family":
-                        proj_401k_partner = []
-                        savings_proj_partner = []
-                        partner_401k_balance = profile.get("start_401k_partner", 0)
-                        current_401k_partner = partner_401k_balance
-                        # Use partner's savings if modeled separately; for now, use same as user
-                        # If you want partner's savings to be separate, add inputs and logic here.
-                        # For now, only project partner 401k.
-                        partner_age_val = profile.get("partner_age", 65)
-                        # partner_401k_contrib and partner_employer_401k_contrib already defined at top-level
-                        monthly_contrib_401k_partner = (partner_401k_contrib + partner_employer_401k_contrib) / 12
-                        growth_401k_partner = profile.get("partner_growth_401k", growth_401k)
-                        for i in range(years):
-                            age_partner = partner_age_val + i
-                            if age_partner < retirement_age:
-                                current_401k_partner = current_401k_partner * (
-                                    1 + growth_401k_partner + inflation_rate) + monthly_contrib_401k_partner * 12
-                            else:
-                                current_401k_partner = current_401k_partner * (1 + growth_401k_partner + inflation_rate)
-                            proj_401k_partner.append(current_401k_partner)
-                    else:
-                        proj_401k_partner = [0] * years
-                    # --- Store 401k projections in session state unconditionally before marking submission ---
-                    st.session_state["proj_401k"] = proj_401k
-                    if family_status == "family":
-                        st.session_state["proj_401k_partner"] = proj_401k_partner
-                    else:
-                        st.session_state["proj_401k_partner"] = [0] * years
+                    # --- Retirement-aware income, savings and 401(k) projections ---
+                    # Inputs are kept in session state so the pipeline can refresh these projections
+                    # on its own when Step 1 changes the horizon
+                    # partner_401k_contrib and partner_employer_401k_contrib already defined at top-level
+                    st.session_state.step2_inputs = {
+                        "net_income_annual": net_income_annual,
+                        "income_growth": income_growth,
+                        "net_income_annual_partner": net_income_annual_partner,
+                        "income_growth_partner": income_growth_partner,
+                        "contrib_401k_annual": contrib_401k_employee + contrib_401k_employer,
+                        "growth_401k": growth_401k,
+                        "savings_start": savings_start,
+                        "annual_contrib": annual_contrib,
+                        "savings_growth": savings_growth,
+                        "partner_contrib_401k_annual": partner_401k_contrib + partner_employer_401k_contrib,
+                    }
+                    run_pipeline(st.session_state, ["income_projection"])
 
                     st.session_state.monthly_income = monthly_income
                     st.session_state.net_income_annual = net_income_annual
@@ -315,10 +236,6 @@ def run_step_2(tab3):
                     st.session_state.contrib_401k_employee = contrib_401k_employee
                     st.session_state.contrib_401k_employer = contrib_401k_employer
                     st.session_state.growth_401k = growth_401k
-                    st.session_state.income_proj = combined_income_proj
-                    st.session_state.income_proj_partner = income_proj_partner
-                    st.session_state.savings_proj = savings_proj
-                    st.session_state.proj_401k = proj_401k
 
                     # insurance_type already defined at top-level
                     employee_premium = st.session_state.get("employee_premium", 0)
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 # from health_risk_module import get_risk_trajectory  # Ensure this is accessible
 from chronic_module import get_chronic_multiplier
+from figure_cache import show_figure
+from pipeline_dag import run_pipeline
+from projected_health_risk import get_stochastic_risk_trajectory
 
 # --- Risk trajectory function ---
 def get_risk_trajectory(age, health_status):
@@ -14,7 +16,18 @@ def get_risk_trajectory(age, health_status):
     traj = base_curve.get(health_status.lower(), base_curve["healthy"])
     return traj[:50]
 
+def get_member_risk_trajectory(age, health_status, health_paths=False):
+    # health_paths: Markov health-state simulation (members can move between healthy, chronic and
+    # high_risk), falling back to the fixed curves past the projection age
+    if health_paths:
+        traj = get_stochastic_risk_trajectory(age, health_status, seed=0)
+        if traj:
+            return traj
+    return get_risk_trajectory(age, health_status)
+
 def run_step_3(tab4):
+    import matplotlib.pyplot as plt
+
     with tab4:
         st.header("Step 3: Health Risk Outlook")
 
@@ -28,8 +41,13 @@ def run_step_3(tab4):
         family_history = profile.get("family_history", [])
         dependent_ages = st.session_state.get("dependent_ages", [])
         dependent_health_statuses = st.session_state.get("dependent_health_statuses", [])
+        health_paths = st.checkbox(
+            "Simulate changes in health status over time",
+            key="step3_health_paths",
+            help="Each family member's health can improve or worsen year by year instead of following a fixed curve."
+        )
 
-        user_traj = get_risk_trajectory(user_age, health_status)
+        user_traj = get_member_risk_trajectory(user_age, health_status, health_paths)
         risk_trajectory = user_traj
         st.session_state["risk_trajectory"] = risk_trajectory
 
@@ -42,12 +60,12 @@ def run_step_3(tab4):
             partner_chronic_count = st.session_state.get("partner_chronic_count", "None").lower().replace(" ", "_")
             partner_multiplier = get_chronic_multiplier(partner_age, partner_chronic_count)
             st.session_state["partner_chronic_multiplier"] = partner_multiplier
-            partner_traj = get_risk_trajectory(partner_age, partner_health_status)
+            partner_traj = get_member_risk_trajectory(partner_age, partner_health_status, health_paths)
             risk_values.append(partner_traj[0])
             individual_ratios.append(("Partner", partner_age, partner_health_status, partner_traj[0]))
 
         for i, (dep_age, dep_status) in enumerate(zip(dependent_ages, dependent_health_statuses)):
-            dep_traj = get_risk_trajectory(dep_age, dep_status)
+            dep_traj = get_member_risk_trajectory(dep_age, dep_status, health_paths)
             risk_values.append(dep_traj[0])
             individual_ratios.append((f"Dependent #{i+1}", dep_age, dep_status, dep_traj[0]))
 
@@ -75,7 +93,7 @@ def run_step_3(tab4):
         # Lifetime average
         family_trajectories = []
         for label, age, status, _ in individual_ratios:
-            traj = get_risk_trajectory(age, status)
+            traj = get_member_risk_trajectory(age, status, health_paths)
             family_trajectories.append((label, age, status, traj))
 
         total_weight = 0
@@ -97,28 +115,30 @@ def run_step_3(tab4):
         sizes1 = [risk_values[0], 1 - risk_values[0]]
         sizes2 = [weighted_avg_lifetime_risk, 1 - weighted_avg_lifetime_risk]
 
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(6, 10))
-        ax1.pie(
-            sizes1,
-            labels=labels,
-            colors=colors,
-            autopct=lambda pct: f"{pct:.0f}%" if pct == round(sizes1[0]*100) else "",
-            startangle=90
-        )
-        ax1.axis("equal")
-        ax1.set_title("Year 1 Health Risk", fontsize=14, fontweight="bold")
-
-        ax2.pie(
-            sizes2,
-            labels=labels,
-            colors=colors,
-            autopct=lambda pct: f"{pct:.0f}%" if pct > 0 and pct < 100 and pct > 50 else "",
-            startangle=90
-        )
-        ax2.axis("equal")
-        ax2.set_title("Lifetime Average Risk", fontsize=14, fontweight="bold")
-
-        st.pyplot(fig)
+        def draw_risk_pies():
+            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(6, 10))
+            ax1.pie(
+                sizes1,
+                labels=labels,
+                colors=colors,
+                autopct=lambda pct: f"{pct:.0f}%" if pct == round(sizes1[0]*100) else "",
+                startangle=90
+            )
+            ax1.axis("equal")
+            ax1.set_title("Year 1 Health Risk", fontsize=14, fontweight="bold")
+
+            ax2.pie(
+                sizes2,
+                labels=labels,
+                colors=colors,
+                autopct=lambda pct: f"{pct:.0f}%" if pct > 0 and pct < 100 and pct > 50 else "",
+                startangle=90
+            )
+            ax2.axis("equal")
+            ax2.set_title("Lifetime Average Risk", fontsize=14, fontweight="bold")
+            return fig
+
+        show_figure("step3_risk_pies", [sizes1, sizes2], draw_risk_pies)
 
         tuku_image_path = "Tuku_Default_Health_Adviser.png"
         col1, col2 = st.columns([1, 8])
@@ -137,30 +157,9 @@ def run_step_3(tab4):
         # Insert calibrated costs if available
         if "true_costs" in st.session_state:
             st.session_state["step3_calibrated_costs"] = st.session_state.get("true_costs", [])
-        base_premium = st.session_state.get("base_premium", 6000)
-        base_oop = st.session_state.get("base_oop", 3000)
-        inflation = st.session_state.get("inflation_rate", 0.03)
-        years = len(cost_df)
-        if "step3_calibrated_costs" in st.session_state and st.session_state["step3_calibrated_costs"]:
-            calibrated_costs = st.session_state["step3_calibrated_costs"]
-            if len(calibrated_costs) < years:
-                calibrated_costs += [calibrated_costs[-1]] * (years - len(calibrated_costs))
-            calibrated_costs = calibrated_costs[:years]
-            total_paid = sum(calibrated_costs)
-            st.session_state["healthcare"] = calibrated_costs
-            premiums = [0] * years
-            oop = calibrated_costs
-        else:
-            base_premium *= chronic_multiplier
-            base_oop *= chronic_multiplier
-            premiums = [base_premium * ((1 + inflation) ** i) for i in range(years)]
-            oop = [base_oop * ((1 + inflation) ** i) for i in range(years)]
-            st.session_state["premiums"] = premiums
-            st.session_state["oop"] = oop
-            st.session_state["healthcare"] = [premiums[i] + oop[i] for i in range(years)]
-            total_paid = sum(premiums) + sum(oop)
-        # Ensure correct age alignment for downstream steps
-        st.session_state["ages"] = list(range(user_age, user_age + years))
+        # Premium/OOP projection (with ages for downstream steps), recomputed only when its inputs change
+        run_pipeline(st.session_state, ["premiums_oop"])
+        total_paid = sum(st.session_state.get("healthcare", []))
 
         st.subheader("📈 Healthcare Cost Projection")
         # Compute total user-paid cost (Premium + OOP)
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 from chronic_module import get_chronic_multiplier
+from figure_cache import show_figure
+from simulation_kernel import drawdown_capital, retirement_deficits
 
 def run_step_5(tab6):
     with tab6:
@@ -38,7 +39,8 @@ def run_step_5(tab6):
         user_age = st.session_state.get("profile", {}).get("age", 30)
         user_chronic_count = st.session_state.get("user_chronic_count", "None").lower().replace(" ", "_")
         chronic_multiplier = get_chronic_multiplier(user_age, user_chronic_count)
-        expense_df = st.session_state.get("expense_df", pd.DataFrame())
+        # Work on a copy: expense_df is a cached Step 4 pipeline artifact
+        expense_df = st.session_state.get("expense_df", pd.DataFrame()).copy()
         # Restore columns from session state if missing
         if "Premium" not in expense_df.columns:
             if "premiums" in st.session_state:
@@ -98,57 +100,66 @@ def run_step_5(tab6):
 
                 # 1. Lifetime Health Risk
                 st.markdown("**Lifetime Health Risk**")
-                fig_lifetime, ax_lifetime = plt.subplots(figsize=(1.5, 1.5))
-                wedges, texts, autotexts = ax_lifetime.pie(
-                    [lifetime_risk, 1 - lifetime_risk],
-                    labels=["", ""],
-                    autopct=lambda pct: f"{lifetime_risk:.0%}" if pct > 1 and pct > 50 else "",
-                    startangle=90,
-                    colors=["#ff9999", "#f0f0f0"],
-                    textprops={'fontsize': 6, 'weight': 'bold'}
-                )
-                for txt in texts:
-                    txt.set_text("")
-                for i, autotxt in enumerate(autotexts):
-                    autotxt.set_text(f"{lifetime_risk:.0%}" if i == 0 else "")
-                ax_lifetime.axis("equal")
-                st.pyplot(fig_lifetime)
+                def draw_lifetime_pie():
+                    fig_lifetime, ax_lifetime = plt.subplots(figsize=(1.5, 1.5))
+                    wedges, texts, autotexts = ax_lifetime.pie(
+                        [lifetime_risk, 1 - lifetime_risk],
+                        labels=["", ""],
+                        autopct=lambda pct: f"{lifetime_risk:.0%}" if pct > 1 and pct > 50 else "",
+                        startangle=90,
+                        colors=["#ff9999", "#f0f0f0"],
+                        textprops={'fontsize': 6, 'weight': 'bold'}
+                    )
+                    for txt in texts:
+                        txt.set_text("")
+                    for i, autotxt in enumerate(autotexts):
+                        autotxt.set_text(f"{lifetime_risk:.0%}" if i == 0 else "")
+                    ax_lifetime.axis("equal")
+                    return fig_lifetime
+
+                show_figure("step5_lifetime_risk", [lifetime_risk], draw_lifetime_pie)
 
                 # 2. Current Healthcare % of Total Expenses
                 st.markdown("**Current Healthcare % of Total Expenses:**")
-                fig_cur, ax_cur = plt.subplots(figsize=(1.5, 1.5))
-                wedges, texts, autotexts = ax_cur.pie(
-                    [current_healthcare_pct / 100, 1 - (current_healthcare_pct / 100)],
-                    labels=["", ""],
-                    autopct=lambda pct: f"{current_healthcare_pct:.0f}%" if pct > 1 and pct > 50 else "",
-                    startangle=90,
-                    colors=["#66b3ff", "#f0f0f0"],
-                    textprops={'fontsize': 6, 'weight': 'bold'}
-                )
-                for txt in texts:
-                    txt.set_text("")
-                for i, autotxt in enumerate(autotexts):
-                    autotxt.set_text(f"{current_healthcare_pct:.0f}%" if i == 0 else "")
-                ax_cur.axis("equal")
-                st.pyplot(fig_cur)
+                def draw_current_pie():
+                    fig_cur, ax_cur = plt.subplots(figsize=(1.5, 1.5))
+                    wedges, texts, autotexts = ax_cur.pie(
+                        [current_healthcare_pct / 100, 1 - (current_healthcare_pct / 100)],
+                        labels=["", ""],
+                        autopct=lambda pct: f"{current_healthcare_pct:.0f}%" if pct > 1 and pct > 50 else "",
+                        startangle=90,
+                        colors=["#66b3ff", "#f0f0f0"],
+                        textprops={'fontsize': 6, 'weight': 'bold'}
+                    )
+                    for txt in texts:
+                        txt.set_text("")
+                    for i, autotxt in enumerate(autotexts):
+                        autotxt.set_text(f"{current_healthcare_pct:.0f}%" if i == 0 else "")
+                    ax_cur.axis("equal")
+                    return fig_cur
+
+                show_figure("step5_current_healthcare_pct", [current_healthcare_pct], draw_current_pie)
 
                 # 3. Average Healthcare % of Total Expenses
                 st.markdown("**Average Healthcare % of Total Expenses:**")
-                fig_avg, ax_avg = plt.subplots(figsize=(1.5, 1.5))
-                wedges, texts, autotexts = ax_avg.pie(
-                    [average_healthcare_pct / 100, 1 - (average_healthcare_pct / 100)],
-                    labels=["", ""],
-                    autopct=lambda pct: f"{average_healthcare_pct:.0f}%" if pct > 1 and pct > 50 else "",
-                    startangle=90,
-                    colors=["#99ff99", "#f0f0f0"],
-                    textprops={'fontsize': 6, 'weight': 'bold'}
-                )
-                for txt in texts:
-                    txt.set_text("")
-                for i, autotxt in enumerate(autotexts):
-                    autotxt.set_text(f"{average_healthcare_pct:.0f}%" if i == 0 else "")
-                ax_avg.axis("equal")
-                st.pyplot(fig_avg)
+                def draw_average_pie():
+                    fig_avg, ax_avg = plt.subplots(figsize=(1.5, 1.5))
+                    wedges, texts, autotexts = ax_avg.pie(
+                        [average_healthcare_pct / 100, 1 - (average_healthcare_pct / 100)],
+                        labels=["", ""],
+                        autopct=lambda pct: f"{average_healthcare_pct:.0f}%" if pct > 1 and pct > 50 else "",
+                        startangle=90,
+                        colors=["#99ff99", "#f0f0f0"],
+                        textprops={'fontsize': 6, 'weight': 'bold'}
+                    )
+                    for txt in texts:
+                        txt.set_text("")
+                    for i, autotxt in enumerate(autotexts):
+                        autotxt.set_text(f"{average_healthcare_pct:.0f}%" if i == 0 else "")
+                    ax_avg.axis("equal")
+                    return fig_avg
+
+                show_figure("step5_average_healthcare_pct", [average_healthcare_pct], draw_average_pie)
 
                 # Tuku image and insight directly underneath pie charts
                 st.image("Tuku_Analyst.png", width=64)
@@ -156,18 +167,11 @@ def run_step_5(tab6):
 
         # Retirement Readiness Indicator (revised logic)
         st.subheader("🎯 Retirement Readiness")
-        if surplus and capital_graph_df is not None and not capital_graph_df.empty:
-            age_series = expense_df["Age"].tolist()
-            # Updated drawdown logic from Step 4
-            chart_ages = []
-            deficit_values = []
-            for i, age in enumerate(age_series):
-                if age >= 65 and i < len(surplus):
-                    chart_ages.append(age)
-                    deficit = -surplus[i] if surplus[i] < 0 else 0
-                    deficit_values.append(deficit)
-
-            if chart_ages:
+        if len(surplus) and capital_graph_df is not None and not capital_graph_df.empty:
+            # Same drawdown kernel as Step 4, starting from end-of-projection savings and 401(k)
+            chart_ages, deficit_values = retirement_deficits(expense_df["Age"].to_numpy(), surplus)
+
+            if len(chart_ages):
                 savings_total = st.session_state.get("savings_projection", [0])[-1]
                 proj_401k = st.session_state.get("proj_401k", [0])[-1]
                 pension_user = st.session_state.get("pension_user", 0)
@@ -175,22 +179,11 @@ def run_step_5(tab6):
                 total_pension = pension_user + pension_partner
                 total_available = savings_total + proj_401k + (total_pension * len(chart_ages))
 
-                used_capital = []
-                remaining_capital = []
-                unfunded_gap = []
-                current_capital = total_available
-
-                for deficit in deficit_values:
-                    if deficit > 0:
-                        used = min(deficit, current_capital)
-                        gap = max(deficit - used, 0)
-                        current_capital -= used
-                    else:
-                        used = 0
-                        gap = 0
-                    used_capital.append(used)
-                    remaining_capital.append(max(current_capital, 0))
-                    unfunded_gap.append(gap)
+                drawdown = drawdown_capital(deficit_values, total_available, ages=chart_ages)
+                used_capital = drawdown["used"]
+                remaining_capital = drawdown["remaining"]
+                unfunded_gap = drawdown["gap"]
+                current_capital = drawdown["final_capital"]
 
                 surplus_remaining = remaining_capital.copy()
 
@@ -207,7 +200,7 @@ def run_step_5(tab6):
                     if current_capital > 0:
                         st.success("✅ Your available capital is projected to cover all retirement expenses.")
                     else:
-                        depletion_age = chart_ages[len(used_capital) - remaining_capital[::-1].index(0) - 1] if 0 in remaining_capital else chart_ages[-1]
+                        depletion_age = drawdown["depletion_age"] or chart_ages[-1]
                         st.warning(f"⚠️ You may fall short by approximately ${-current_capital:,.0f} in retirement funding. Capital is projected to be depleted by age {depletion_age}.")
                 else:
                     st.info("✅ No capital drawdown was needed. You remain financially self-sufficient through retirement.")
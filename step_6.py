@@ -1,9 +1,21 @@
+import math
 import streamlit as st
 import pandas as pd
 from chronic_module import get_chronic_multiplier
+from figure_cache import show_figure
 from simulator_core import generate_costs
 from cost_library import get_calibrated_cost_curve, determine_profile_type, estimate_high_risk_curve
 from cost_library import adjust_for_employer_contribution
+from simulator_core import simulate_investment_strategy_mc
+from simulation_kernel import INVESTMENT_STRATEGY_DEFAULTS, minimum_annual_contribution, minimum_starting_capital
+from allocation_optimizer import OBJECTIVES, optimize_allocation
+from monte_carlo_module import STREAMING_PERCENTILES
+from session_memory import artifact_is_current, record_artifacts
+
+# Most paths in the Step 6 advanced (upgrade) Monte Carlo run; streamed through quantile sketches
+ADVANCED_SIMULATION_PATHS = 100000
+# The run stops early once the 95% interval on the chance of running short is this narrow
+ADVANCED_SIMULATION_CI_WIDTH = 0.01
 
 def run_step_6(tab7):
     with tab7:
@@ -140,6 +152,7 @@ def run_step_6(tab7):
             st.stop()
         ages = cost_df["Age"].tolist()
         cv_score = profile.get("cv_risk_score", 0)
+        profile_type = determine_profile_type(cv_score)
         # Retrieve calibrated_costs from Step 3 session state for consistency
         if "true_costs" in st.session_state:
             st.session_state["step3_calibrated_costs"] = st.session_state.get("true_costs", [])
@@ -175,18 +188,21 @@ def run_step_6(tab7):
         # --- Bar Chart: Lifetime Paid vs. True Cost ---
         import matplotlib.pyplot as plt
         import matplotlib.ticker as ticker
-        fig, ax = plt.subplots(figsize=(7, 5))
-        bars = ax.bar(["What You Paid", "True Care Cost"], [lifetime_paid, lifetime_true_cost], color=["#2a7cba", "#ba2a2a"])
-        ax.set_title("Lifetime Healthcare Payments vs. Actual Cost")
-        ax.set_xlabel("Cost Category")
-        ax.set_ylabel("Dollars ($)")
-        ax.grid(True, linestyle='--', alpha=0.6)
-        ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
-        for bar in bars:
-            height = bar.get_height()
-            ax.annotate(f"${height:,.0f}", xy=(bar.get_x() + bar.get_width() / 2, height), xytext=(0, 5), textcoords="offset points", ha='center', va='bottom')
-        fig.tight_layout()
-        st.pyplot(fig)
+        def draw_paid_vs_true_cost():
+            fig, ax = plt.subplots(figsize=(7, 5))
+            bars = ax.bar(["What You Paid", "True Care Cost"], [lifetime_paid, lifetime_true_cost], color=["#2a7cba", "#ba2a2a"])
+            ax.set_title("Lifetime Healthcare Payments vs. Actual Cost")
+            ax.set_xlabel("Cost Category")
+            ax.set_ylabel("Dollars ($)")
+            ax.grid(True, linestyle='--', alpha=0.6)
+            ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, _: f"${x:,.0f}"))
+            for bar in bars:
+                height = bar.get_height()
+                ax.annotate(f"${height:,.0f}", xy=(bar.get_x() + bar.get_width() / 2, height), xytext=(0, 5), textcoords="offset points", ha='center', va='bottom')
+            fig.tight_layout()
+            return fig
+
+        show_figure("step6_paid_vs_true_cost", [lifetime_paid, lifetime_true_cost], draw_paid_vs_true_cost)
         current_savings = st.session_state.get("current_savings", st.session_state.get("available_savings_after_retirement", st.session_state.get("savings_start", 0)))
         fund_source = st.session_state.get("capital_fund_source", "Select One")
 
@@ -248,6 +264,28 @@ def run_step_6(tab7):
         st.markdown(f"**Projected Capital Care Fund at Retirement:** ${projected_capital_fund:,.0f}")
         st.caption("This is a simplified estimate for the freemium version. Actual investment returns and health costs may vary.")
 
+        # --- Goal Seek: minimum contribution that keeps the fund covering costs through the horizon ---
+        # Closed form over the projected costs (simulation_kernel), so it updates instantly with the sliders
+        horizon_costs = (cost_df["OOP"] + cost_df["Premium"]).to_numpy(dtype=float)
+        horizon_age = int(cost_df["Age"].iloc[-1])
+        starting_capital = savings_contribution + healthcare_savings
+        st.session_state["starting_capital"] = starting_capital
+        required_annual = minimum_annual_contribution(horizon_costs, short_term_growth_rate, starting_capital)
+        required_monthly = math.ceil(max(required_annual - premium_savings, 0) / 12)
+        required_capital = minimum_starting_capital(horizon_costs, short_term_growth_rate, annual_contribution + premium_savings)
+        st.session_state["goal_seek_monthly_contribution"] = required_monthly
+        st.markdown("#### 🎯 Goal Seek")
+        st.markdown(f"- Minimum monthly contribution to cover your projected healthcare costs through age **{horizon_age}** (with {savings_pct}% of savings): **${required_monthly:,}**")
+        if required_monthly > available_cash:
+            st.warning(f"This is more than your available monthly income of ${available_cash:,.0f}. Consider allocating more savings or reducing projected costs.")
+        if current_savings > 0:
+            required_savings_pct = math.ceil(max(required_capital - healthcare_savings, 0) / current_savings * 100)
+            st.session_state["goal_seek_savings_pct"] = required_savings_pct
+            if required_savings_pct <= 100:
+                st.markdown(f"- Alternatively, with ${monthly_contribution:,} per month: allocate at least **{required_savings_pct}%** of your savings.")
+            else:
+                st.markdown(f"- With ${monthly_contribution:,} per month, even all of your savings would not cover costs through age {horizon_age}.")
+
         # --- Graph: Combined Capital Care Fund Over Time ---
         import matplotlib.pyplot as plt
         import numpy as np
@@ -262,15 +300,18 @@ def run_step_6(tab7):
         ])
         bar_width = 0.4
         ages = user_age + years
-        fig, ax = plt.subplots(figsize=(8, 4))
-        ax.bar(ages - bar_width/2, fund_values, width=bar_width, label="Capital Care Fund", color="#2a7cba")
-        ax.bar(ages + bar_width/2, projected_healthcare_costs, width=bar_width, label="Annual Healthcare Costs", color="#ba2a2a")
-        ax.set_title("Capital Fund vs. Annual Healthcare Costs")
-        ax.set_xlabel("Age")
-        ax.set_ylabel("Dollars ($)")
-        ax.legend()
-        ax.grid(alpha=0.3)
-        st.pyplot(fig)
+        def draw_fund_vs_costs():
+            fig, ax = plt.subplots(figsize=(8, 4))
+            ax.bar(ages - bar_width/2, fund_values, width=bar_width, label="Capital Care Fund", color="#2a7cba")
+            ax.bar(ages + bar_width/2, projected_healthcare_costs, width=bar_width, label="Annual Healthcare Costs", color="#ba2a2a")
+            ax.set_title("Capital Fund vs. Annual Healthcare Costs")
+            ax.set_xlabel("Age")
+            ax.set_ylabel("Dollars ($)")
+            ax.legend()
+            ax.grid(alpha=0.3)
+            return fig
+
+        show_figure("step6_fund_vs_costs", [ages, fund_values, projected_healthcare_costs], draw_fund_vs_costs)
 
         # --- Sliders for monthly_contribution and savings_pct remain above; values dynamically update cash_contribution ---
 
@@ -342,6 +383,76 @@ def run_step_6(tab7):
         upgrade_choice = st.radio("Ready to plan with advanced AI guidance and multi-scenario comparison?", ["Not now", "Upgrade"])
         st.session_state["upgrade_choice"] = upgrade_choice
 
+        # --- Advanced simulation: adaptive Monte Carlo Capital Care Fund, streamed through quantile sketches ---
+        if upgrade_choice == "Upgrade":
+            st.markdown("#### 🎲 Advanced Simulation")
+            st.markdown(f"Runs up to {ADVANCED_SIMULATION_PATHS:,} market scenarios for your Capital Care Fund contributions against your projected healthcare costs, stopping once the odds of running short are known to within ±{ADVANCED_SIMULATION_CI_WIDTH / 2:.1%}.")
+
+            # Best short/mid/long-term mix for the chosen goal, scored on shared market scenarios
+            objective = st.selectbox(
+                "Optimize your investment mix for:",
+                list(OBJECTIVES),
+                format_func=lambda key: OBJECTIVES[key][2],
+                key="allocation_objective"
+            )
+            if st.button("Find Best Allocation", key="find_best_allocation"):
+                mean_rates = {
+                    bucket: st.session_state.get(f"{bucket}_rate", INVESTMENT_STRATEGY_DEFAULTS[f"{bucket}_rate"])
+                    for bucket in ["short_term", "mid_term", "long_term"]
+                }
+                best = optimize_allocation(horizon_costs, annual_contribution + premium_savings, mean_rates,
+                                           objective=objective, seed=0, initial_capital=starting_capital)
+                st.session_state["optimal_allocation"] = best["allocation"]
+                st.session_state["optimal_allocation_scores"] = best["scores"].head(5)
+                record_artifacts(st.session_state, ["optimal_allocation", "optimal_allocation_scores"])
+            # Results built from other inputs (e.g. before a slider moved) are not shown or reused
+            optimal_allocation = None
+            if artifact_is_current(st.session_state, "optimal_allocation"):
+                optimal_allocation = st.session_state["optimal_allocation"]
+            if optimal_allocation:
+                st.markdown(
+                    f"- Best mix: **{optimal_allocation['short_term_alloc']:.0%}** short-term, "
+                    f"**{optimal_allocation['mid_term_alloc']:.0%}** mid-term, "
+                    f"**{optimal_allocation['long_term_alloc']:.0%}** long-term (used in the advanced simulation)"
+                )
+                st.dataframe(st.session_state["optimal_allocation_scores"])
+
+            if st.button("Run Advanced Simulation", key="run_advanced_simulation"):
+                mc_cost_df = cost_df[["Age"]].copy()
+                mc_cost_df["Healthcare Cost"] = cost_df["OOP"] + cost_df["Premium"]
+                overrides = {
+                    "calculated_surplus": annual_contribution + premium_savings,
+                    "capital_care_alloc": 1.0,
+                    "starting_capital": starting_capital,
+                }
+                overrides.update(optimal_allocation or {})
+                with st.spinner("Simulating market scenarios..."):
+                    simulate_investment_strategy_mc(
+                        mc_cost_df,
+                        n_paths=ADVANCED_SIMULATION_PATHS,
+                        seed=0,
+                        # In-process: an adaptive run stops after ~10k paths, far less than the
+                        # cost of starting a spawn-mode worker pool on every click
+                        workers=1,
+                        overrides=overrides,
+                        percentiles=STREAMING_PERCENTILES,
+                        streaming=True,
+                        sampling="sobol",
+                        target_ci_width=ADVANCED_SIMULATION_CI_WIDTH
+                    )
+            mc_current = all(
+                artifact_is_current(st.session_state, key) for key in ["capital_mc_bands", "capital_mc_depletion"]
+            )
+            mc_bands = st.session_state.get("capital_mc_bands")
+            mc_depletion = st.session_state.get("capital_mc_depletion")
+            if mc_current:
+                st.line_chart(mc_bands.set_index("Age"))
+                if artifact_is_current(st.session_state, "capital_mc_paths"):
+                    st.caption(f"Based on {st.session_state['capital_mc_paths']:,} simulated market scenarios.")
+                st.markdown(f"- Probability the fund runs short of a year's healthcare costs: **{mc_depletion['probability']:.0%}**")
+                if np.isfinite(mc_depletion["P50"]):
+                    st.markdown(f"- In the median scenario, the fund is first short at age **{mc_depletion['P50']:.0f}**.")
+
         # --- Download Plan Option ---
         st.markdown("---")
         st.subheader("📁 Manage Your Plan")
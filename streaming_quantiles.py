@@ -0,0 +1,178 @@
+# streaming_quantiles.py
+#
+# Bounded-memory percentile estimation for large Monte Carlo runs. Paths are consumed chunk by chunk
+# and folded into fixed-size sketches, so 100k+ path runs never hold the full (paths × years) matrix.
+# Sketches are plain count arrays: merging two of them (e.g., from different worker processes) is an
+# addition, and the result does not depend on how the paths were chunked or merged.
+
+import numpy as np
+
+# Relative accuracy of QuantileSketch estimates (0.5%: $1,000,000 is reported within ±$5,000)
+DEFAULT_RELATIVE_ACCURACY = 0.005
+
+# Magnitudes below MIN_TRACKED_VALUE count as zero; above MAX_TRACKED_VALUE they share the top bin
+MIN_TRACKED_VALUE = 1.0
+MAX_TRACKED_VALUE = 1e12
+
+
+class QuantileSketch:
+    """
+    Per-year mergeable quantile sketch with relative-error guarantees (DDSketch-style log bins).
+
+    Every value x is counted in the bin ceil(log(|x|) / log(gamma)), with separate bins for
+    positive and negative values and one for zeros. Any quantile is then reported within
+    relative_accuracy of a value that is actually at that rank. Memory is fixed by the tracked
+    value range and the accuracy (about 5,600 counts per year at the defaults), not by the
+    number of paths.
+    """
+
+    def __init__(self, years, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, min_value=MIN_TRACKED_VALUE,
+                 max_value=MAX_TRACKED_VALUE):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be between 0 and 1, got {relative_accuracy}")
+        self.years = int(years)
+        self.relative_accuracy = float(relative_accuracy)
+        self.min_value = float(min_value)
+        self.max_value = float(max_value)
+        self._log_gamma = np.log1p(2 * relative_accuracy / (1 - relative_accuracy))
+        self._min_key = int(np.ceil(np.log(self.min_value) / self._log_gamma))
+        self.n_bins = int(np.ceil(np.log(self.max_value) / self._log_gamma)) - self._min_key + 1
+        self.positive = np.zeros((self.years, self.n_bins), dtype=np.int64)
+        self.negative = np.zeros((self.years, self.n_bins), dtype=np.int64)
+        self.zero = np.zeros(self.years, dtype=np.int64)
+
+    @property
+    def count(self):
+        """
+        Values seen per year.
+        """
+        return self.positive.sum(axis=1) + self.negative.sum(axis=1) + self.zero
+
+    @property
+    def nbytes(self):
+        return self.positive.nbytes + self.negative.nbytes + self.zero.nbytes
+
+    def _bins(self, magnitudes):
+        keys = np.ceil(np.log(np.maximum(magnitudes, self.min_value)) / self._log_gamma)
+        return np.clip(keys - self._min_key, 0, self.n_bins - 1).astype(np.int64)
+
+    def update(self, values):
+        """
+        Fold a chunk of paths into the sketch.
+
+        Parameters:
+        - values: array of shape (paths × years); NaNs are ignored
+        """
+        values = np.asarray(values, dtype=float).reshape(-1, self.years)
+        year_offset = np.arange(self.years) * self.n_bins
+        flat_size = self.years * self.n_bins
+
+        valid = ~np.isnan(values)
+        is_zero = valid & (np.abs(values) < self.min_value)
+        self.zero += is_zero.sum(axis=0)
+
+        for counts, mask in ((self.positive, valid & ~is_zero & (values > 0)),
+                             (self.negative, valid & ~is_zero & (values < 0))):
+            if not mask.any():
+                continue
+            flat = (self._bins(np.abs(values)) + year_offset)[mask]
+            counts += np.bincount(flat, minlength=flat_size).reshape(self.years, self.n_bins)
+        return self
+
+    def merge(self, other):
+        """
+        Add another sketch's counts to this one (same years and settings). Returns self.
+        """
+        if (other.years, other.n_bins, other.relative_accuracy, other.min_value) != (
+                self.years, self.n_bins, self.relative_accuracy, self.min_value):
+            raise ValueError("Cannot merge quantile sketches with different shapes or accuracy")
+        self.positive += other.positive
+        self.negative += other.negative
+        self.zero += other.zero
+        return self
+
+    def _bin_values(self):
+        # Representative value of each bin: within relative_accuracy of anything counted there
+        gamma = np.exp(self._log_gamma)
+        keys = np.arange(self.n_bins) + self._min_key
+        return 2 * np.exp(keys * self._log_gamma) / (gamma + 1)
+
+    def quantiles(self, percentiles):
+        """
+        Per-year percentile estimates (inverted-CDF definition, like np.percentile(method="inverted_cdf")).
+
+        Returns:
+        - dict like {"P5": (years,), "P50": (years,), ...}; years with no values are NaN
+        """
+        bin_values = self._bin_values()
+        # Bins in ascending value order: most negative first, then zero, then positive
+        values = np.concatenate([-bin_values[::-1], [0.0], bin_values])
+        counts = np.concatenate([self.negative[:, ::-1], self.zero[:, None], self.positive], axis=1)
+        cumulative = counts.cumsum(axis=1)
+        total = cumulative[:, -1]
+
+        bands = {}
+        for p in percentiles:
+            rank = np.maximum(np.ceil(total * p / 100 - 1e-9), 1)
+            index = (cumulative >= rank[:, None]).argmax(axis=1)
+            bands[f"P{p}"] = np.where(total > 0, values[index], np.nan)
+        return bands
+
+
+class DepletionCounter:
+    """
+    Mergeable exact distribution of depletion ages over a fixed age grid.
+
+    Depletion ages only take the projection's ages (or "never"), so one count per age is an exact
+    sketch: summaries match monte_carlo_module.summarize_depletion on the full path set.
+    """
+
+    def __init__(self, ages):
+        self.ages = np.asarray(ages)
+        self.counts = np.zeros(len(self.ages), dtype=np.int64)
+        self.never = 0
+
+    @property
+    def count(self):
+        return int(self.counts.sum()) + self.never
+
+    def update(self, depletion):
+        """
+        Fold a chunk of depletion ages (np.inf for paths that never deplete) into the counter.
+        """
+        depletion = np.asarray(depletion, dtype=float).ravel()
+        depleted = np.isfinite(depletion)
+        index = np.searchsorted(self.ages, depletion[depleted])
+        if not np.array_equal(self.ages[np.minimum(index, len(self.ages) - 1)], depletion[depleted]):
+            raise ValueError("Depletion ages must be on the counter's age grid")
+        self.counts += np.bincount(index, minlength=len(self.ages))
+        self.never += int((~depleted).sum())
+        return self
+
+    def merge(self, other):
+        """
+        Add another counter's counts to this one (same age grid). Returns self.
+        """
+        if not np.array_equal(self.ages, other.ages):
+            raise ValueError("Cannot merge depletion counters over different ages")
+        self.counts += other.counts
+        self.never += other.never
+        return self
+
+    def summary(self, percentiles):
+        """
+        Depletion probability and depletion-age percentiles (np.inf means not depleted within horizon).
+        """
+        total = self.count
+        summary = {"probability": float(self.counts.sum() / total) if total else float("nan")}
+        cumulative = self.counts.cumsum()
+        for p in percentiles:
+            rank = max(np.ceil(total * p / 100 - 1e-9), 1)
+            if not total:
+                value = float("nan")
+            elif cumulative.size and cumulative[-1] >= rank:
+                value = float(self.ages[np.argmax(cumulative >= rank)])
+            else:
+                value = float("inf")
+            summary[f"P{p}"] = value
+        return summary
@@ -0,0 +1,26 @@
+# tests/test_main_app.py
+#
+# Headless checks of the Streamlit entry point (streamlit.testing AppTest).
+
+import os
+
+from streamlit.testing.v1 import AppTest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BETA_CODE = "HSS_Beta_2025v4!"
+
+
+def _open_app():
+    os.chdir(APP_DIR)  # The app reads FAQ.md and images relative to the working directory
+    at = AppTest.from_file(os.path.join(APP_DIR, "main.py"), default_timeout=120)
+    at.run()
+    at.sidebar.text_input[0].input(BETA_CODE).run()
+    return at
+
+
+def test_faq_tab_renders_for_fresh_session():
+    at = _open_app()
+    assert not at.exception
+    faq_tab = next(tab for tab in at.tabs if tab.label == "FAQ")
+    assert [element.value for element in faq_tab.subheader] == ["📘 Capital Care 360 FAQ"]
+    assert len(faq_tab.markdown) >= 2
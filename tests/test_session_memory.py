@@ -0,0 +1,37 @@
+# tests/test_session_memory.py
+#
+# Derived artifacts are tied to the inputs recorded when they were written.
+
+import pandas as pd
+
+from session_memory import artifact_is_current, compact_session, record_artifacts
+
+
+def _session():
+    return {
+        "cost_df": pd.DataFrame({"Age": [60, 61], "OOP": [1000.0, 1100.0], "Premium": [500.0, 520.0]}),
+        "annual_contribution": 6000,
+        "oop_savings": 0,
+        "starting_capital": 10000.0,
+        "allocation_objective": "no_depletion",
+    }
+
+
+def test_artifact_stays_current_until_an_input_changes():
+    state = _session()
+    state["optimal_allocation"] = {"short_term_alloc": 1.0, "mid_term_alloc": 0.0, "long_term_alloc": 0.0}
+    record_artifacts(state, ["optimal_allocation"])
+    assert artifact_is_current(state, "optimal_allocation")
+    assert compact_session(state)["dropped"] == []
+
+    state["starting_capital"] = 20000.0
+    assert not artifact_is_current(state, "optimal_allocation")
+    assert compact_session(state)["dropped"] == ["optimal_allocation"]
+    assert "optimal_allocation" not in state
+
+
+def test_unrecorded_artifact_is_dropped():
+    state = _session()
+    state["capital_mc_paths"] = 10240
+    assert not artifact_is_current(state, "capital_mc_paths")
+    assert compact_session(state)["dropped"] == ["capital_mc_paths"]